@@ -0,0 +1,293 @@
+"""
+Benchmarks for the simulation and raster hot paths.
+
+    python -m backend.app.bench run [--out bench.json] [--filter tick] [--quick]
+    python -m backend.app.bench compare base.json new.json [--threshold 0.10]
+
+`run` times every case (median/min/p90 seconds per call after a warm-up) and writes JSON with
+the environment it ran in (versions, CPU count, SIM_* settings, git revision). `compare` matches
+cases by name and exits with status 1 if any median got slower by more than --threshold
+(fraction, default 10%), so it can gate a CI job or a perf PR.
+
+Everything is generated from fixed seeds: farms are new_game_state() games with one of the
+PLAN_MIXES applied, and the EO cases run against a synthetic region (GridMeta 200x200,
+80 seasons) written to a temporary DATA_ROOT: ndvi as a consolidated cube (with its zonal
+integral images), rain as per-season .npy files, so both EOLayers.get_array paths are covered;
+their `cold` cases clear LAYER_CACHE and drop the file from the OS page cache before each read. The /region/{id}/timeseries cases
+call the ASGI app in-process (no HTTP client, no network).
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BENCH_REGION = "BENCH_Synthetic"
+PLAN_MIXES = ("fallow", "mixed", "irrigated")
+TICK_SIZES = (32, 256, 1024)
+MIN_SECONDS = 0.3   # time per case (after warm-up), at least MIN_REPEATS calls
+MIN_REPEATS = 5
+
+
+# ---- fixtures ----
+def make_game(size: int, mix: str = "mixed"):
+    from .sim.engine import new_game_state, apply_plan_arrays
+    from .sim.manifests import CROP_NAMES
+    from .models import PLAN_FLAG_IRRIGATION, PLAN_FLAG_DRAINAGE
+
+    gs = new_game_state("california", 1337, size)
+    rng = np.random.default_rng(size)
+    if mix == "mixed":
+        crop = rng.integers(0, len(CROP_NAMES), (size, size)).astype(np.uint8)
+        flags = ((rng.random((size, size)) < 0.3) * PLAN_FLAG_IRRIGATION
+                 | (rng.random((size, size)) < 0.1) * PLAN_FLAG_DRAINAGE).astype(np.uint8)
+        apply_plan_arrays(gs.farm, crop, flags)
+    elif mix == "irrigated":
+        crop = np.full((size, size), CROP_NAMES.index("maize"), dtype=np.uint8)
+        apply_plan_arrays(gs.farm, crop, np.full((size, size), PLAN_FLAG_IRRIGATION | PLAN_FLAG_DRAINAGE, np.uint8))
+    return gs
+
+
+def make_region(root: Path, width: int = 200, height: int = 200, years: int = 20) -> Path:
+    """Synthetic EO region under root/BENCH_REGION (deterministic)."""
+    from .eo import zonal
+    from .eo.cube import commit_cube, create_cube
+    from .eo.sources import RegionStore
+
+    region = root / BENCH_REGION
+    store = RegionStore(region_id=BENCH_REGION, root=region)
+    region.mkdir(parents=True, exist_ok=True)
+    store.meta_json().write_text(json.dumps({"width": width, "height": height, "seasons_per_year": 4,
+                                             "years": years}), encoding="utf-8")
+    rng = np.random.default_rng(0)
+    t = years * 4
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = 0.45 + 0.25 * np.sin(x / 17) * np.cos(y / 23)
+    cube = create_cube(store.layer_cube("ndvi"), (t, height, width))
+    for s in range(t):
+        cube[s] = np.clip(base + 0.2 * np.sin(2 * np.pi * s / 4) + rng.normal(0, 0.03, base.shape), 0, 1)
+    commit_cube(store.layer_cube("ndvi"), cube)
+    zonal.build(store, "ndvi")
+    for s in range(t):
+        p = store.layer_npy("rain", s)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        np.save(p, rng.gamma(2.0, 60.0, (height, width)).astype(np.float32))
+    return region
+
+
+def _drop_page_cache(path: Path) -> None:
+    """Ask the OS to drop the file's cached pages, so the next read goes to disk (Linux; no-op elsewhere)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def asgi_call(app, method: str, path: str, query: str = "", body: bytes = b"") -> tuple[int, bytes]:
+    """One request straight into the ASGI app; returns (status, body)."""
+    out = {"status": 0, "body": []}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            out["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            out["body"].append(message.get("body", b""))
+
+    headers = [(b"content-type", b"application/json")] if body else []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+             "root_path": "", "headers": headers, "client": ("bench", 0), "server": ("bench", 80)}
+    asyncio.run(app(scope, receive, send))
+    return out["status"], b"".join(out["body"])
+
+
+# ---- cases: name -> () -> callable to time ----
+def cases(data_root: Path) -> dict:
+    out = {}
+
+    for size in (32, 128, 512):
+        def setup(size=size):
+            from .sim.engine import new_game_state
+            return lambda: new_game_state("california", 1337, size)
+        out[f"new_game_state[size={size}]"] = setup
+
+    for size in TICK_SIZES:
+        for mix in PLAN_MIXES:
+            def setup(size=size, mix=mix):
+                from .sim.engine import apply_plan_and_tick
+                gs = make_game(size, mix)
+                return lambda: apply_plan_and_tick(gs)
+            out[f"apply_plan_and_tick[size={size},plan={mix}]"] = setup
+
+    for layer in ("ndvi", "moisture", "salinity", "fertility"):
+        def setup(layer=layer):
+            gs = make_game(512)
+            return lambda: gs.farm.rasters(layer)
+        out[f"farm_rasters[size=512,layer={layer}]"] = setup
+
+    for size in (256, 1024):
+        def setup(size=size):
+            from .bundle import encode_bundle
+            gs = make_game(size)
+            return lambda: encode_bundle(gs)
+        out[f"encode_bundle[size={size}]"] = setup
+
+        def setup(size=size):
+            from .sim.render import render_raster_png
+            arr = make_game(size).farm.rasters("ndvi")
+            return lambda: render_raster_png(arr)
+        out[f"render_raster_png[size={size}]"] = setup
+
+        def setup(size=size):
+            from .eo.encode import to_grayscale_png
+            arr = np.random.default_rng(size).random((size, size), dtype=np.float32)
+            return lambda: to_grayscale_png(arr, 0.0, 1.0)
+        out[f"to_grayscale_png[size={size}]"] = setup
+
+    for layer, kind in (("ndvi", "cube"), ("rain", "npy")):
+        def setup(layer=layer, kind=kind):
+            from .eo.sources import EOLayers, LAYER_CACHE, RegionStore
+            store = RegionStore(region_id=BENCH_REGION, root=data_root / BENCH_REGION)
+            season = iter(range(10 ** 9))
+
+            def cold():
+                t = next(season) % 80
+                LAYER_CACHE.clear()  # unmaps every file mapped through sources.mapped()
+                _drop_page_cache(store.layer_cube(layer) if kind == "cube" else store.layer_npy(layer, t))
+                return np.asarray(EOLayers(store).get_array(layer, t)).sum()
+            return cold
+        out[f"eo_get_array[{kind},cold]"] = setup
+
+        def setup(layer=layer):
+            from .eo.sources import EOLayers, RegionStore
+            repo = EOLayers(RegionStore(region_id=BENCH_REGION, root=data_root / BENCH_REGION))
+            repo.get_array(layer, 3)
+            return lambda: np.asarray(repo.get_array(layer, 3)).sum()
+        out[f"eo_get_array[{kind},warm]"] = setup
+
+    def route(method, path, query="", body=b""):
+        def setup():
+            from .main import app
+            status, payload = asgi_call(app, method, path, query, body)
+            if status != 200:
+                raise RuntimeError(f"{method} {path}?{query} -> {status}: {payload[:200]!r}")
+            return lambda: asgi_call(app, method, path, query, body)
+        return setup
+
+    ts = f"/region/{BENCH_REGION}/timeseries"
+    out["timeseries[GET,pixel]"] = route("GET", ts, "layer=ndvi&x=17&y=42")
+    out["timeseries[GET,window=32x32]"] = route("GET", ts, "layer=ndvi&x=10&y=10&w=32&h=32")
+    pts = np.random.default_rng(1).integers(0, 200, (256, 2)).tolist()
+    out["timeseries[POST,points=256]"] = route("POST", ts, body=json.dumps({"layer": "ndvi", "points": pts}).encode())
+    out["timeseries[GET,pixel,npy]"] = route("GET", ts, "layer=rain&x=17&y=42")
+    zn = f"/region/{BENCH_REGION}/zonal"
+    out["zonal[GET,rect=150x150,mean+std]"] = route("GET", zn, "layer=ndvi&x=20&y=20&w=150&h=150")
+    poly = {"layer": "ndvi", "zones": [{"points": [[10, 10], [180, 30], [120, 190], [15, 140]]}]}
+    out["zonal[POST,polygon,mean+std]"] = route("POST", zn, body=json.dumps(poly).encode())
+    return out
+
+
+def measure(fn, min_seconds: float, min_repeats: int) -> dict:
+    fn()  # warm-up (imports, caches, thread pool start)
+    gc.collect()
+    times = []
+    t_end = time.perf_counter() + min_seconds
+    while len(times) < min_repeats or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return {"median": statistics.median(times), "min": times[0],
+            "p90": times[min(len(times) - 1, int(0.9 * len(times)))],
+            "mean": statistics.fmean(times), "n": len(times)}
+
+
+def environment() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        rev = None
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "git_rev": rev,
+            **{k: v for k, v in os.environ.items() if k.startswith("SIM_")}}
+
+
+def run(args) -> int:
+    data_root = Path(tempfile.mkdtemp(prefix="farm-bench-"))
+    os.environ["DATA_ROOT"] = str(data_root)  # read when main is imported (timeseries cases)
+    min_s, min_n = (0.05, 3) if args.quick else (MIN_SECONDS, MIN_REPEATS)
+    results = {}
+    try:
+        make_region(data_root)
+        for name, setup in cases(data_root).items():
+            if args.filter and args.filter not in name:
+                continue
+            try:
+                results[name] = measure(setup(), min_s, min_n)
+            except Exception as e:  # report and keep going: one broken case should not hide the rest
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+            r = results[name]
+            line = r["error"] if "error" in r else f"{r['median'] * 1e3:10.3f} ms  (min {r['min'] * 1e3:.3f}, n={r['n']})"
+            print(f"{name:48s} {line}", flush=True)
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+    doc = {"created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "env": environment(), "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(doc, indent=2), encoding="utf-8")
+        print(f"wrote {args.out}")
+    return 1 if any("error" in r for r in results.values()) else 0
+
+
+def compare(args) -> int:
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))["results"]
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))["results"]
+    regressions = 0
+    for name in sorted(set(base) | set(new)):
+        b, n = base.get(name, {}), new.get(name, {})
+        if "median" not in b or "median" not in n:
+            print(f"{name:48s} {'only in base' if name not in new else 'only in new' if name not in base else 'error'}")
+            continue
+        change = n["median"] / b["median"] - 1.0
+        flag = ""
+        if change > args.threshold:
+            flag, regressions = "REGRESSION", regressions + 1
+        elif change < -args.threshold:
+            flag = "faster"
+        print(f"{name:48s} {b['median'] * 1e3:10.3f} -> {n['median'] * 1e3:10.3f} ms  {change:+7.1%}  {flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the benchmarks")
+    r.add_argument("--out", help="write results to this JSON file")
+    r.add_argument("--filter", help="only cases whose name contains this")
+    r.add_argument("--quick", action="store_true", help="fewer repeats (smoke run, noisy numbers)")
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown of the median (fraction)")
+    args = ap.parse_args(argv)
+    return run(args) if args.cmd == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Turn bundle (GET /game/{gid}/bundle): the public state and all farm layers in one binary body,
+so a client refreshes a turn with one request instead of /state plus one /raster per layer.
+
+Body (little-endian):
+    magic     4 bytes  b"FNBD"
+    version   u8       BUNDLE_VERSION
+    n_layers  u8
+    size      u16      farm is size x size
+    json_len  u32
+    json      json_len bytes of UTF-8 JSON: {"state": GameState.public(), "layers": [names]}
+    pad       zero bytes up to a multiple of 8 from the start of the body
+    rasters   n_layers * size * size uint8, layer-major then row-major (render.quantize values)
+
+The rasters are aligned so a client can view them in place (new Uint8Array(buf, offset, ...)).
+The body is built in one preallocated buffer: header and JSON are written in front and the layers
+are quantized straight into the rest, so with BUNDLE_MEMORYVIEW (default on) the response is a
+memoryview of that buffer and is never copied.
+"""
+import json
+import os
+import struct
+import numpy as np
+
+from .metrics import timed
+from .models import FARM_LAYERS
+from .sim.render import quantize_into
+
+BUNDLE_VERSION = 1
+BUNDLE_MEMORYVIEW = os.getenv("BUNDLE_MEMORYVIEW", "1") not in ("0", "false", "no")
+MAGIC = b"FNBD"
+MEDIA_TYPE = "application/x-farm-bundle"
+_HEAD = struct.Struct("<4sBBHI")
+_ALIGN = 8
+
+
+def check_layers(layers) -> str | None:
+    bad = [name for name in layers if name not in FARM_LAYERS]
+    if bad:
+        return f"Unknown layer(s) {', '.join(bad)}. Expected: {', '.join(FARM_LAYERS)}"
+    if len(set(layers)) != len(layers):
+        return "layers must not repeat"
+    return None
+
+
+@timed("bundle")
+def encode_bundle(gs, layers=FARM_LAYERS) -> memoryview:
+    layers = tuple(layers)
+    size = gs.farm.size
+    head = json.dumps({"state": gs.public(), "layers": list(layers)}, separators=(",", ":")).encode("utf-8")
+    offset = -(-(_HEAD.size + len(head)) // _ALIGN) * _ALIGN
+    buf = bytearray(offset + len(layers) * size * size)
+    _HEAD.pack_into(buf, 0, MAGIC, BUNDLE_VERSION, len(layers), size, len(head))
+    buf[_HEAD.size:_HEAD.size + len(head)] = head
+    out = np.frombuffer(buf, np.uint8, offset=offset).reshape(len(layers), size, size)
+    quantize_into(gs.farm, layers, out)
+    return memoryview(buf)
+
+
+def decode_bundle(data) -> tuple[dict, dict]:
+    """(state, {layer: uint8 (size, size)}); the arrays are views of `data`."""
+    magic, version, n_layers, size, json_len = _HEAD.unpack_from(data)
+    if magic != MAGIC or version != BUNDLE_VERSION:
+        raise ValueError("not a farm bundle")
+    head = json.loads(bytes(data[_HEAD.size:_HEAD.size + json_len]))
+    offset = -(-(_HEAD.size + json_len) // _ALIGN) * _ALIGN
+    rasters = np.frombuffer(data, np.uint8, n_layers * size * size, offset).reshape(n_layers, size, size)
+    return head["state"], dict(zip(head["layers"], rasters))
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple
+import hashlib
+import os
+import threading
+
+
+def _sizeof(value: Any) -> int:
+    n = getattr(value, "nbytes", None)
+    if n is None:
+        n = len(value)
+    return int(n)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a byte budget.
+    Size of an entry = value.nbytes (numpy) or len(value) (bytes); entries are evicted
+    least-recently-used first until the total fits into max_bytes.
+    """
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = _sizeof):
+        self.max_bytes = int(max_bytes)
+        self._sizeof = sizeof
+        self._items: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return value  # larger than the whole budget: serve it, don't keep it
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, sz) = self._items.popitem(last=False)
+                self._bytes -= sz
+                self.evictions += 1
+        return value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        # loader runs outside the lock; two concurrent misses may both load, last one wins.
+        # A loader returning None is not cached.
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, match: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [k for k in self._items if match(k)]
+            for k in keys:
+                self._bytes -= self._items.pop(k)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+
+class EncodedRaster(NamedTuple):
+    """Encoded image bytes plus a strong ETag (content hash)."""
+    body: bytes
+    etag: str
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body)
+
+    @classmethod
+    def of(cls, body: bytes) -> "EncodedRaster":
+        return cls(body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+# Encoded rasters in front of eo/encode.py and sim/render.py (see main.py). Keys carry what
+# makes an entry stale, so old ones are never hit again and just age out of the LRU:
+#   ("game", gid, store revision, turn, layer, format, level)
+#   ("eo", region, layer, season, format, level, mode, source mtime, climatology mtime)
+#   ("tile", region, layer, season, z, x, y, format, level, tile data mtime)
+RASTER_CACHE = LRUCache(int(os.getenv("RASTER_CACHE_BYTES", str(64 * 1024 * 1024))))
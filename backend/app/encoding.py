@@ -0,0 +1,117 @@
+"""
+Raster encodings shared by the EO (eo/encode.py) and farm (sim/render.py) endpoints.
+
+  png   grayscale PNG, zlib level 0..9 (9 also runs Pillow's optimize pass = the old default)
+  webp  lossless grayscale WebP
+  u8    raw uint8 bytes, row-major (H*W)
+  f16   raw little-endian float16 0..1, row-major (H*W), NaN = no data
+
+Raw formats carry their shape in X-Raster-* response headers so the client can upload the
+body straight into a texture.
+
+Benchmark all modes on synthetic and farm-like rasters:
+    python -m backend.app.encoding [--size 512] [--repeat 5]
+"""
+import io
+import os
+import numpy as np
+from PIL import Image, features
+
+FORMATS = ("png", "webp", "u8", "f16")
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "u8": "application/octet-stream",
+    "f16": "application/octet-stream",
+}
+PNG_LEVEL = int(os.getenv("RASTER_PNG_LEVEL", "6"))
+
+
+def check_format(fmt: str, level: int | None = None) -> str | None:
+    """Error message for an unsupported format/level, None if fine."""
+    if fmt not in FORMATS:
+        return f"Unknown format '{fmt}'. Expected one of: {', '.join(FORMATS)}"
+    if fmt == "webp" and not features.check("webp"):
+        return "WebP is not supported by this Pillow build"
+    if level is not None and not 0 <= level <= 9:
+        return "level must be 0..9"
+    return None
+
+
+def encode_raster(u8: np.ndarray, fmt: str = "png", level: int | None = None,
+                  unit: np.ndarray | None = None) -> bytes:
+    """
+    u8:   quantized raster (H,W) uint8, used by png/webp/u8
+    unit: the same raster as float 0..1 (NaN allowed), used by f16
+    """
+    if fmt == "u8":
+        return np.ascontiguousarray(u8, dtype=np.uint8).tobytes()
+    if fmt == "f16":
+        return np.ascontiguousarray(unit, dtype="<f2").tobytes()
+    im = Image.fromarray(np.ascontiguousarray(u8, dtype=np.uint8), mode="L")
+    buf = io.BytesIO()
+    if fmt == "webp":
+        im.save(buf, format="WEBP", lossless=True, method=0)
+    else:
+        level = PNG_LEVEL if level is None else level
+        im.save(buf, format="PNG", compress_level=level, optimize=level >= 9)
+    return buf.getvalue()
+
+
+def raw_headers(fmt: str, shape: tuple) -> dict:
+    if fmt not in ("u8", "f16"):
+        return {}
+    return {
+        "X-Raster-Shape": ",".join(str(d) for d in shape),
+        "X-Raster-Dtype": "uint8" if fmt == "u8" else "float16",
+        "X-Raster-Byte-Order": "little",
+    }
+
+
+def benchmark(arrays: dict, repeat: int = 5) -> list[dict]:
+    """Encode time (best of `repeat`, ms) and size for every mode on each 0..1 array."""
+    import time
+    modes = [("png", lvl) for lvl in (0, 1, 6, 9)] + [("u8", None), ("f16", None)]
+    if features.check("webp"):
+        modes.insert(4, ("webp", None))
+    rows = []
+    for name, unit in arrays.items():
+        u8 = (np.clip(unit, 0, 1) * 255).astype(np.uint8)
+        for fmt, level in modes:
+            best, size = float("inf"), 0
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                size = len(encode_raster(u8, fmt, level, unit))
+                best = min(best, time.perf_counter() - t0)
+            rows.append({"array": name, "shape": list(unit.shape), "format": fmt, "level": level,
+                         "ms": round(best * 1000, 3), "bytes": size})
+    return rows
+
+
+def sample_arrays(size: int) -> dict:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size] / size
+    smooth = 0.5 + 0.25 * np.sin(6 * x) * np.cos(4 * y)
+    return {
+        "smooth": smooth.astype(np.float32),
+        "noisy": np.clip(smooth + rng.normal(0, 0.05, smooth.shape), 0, 1).astype(np.float32),
+        "blocky": (np.floor(x * 8) / 8 * 0.5 + np.floor(y * 8) / 16).astype(np.float32),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    ap = argparse.ArgumentParser(description="Benchmark raster encodings")
+    ap.add_argument("--size", type=int, default=512)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="print JSON rows instead of a table")
+    args = ap.parse_args()
+    rows = benchmark(sample_arrays(args.size), args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=1))
+    else:
+        print(f"{'array':8} {'format':6} {'level':>5} {'ms':>9} {'bytes':>10}")
+        for r in rows:
+            lvl = "" if r["level"] is None else r["level"]
+            print(f"{r['array']:8} {r['format']:6} {lvl!s:>5} {r['ms']:9.3f} {r['bytes']:10d}")
@@ -0,0 +1,101 @@
+"""
+Per-pixel climatology of a layer: for every season of the year (S1..S4) the mean, std and
+quantiles over all years, stored next to the cube as
+
+    layers/<layer>/climatology.npy   float32 (seasons_per_year, len(STATS), H, W)
+
+with STATS = ("mean", "std", "q0", "q5", ..., "q100") in that order (q0/q100 = min/max).
+NaN seasons (no data) are skipped; a pixel with no data at all is NaN.
+
+Built offline (eo/ingest.py does it after writing a cube, or run it by hand):
+    python -m backend.app.eo.climatology backend/data/<region> [ndvi rain dry temp]
+
+/region/{id}/layer?mode=anomaly|zscore|percentile then compares one season against the
+baseline of its season of the year (see anomaly()) instead of clients pulling every year.
+"""
+from pathlib import Path
+import os
+import sys
+import numpy as np
+
+from .cube import commit_cube, create_cube
+from .sources import EOLayers, GridMeta, LayerNotFoundError, RegionStore
+
+QUANTILES = (0, 5, 10, 25, 50, 75, 90, 95, 100)
+STATS = ("mean", "std") + tuple(f"q{q}" for q in QUANTILES)
+MODES = ("raw", "anomaly", "zscore", "percentile")
+CLIM_ROWS = int(os.getenv("CLIM_ROWS", "128"))  # rows per read while building (bounds memory)
+
+
+def _stats(block: np.ndarray) -> np.ndarray:
+    """(years, h, w) -> (len(STATS), h, w)"""
+    out = np.full((len(STATS),) + block.shape[1:], np.nan, dtype=np.float32)
+    valid = np.isfinite(block).any(axis=0)
+    if valid.any():
+        v = block[:, valid]
+        out[0, valid] = np.nanmean(v, axis=0)
+        out[1, valid] = np.nanstd(v, axis=0)
+        out[2:, valid] = np.nanquantile(v, np.array(QUANTILES) / 100.0, axis=0)
+    return out
+
+
+def build(store: RegionStore, layer: str, grid: GridMeta | None = None) -> Path:
+    """Compute and atomically write the layer's climatology (from the cube or per-season files)."""
+    repo = EOLayers(store, grid)
+    grid, per_year = repo.grid, repo.grid.seasons_per_year
+    t = repo.seasons(layer)
+    path = store.layer_climatology(layer)
+    out = create_cube(path, (per_year, len(STATS), grid.height, grid.width))
+    for y0 in range(0, grid.height, CLIM_ROWS):
+        y1 = min(grid.height, y0 + CLIM_ROWS)
+        try:
+            win = repo.window(layer, 0, y0, grid.width, y1)  # (T, rows, W)
+        except LayerNotFoundError:  # per-season files with gaps: read what exists
+            win = np.stack([_season_or_nan(repo, layer, s, y0, y1) for s in range(t)])
+        for s in range(per_year):
+            out[s, :, y0:y1] = _stats(win[s::per_year])
+    return commit_cube(path, out)
+
+
+def _season_or_nan(repo: EOLayers, layer: str, season: int, y0: int, y1: int) -> np.ndarray:
+    try:
+        return repo.get_array(layer, season)[y0:y1]
+    except LayerNotFoundError:
+        return np.full((y1 - y0, repo.grid.width), np.nan, dtype=np.float32)
+
+
+def anomaly(value: np.ndarray, clim: np.ndarray, mode: str) -> np.ndarray:
+    """
+    value: (H, W) one season; clim: (len(STATS), H, W) of its season of the year.
+    anomaly = value - mean, zscore = anomaly / std (NaN where std is 0), percentile = 0..100
+    interpolated between the stored quantiles (clipped to 0/100 outside min..max).
+    """
+    value = np.asarray(value, dtype=np.float32)
+    if mode == "raw":
+        return value
+    mean, std = clim[0], clim[1]
+    if mode == "anomaly":
+        return value - mean
+    if mode == "zscore":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(std > 0, (value - mean) / std, np.nan).astype(np.float32)
+    if mode == "percentile":
+        q = clim[2:]
+        levels = np.asarray(QUANTILES, dtype=np.float32)
+        # bracket q[i] <= value < q[i+1] per pixel, then linear interpolation inside it
+        i = np.clip((q <= value).sum(axis=0) - 1, 0, len(QUANTILES) - 2)
+        lo = np.take_along_axis(q, i[None], 0)[0]
+        hi = np.take_along_axis(q, i[None] + 1, 0)[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frac = np.clip(np.where(hi > lo, (value - lo) / (hi - lo), 0.5), 0.0, 1.0)
+        pct = levels[i] + frac * (levels[i + 1] - levels[i])
+        return np.where(np.isfinite(value) & np.isfinite(lo), pct, np.nan).astype(np.float32)
+    raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(MODES)}")
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1])
+    st = RegionStore(region_id=root.name, root=root)
+    for lyr in sys.argv[2:] or ["ndvi", "rain", "dry", "temp"]:
+        if (root / "layers" / lyr).exists():
+            print(build(st, lyr))
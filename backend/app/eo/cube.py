@@ -0,0 +1,50 @@
+"""
+Consolidated per-layer cubes: layers/<layer>/cube.npy, float32, shape (T,H,W), C-order.
+A pixel's time series is then one strided read of T values from a memory-mapped file.
+
+Consolidate existing per-season files (layers/<layer>/t_<season>.npy):
+    python -m backend.app.eo.cube backend/data/<region> ndvi rain dry temp
+"""
+from pathlib import Path
+import os
+import sys
+import numpy as np
+
+from .sources import GridMeta, RegionStore
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_suffix(".tmp.npy")
+
+
+def create_cube(path: Path, shape: tuple, dtype=np.float32) -> np.memmap:
+    """Writable cube (float32 by default) backed by <path>.tmp.npy (nothing is held in RAM); finish with commit_cube."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(_tmp_path(path), mode="w+", dtype=dtype, shape=shape)
+
+
+def commit_cube(path: Path, cube: np.memmap) -> Path:
+    """Flush and atomically rename into place, so memory-mapped readers never see a half-written file."""
+    cube.flush()
+    del cube
+    os.replace(_tmp_path(path), path)
+    return path
+
+
+def consolidate(store: RegionStore, layer: str, grid: GridMeta | None = None) -> Path:
+    """Stack t_0..t_{T-1}.npy into one cube; seasons without a file are NaN."""
+    grid = grid or store.grid_meta()
+    path = store.layer_cube(layer)
+    out = create_cube(path, (grid.seasons_total, grid.height, grid.width))
+    for t in range(grid.seasons_total):
+        p = store.layer_npy(layer, t)
+        out[t] = np.load(p) if p.exists() else np.nan
+    return commit_cube(path, out)
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1])
+    st = RegionStore(region_id=root.name, root=root)
+    for lyr in sys.argv[2:] or ["ndvi", "rain", "dry", "temp"]:
+        if (root / "layers" / lyr).exists():
+            print(consolidate(st, lyr))
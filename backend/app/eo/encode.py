@@ -1,12 +1,19 @@
-import io
 import numpy as np
-from PIL import Image
 
-def to_grayscale_png(arr: np.ndarray, vmin: float, vmax: float) -> bytes:
+from ..encoding import encode_raster
+from ..metrics import timed
+
+def normalize(arr: np.ndarray, vmin: float, vmax: float) -> np.ndarray:
+    """Scale arr -> 0..1 (float32); NaN (no data) is kept."""
+    return np.clip((arr - vmin) / (vmax - vmin + 1e-9), 0, 1).astype(np.float32)
+
+@timed("eo_encode")
+def to_grayscale(arr: np.ndarray, vmin: float, vmax: float, fmt: str = "png", level: int | None = None) -> bytes:
+    """Scale arr -> uint8 0..255 and encode in any of encoding.FORMATS (f16 keeps 0..1 floats)."""
+    a = normalize(arr, vmin, vmax)
+    u8 = (np.nan_to_num(a, nan=0.0) * 255.0 + 0.5).astype(np.uint8)  # no data -> 0
+    return encode_raster(u8, fmt, level, unit=a)
+
+def to_grayscale_png(arr: np.ndarray, vmin: float, vmax: float, level: int | None = None) -> bytes:
     """Scale arr -> uint8 0..255 and encode PNG (L-mode)."""
-    a = np.clip((arr - vmin) / (vmax - vmin + 1e-9), 0, 1)
-    u8 = (a * 255.0 + 0.5).astype(np.uint8)
-    im = Image.fromarray(u8, mode="L")
-    buf = io.BytesIO()
-    im.save(buf, format="PNG", optimize=True)
-    return buf.getvalue()
+    return to_grayscale(arr, vmin, vmax, "png", level)
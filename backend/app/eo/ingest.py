@@ -0,0 +1,237 @@
+"""
+Offline ingestion: data/<region>/seasonal_utm/<product>/res_<res>/<YYYY>_S<k>_*.tif -> layer cubes.
+
+    python -m backend.app.eo.ingest backend/data/CA_SanJoaquin_West [--res 250m|25m|all] [--workers N] [--force]
+
+For every resolution this discovers the products (gpm -> rain, smap -> dry, ndvi_modis -> ndvi),
+decodes the GeoTIFFs on a process pool, resamples them onto one common grid (union of the
+product extents, snapped to the coarsest resolution so 25 m and 250 m grids nest) and writes
+  <out>/layers/<layer>/cube.npy   float32 (T,H,W), NaN where a season has no data
+  <out>/layers/<layer>/climatology.npy   per season-of-year baseline (eo/climatology.py)
+  <out>/meta.json                 GridMeta fields + per-layer coverage
+  <out>/layers/ingest_state.json  sha256 of every input, used to skip unchanged seasons
+where <out> is the region root for the default resolution (250m) and <out>/res_<res> otherwise.
+
+All inputs are expected in one projected CRS (the seasonal_utm exports are EPSG:32610), so the
+"reprojection" is an affine resample; inputs in a different CRS are rejected.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+import numpy as np
+from PIL import Image
+
+from . import climatology
+from .cube import commit_cube, create_cube
+from .resample import resample
+from .sources import DEFAULT_RES, GridMeta, RegionStore
+
+log = logging.getLogger("app.eo.ingest")
+
+# product directory -> (layer, transform to layer units)
+PRODUCTS = {
+    "gpm": ("rain", lambda a: a),                           # mm per season
+    "smap": ("dry", lambda a: np.clip(1.0 - a, 0.0, 1.0)),  # 1 - SMAP soil moisture (m3/m3)
+    "ndvi_modis": ("ndvi", lambda a: a),                    # NDVI
+}
+PRODUCTS_BY_LAYER = {layer: product for product, (layer, _) in PRODUCTS.items()}
+
+_TIF_RE = re.compile(r"^(\d{4})_S([1-4])_.+\.tif$")
+
+# GeoTIFF tags
+_TAG_PIXEL_SCALE = 33550
+_TAG_TIEPOINT = 33922
+_TAG_GEOKEYS = 34735
+_TAG_GDAL_NODATA = 42113
+_GEOKEY_PROJECTED_CRS = 3072
+
+
+def _res_meters(res: str) -> float:
+    return float(res.rstrip("m"))
+
+
+def discover(seasonal_root: Path) -> dict:
+    """{res: {layer: {(year, s): Path}}}; skips *.tmp.tif leftovers and PNG previews."""
+    found: dict = {}
+    for product, (layer, _) in PRODUCTS.items():
+        pdir = seasonal_root / product
+        if not pdir.is_dir():
+            continue
+        for rdir in sorted(pdir.glob("res_*")):
+            res = rdir.name[len("res_"):]
+            for p in sorted(rdir.iterdir()):
+                m = _TIF_RE.match(p.name)
+                if not m or p.name.endswith(".tmp.tif"):
+                    continue
+                key = (int(m.group(1)), int(m.group(2)))
+                found.setdefault(res, {}).setdefault(layer, {}).setdefault(key, p)
+    return found
+
+
+def _sha256(path: Path) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.file_digest(fh, "sha256").hexdigest()
+
+
+def _geometry(im: Image.Image) -> tuple:
+    """(x0, y0, px, py, width, height, epsg) from the GeoTIFF tags; (x0, y0) = upper-left corner."""
+    tags = im.tag_v2
+    sx, sy = tags[_TAG_PIXEL_SCALE][:2]
+    tie = tags[_TAG_TIEPOINT]
+    keys = tags.get(_TAG_GEOKEYS) or ()
+    epsg = None
+    for i in range(4, len(keys), 4):
+        if keys[i] == _GEOKEY_PROJECTED_CRS:
+            epsg = keys[i + 3]
+    return (float(tie[3] - tie[0] * sx), float(tie[4] + tie[1] * sy), float(sx), float(sy),
+            im.size[0], im.size[1], epsg)
+
+
+def read_geometry(path: Path) -> tuple:
+    with Image.open(path) as im:
+        return _geometry(im)
+
+
+def read_geotiff(path: Path) -> tuple[np.ndarray, tuple]:
+    """-> (float32 array with NaN for nodata, geometry as in _geometry)."""
+    with Image.open(path) as im:
+        geom = _geometry(im)
+        nodata = im.tag_v2.get(_TAG_GDAL_NODATA)
+        arr = np.array(im, dtype=np.float32)
+    if nodata is not None:
+        arr[arr == np.float32(float(str(nodata).strip("\x00 ")))] = np.nan
+    arr[~np.isfinite(arr)] = np.nan
+    return arr, geom
+
+
+def _decode_job(args) -> np.ndarray:
+    path, product, dst = args
+    arr, geom = read_geotiff(path)
+    return PRODUCTS[product][1](resample(arr, geom, dst))
+
+
+def _extent(geoms: list[tuple], snap: float) -> tuple:
+    """Union extent (xmin, ymin, xmax, ymax) of all inputs, snapped outward to `snap`."""
+    xmin = min(g[0] for g in geoms)
+    ymax = max(g[1] for g in geoms)
+    xmax = max(g[0] + g[2] * g[4] for g in geoms)
+    ymin = min(g[1] - g[3] * g[5] for g in geoms)
+    return (math.floor(xmin / snap) * snap, math.floor(ymin / snap) * snap,
+            math.ceil(xmax / snap) * snap, math.ceil(ymax / snap) * snap)
+
+
+def ingest_resolution(region_root: Path, res: str, files: dict, extent: tuple, epsg: int,
+                      pool: ProcessPoolExecutor, force: bool = False) -> dict:
+    store = RegionStore(region_id=region_root.name, root=region_root).resolution(res)
+    layers_dir = store.root / "layers"
+    state_path = layers_dir / "ingest_state.json"
+    old_state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() and not force else {}
+
+    products = {PRODUCTS_BY_LAYER[layer]: seasons for layer, seasons in files.items()}
+    all_paths = [p for seasons in files.values() for p in seasons.values()]
+    xmin, ymin, xmax, ymax = extent
+    pixel = _res_meters(res)
+    dst = (xmin, ymax, pixel, int(round((xmax - xmin) / pixel)), int(round((ymax - ymin) / pixel)))
+    years = sorted({y for seasons in files.values() for (y, _) in seasons})
+    start_year, n_years = years[0], years[-1] - years[0] + 1
+    grid = GridMeta(width=dst[3], height=dst[4], seasons_per_year=4, years=n_years, start_year=start_year,
+                    origin_x=dst[0], origin_y=dst[1], pixel_size=dst[2], crs=f"EPSG:{epsg}")
+    # old slices stay valid as long as the spatial grid is unchanged (new years only extend T)
+    spatial = ("width", "height", "origin_x", "origin_y", "pixel_size", "crs")
+    old_grid = old_state.get("grid", {})
+    same_grid = all(old_grid.get(k) == getattr(grid, k) for k in spatial)
+
+    shas = dict(zip(all_paths, pool.map(_sha256, all_paths)))
+    new_state = {"grid": asdict(grid), "layers": {}}
+    summary = {}
+    for product, seasons in products.items():
+        layer = PRODUCTS[product][0]
+        old_layer = old_state.get("layers", {}).get(layer, {}) if same_grid else {}
+        old_cube_path = store.layer_cube(layer)
+        old_cube = np.load(old_cube_path, mmap_mode="r") if old_layer and old_cube_path.exists() else None
+        old_start = old_grid.get("start_year")
+        shape = (grid.seasons_total, grid.height, grid.width)
+        layer_state = {f"{year}_S{s}": {"file": path.name, "sha256": shas[path]}
+                       for (year, s), path in sorted(seasons.items())}
+        new_state["layers"][layer] = layer_state
+        # nothing changed: leave cube and climatology (and their mtimes, see tiles.py) alone
+        if (old_cube is not None and old_cube.shape == shape and old_start == start_year
+                and old_layer == layer_state and store.layer_climatology(layer).exists()):
+            del old_cube
+            summary[layer] = {"product": product, "seasons": len(seasons), "decoded": 0, "reused": len(seasons)}
+            continue
+
+        cube = create_cube(old_cube_path, shape)
+        cube[:] = np.nan
+        todo, reused = [], 0
+        for (year, s), path in sorted(seasons.items()):
+            key = f"{year}_S{s}"
+            t = (year - start_year) * 4 + (s - 1)
+            prev = old_layer.get(key)
+            if old_cube is not None and prev and prev["sha256"] == shas[path]:
+                old_t = (year - old_start) * 4 + (s - 1)
+                if 0 <= old_t < old_cube.shape[0]:
+                    cube[t] = old_cube[old_t]
+                    reused += 1
+                    continue
+            todo.append((t, path))
+        decoded = pool.map(_decode_job, [(p, product, dst) for _, p in todo])
+        for (t, _), arr in zip(todo, decoded):
+            cube[t] = arr
+        del old_cube
+        commit_cube(old_cube_path, cube)
+        climatology.build(store, layer, grid)
+        summary[layer] = {"product": product, "seasons": len(seasons), "decoded": len(todo), "reused": reused}
+
+    meta = asdict(grid)
+    meta["resolution"] = res
+    meta["layers"] = summary
+    store.meta_json().write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    state_path.write_text(json.dumps(new_state, indent=1), encoding="utf-8")
+    return meta
+
+
+def ingest_region(region_root: Path, res: str = DEFAULT_RES, workers: int | None = None,
+                  force: bool = False) -> dict:
+    found = discover(region_root / "seasonal_utm")
+    if not found:
+        raise FileNotFoundError(f"No seasonal GeoTIFFs under {region_root / 'seasonal_utm'}")
+    wanted = sorted(found) if res == "all" else [res]
+    for r in wanted:
+        if r not in found:
+            raise ValueError(f"No inputs for res_{r}; available: {', '.join(sorted(found))}")
+    out = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        # one extent for every resolution (snapped to the coarsest), so the grids nest exactly
+        paths = [p for per_res in found.values() for seasons in per_res.values() for p in seasons.values()]
+        geoms = list(pool.map(read_geometry, paths, chunksize=16))
+        epsgs = {g[6] for g in geoms}
+        if len(epsgs) != 1:
+            raise ValueError(f"Inputs are in different CRSs: {sorted(map(str, epsgs))}")
+        extent = _extent(geoms, snap=max(_res_meters(r) for r in found))
+        for r in wanted:
+            t0 = time.perf_counter()
+            out[r] = ingest_resolution(region_root, r, found[r], extent, next(iter(epsgs)), pool, force=force)
+            log.info("[ingest] %s res_%s done in %.1fs: %s", region_root.name, r,
+                     time.perf_counter() - t0, out[r]["layers"])
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("region_root", type=Path)
+    ap.add_argument("--res", default=DEFAULT_RES, help="resolution to ingest (e.g. 250m, 25m) or 'all'")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--force", action="store_true", help="ignore ingest_state.json and decode everything")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    result = ingest_region(args.region_root, args.res, args.workers, args.force)
+    print(json.dumps({r: m["layers"] for r, m in result.items()}, indent=2))
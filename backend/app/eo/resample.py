@@ -0,0 +1,74 @@
+"""
+Grid-to-grid resampling in one projected CRS (used by eo/ingest.py and eo/tiles.py).
+
+Geometries are plain tuples so they hash into the index cache:
+  source: (x0, y0, px, py, width, height, epsg)   (x0, y0) = upper-left corner
+  target: (x0, y0, pixel, width, height)
+"""
+from functools import lru_cache
+import numpy as np
+
+
+def grid_geometry(grid, pixel: float | None = None) -> tuple:
+    """Source tuple for a GridMeta (un-georeferenced grids use pixel units at origin 0,0)."""
+    px = grid.pixel_size or 1.0
+    x0 = grid.origin_x if grid.origin_x is not None else 0.0
+    y0 = grid.origin_y if grid.origin_y is not None else grid.height * px
+    return (float(x0), float(y0), float(px), float(px), grid.width, grid.height, None)
+
+
+@lru_cache(maxsize=32)
+def _resample_index(src: tuple, dst: tuple):
+    """
+    Source->target mapping, computed once per (source geometry, grid) in each process.
+    Finer source: every source pixel goes to the target cell containing its centre (block reduce).
+    Coarser/equal source: every target cell samples the source pixel containing its centre.
+    """
+    sx0, sy0, spx, spy, sw, sh, _ = src
+    gx0, gy0, gpx, gw, gh = dst
+    if spx < gpx:
+        cols = np.floor((sx0 + (np.arange(sw) + 0.5) * spx - gx0) / gpx).astype(np.int64)
+        rows = np.floor((gy0 - (sy0 - (np.arange(sh) + 0.5) * spy)) / gpx).astype(np.int64)
+        ok = (rows[:, None] >= 0) & (rows[:, None] < gh) & (cols[None, :] >= 0) & (cols[None, :] < gw)
+        target = np.where(ok, rows[:, None] * gw + cols[None, :], -1).ravel()
+        return "reduce", target
+    cols = np.floor((gx0 + (np.arange(gw) + 0.5) * gpx - sx0) / spx).astype(np.int64)
+    rows = np.floor((sy0 - (gy0 - (np.arange(gh) + 0.5) * gpx)) / spy).astype(np.int64)
+    ok = (rows[:, None] >= 0) & (rows[:, None] < sh) & (cols[None, :] >= 0) & (cols[None, :] < sw)
+    source = np.where(ok, rows[:, None] * sw + cols[None, :], -1).ravel()
+    return "nearest", source
+
+
+def _mode(target: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Most frequent value per target cell (ties -> smallest value); NaN where a cell gets nothing."""
+    out = np.full(n, np.nan)
+    if target.size == 0:
+        return out
+    order = np.lexsort((values, target))
+    t, v = target[order], values[order]
+    starts = np.r_[True, (t[1:] != t[:-1]) | (v[1:] != v[:-1])]
+    run_len = np.bincount(np.cumsum(starts) - 1)
+    run_t, run_v = t[starts], v[starts]
+    o = np.lexsort((-run_len, run_t))
+    first = np.r_[True, run_t[o][1:] != run_t[o][:-1]]
+    out[run_t[o][first]] = run_v[o][first]
+    return out
+
+
+def resample(arr: np.ndarray, src: tuple, dst: tuple, how: str = "mean") -> np.ndarray:
+    """Resample arr (source geometry) onto dst; how = mean|mode when the source is finer."""
+    gw, gh = dst[3], dst[4]
+    kind, index = _resample_index(src, dst)
+    flat = np.asarray(arr).ravel()
+    if kind == "reduce":
+        valid = (index >= 0) & np.isfinite(flat)
+        if how == "mode":
+            out = _mode(index[valid], flat[valid], gw * gh)
+        else:
+            sums = np.bincount(index[valid], weights=flat[valid], minlength=gw * gh)
+            counts = np.bincount(index[valid], minlength=gw * gh)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out = np.where(counts > 0, sums / counts, np.nan)
+    else:
+        out = np.where(index >= 0, flat[np.maximum(index, 0)], np.nan)
+    return out.reshape(gh, gw).astype(np.float32)
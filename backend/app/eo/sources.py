@@ -1,18 +1,58 @@
 from dataclasses import dataclass
 from pathlib import Path
+import json
+import os
 import numpy as np
 
+from ..cache import LRUCache
+from ..metrics import timed
+
+# Process-wide cache of seasonal layers keyed by (region, layer, season|kind, file mtime).
+# Arrays are memory-mapped, so the budget mostly bounds how many files stay mapped.
+LAYER_CACHE = LRUCache(int(os.getenv("EO_CACHE_BYTES", str(256 * 1024 * 1024))))
+
+
+def mapped(key: tuple, path: Path, load) -> np.ndarray:
+    """
+    LAYER_CACHE entry for a memory-mapped file. The file's st_mtime_ns is part of the key, so a
+    file replaced by a re-ingest or rebuild (os.replace) is mapped again instead of serving
+    the old inode; older entries of the same key are dropped then.
+    """
+    full = key + (path.stat().st_mtime_ns,)
+    arr = LAYER_CACHE.get(full)
+    if arr is None:
+        LAYER_CACHE.invalidate(lambda k: len(k) == len(full) and k[:-1] == key)
+        arr = LAYER_CACHE.get_or_load(full, load)
+    return arr
+
+# Resolution whose ingested layers live directly under the region root; others go to res_<res>/
+DEFAULT_RES = "250m"
+
 @dataclass
 class GridMeta:
     width: int = 200
     height: int = 200
     seasons_per_year: int = 4
     years: int = 20
+    # georeference, filled in by eo/ingest.py (meta.json); season 0 = start_year S1
+    start_year: int | None = None
+    origin_x: float | None = None  # upper-left corner, CRS units
+    origin_y: float | None = None
+    pixel_size: float | None = None
+    crs: str | None = None
 
     @property
     def seasons_total(self) -> int:
         return self.years * self.seasons_per_year
 
+    @classmethod
+    def from_json(cls, path: Path) -> "GridMeta":
+        meta = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(**{k: meta[k] for k in cls.__dataclass_fields__ if k in meta})
+
+class LayerNotFoundError(FileNotFoundError):
+    """Neither a cube nor a per-season file exists for the requested layer/season."""
+
 @dataclass
 class RegionStore:
     region_id: str
@@ -22,9 +62,41 @@ class RegionStore:
         # convention: backend/data/<region>/layers/<layer>/t_<season>.npy
         return self.root / "layers" / layer / f"t_{season}.npy"
 
+    def layer_cube(self, layer: str) -> Path:
+        # consolidated time-major cube: backend/data/<region>/layers/<layer>/cube.npy, shape (T,H,W)
+        return self.root / "layers" / layer / "cube.npy"
+
+    def layer_climatology(self, layer: str) -> Path:
+        # per season-of-year baseline, see eo/climatology.py: (seasons_per_year, STATS, H, W)
+        return self.root / "layers" / layer / "climatology.npy"
+
+    def layer_sat(self, layer: str) -> Path:
+        # per-season block-local integral images for zonal stats, see eo/zonal.py
+        return self.root / "layers" / layer / "sat.npy"
+
     def meta_json(self) -> Path:
         return self.root / "meta.json"
 
+    def grid_meta(self) -> GridMeta:
+        p = self.meta_json()
+        return GridMeta.from_json(p) if p.exists() else GridMeta()
+
+    def meta_version(self) -> tuple:
+        """st_mtime_ns of meta.json and of every res_*/meta.json: changes when an ingest rewrites a grid."""
+        out = []
+        for p in [self.meta_json()] + sorted(self.root.glob("res_*/meta.json")):
+            try:
+                out.append((p.parent.name, p.stat().st_mtime_ns))
+            except OSError:
+                pass
+        return tuple(out)
+
+    def resolution(self, res: str) -> "RegionStore":
+        # layers ingested at a non-default resolution: backend/data/<region>/res_<res>/...
+        if res == DEFAULT_RES:
+            return self
+        return RegionStore(region_id=f"{self.region_id}@{res}", root=self.root / f"res_{res}")
+
 class EOLayers:
     """
     Thin repository over pre-агрегированными массивами сезонов:
@@ -33,13 +105,87 @@ class EOLayers:
     - dry:     float32 0..1 (1-SMAP)
     - temp:    float32 аномалия в °C (или σ)
     """
-    def __init__(self, store: RegionStore, grid: GridMeta = GridMeta()):
-        self.store, self.grid = store, grid
+    def __init__(self, store: RegionStore, grid: GridMeta | None = None):
+        self.store, self.grid = store, grid or store.grid_meta()
+
+    def cube(self, layer: str) -> np.ndarray | None:
+        """Memory-mapped (T,H,W) cube for the layer, or None if it was not consolidated yet."""
+        p = self.store.layer_cube(layer)
+        if not p.exists():
+            return None
+        return mapped((self.store.region_id, layer, "cube"), p, lambda: self._load_cube(p, layer))
+
+    def climatology(self, layer: str, season: int) -> np.ndarray | None:
+        """Memory-mapped baseline (STATS, H, W) for the season's season of the year, None if not built."""
+        p = self.store.layer_climatology(layer)
+        if not p.exists():
+            return None
+        clim = mapped((self.store.region_id, layer, "climatology"), p, lambda: np.load(p, mmap_mode="r"))
+        if clim.ndim != 4 or clim.shape[2:] != (self.grid.height, self.grid.width):
+            raise ValueError(f"Bad climatology shape for {layer}: {clim.shape}")
+        return clim[season % clim.shape[0]]
+
+    def source_mtime(self, layer: str) -> int | None:
+        """st_mtime_ns of the layer's data (cube, else newest per-season file); None if there is none."""
+        p = self.store.layer_cube(layer)
+        try:
+            return p.stat().st_mtime_ns
+        except OSError:
+            pass
+        try:
+            with os.scandir(p.parent) as it:
+                return max((e.stat().st_mtime_ns for e in it if e.name.startswith("t_") and e.name.endswith(".npy")),
+                           default=None)
+        except OSError:
+            return None
 
+    def seasons(self, layer: str) -> int:
+        cube = self.cube(layer)
+        return cube.shape[0] if cube is not None else self.grid.seasons_total
+
+    @timed("eo_get_array")
     def get_array(self, layer: str, season: int) -> np.ndarray:
+        """Read-only (memory-mapped) array (H,W), served from LAYER_CACHE when possible."""
+        cube = self.cube(layer)
+        if cube is not None:
+            if not 0 <= season < cube.shape[0]:
+                raise ValueError(f"Season {season} out of range for {layer} (0..{cube.shape[0] - 1})")
+            return cube[season]
+        p = self.store.layer_npy(layer, season)
+        if not p.exists():
+            raise LayerNotFoundError(f"No data for {layer}@{season} in region '{self.store.region_id}'")
+        return mapped((self.store.region_id, layer, season), p, lambda: self._load(layer, season))
+
+    def timeseries(self, layer: str, xs, ys) -> np.ndarray:
+        """
+        Values for K pixels over all seasons, shape (T,K).
+        With a cube this is one strided read per pixel column instead of T file loads.
+        """
+        xs, ys = np.asarray(xs, dtype=np.intp), np.asarray(ys, dtype=np.intp)
+        cube = self.cube(layer)
+        if cube is not None:
+            return np.asarray(cube[:, ys, xs], dtype=np.float32)
+        return np.stack([self.get_array(layer, t)[ys, xs] for t in range(self.grid.seasons_total)])
+
+    def window(self, layer: str, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Sub-window [y0:y1, x0:x1] over all seasons, shape (T,h,w)."""
+        cube = self.cube(layer)
+        if cube is not None:
+            return np.asarray(cube[:, y0:y1, x0:x1], dtype=np.float32)
+        return np.stack([self.get_array(layer, t)[y0:y1, x0:x1] for t in range(self.grid.seasons_total)])
+
+    def _load(self, layer: str, season: int) -> np.ndarray:
         p = self.store.layer_npy(layer, season)
-        arr = np.load(p)  # shape (H,W)
+        if not p.exists():
+            raise LayerNotFoundError(f"No data for {layer}@{season} in region '{self.store.region_id}'")
+        arr = np.load(p, mmap_mode="r")  # shape (H,W)
         # sanity shape
         if arr.shape != (self.grid.height, self.grid.width):
             raise ValueError(f"Bad shape for {layer}@{season}: {arr.shape}")
         return arr
+
+    def _load_cube(self, p: Path, layer: str) -> np.ndarray:
+        cube = np.load(p, mmap_mode="r")
+        if cube.ndim != 3 or cube.shape[1:] != (self.grid.height, self.grid.width):
+            raise ValueError(f"Bad cube shape for {layer}: {cube.shape}")
+        return cube
@@ -0,0 +1,181 @@
+"""
+XYZ tile pyramid over a region's EO cubes (all ingested resolutions).
+
+Level zmax has the pixel size of the finest ingested grid; every level above halves the
+resolution, and z=0 fits the whole region into one 256x256 tile. Tiles are addressed in
+the region's own grid (x to the east, y to the south, origin at the upper-left corner).
+
+Each level z of a layer is served from a (T, H_z, W_z) overview cube:
+- if an ingested grid matches the level exactly, its cube is used as is;
+- otherwise the overview is built lazily from the coarsest ingested grid that is still at
+  least as fine as the level (so 250 m data feeds the zoomed-out levels and 25 m data only
+  the zoomed-in ones), aggregating by mean or mode (viz_presets.Scale.downsample), and is
+  kept on disk under <region>/tiles/<layer>/z<z>.npy.
+Encoded PNG tiles are cached on disk next to it (<region>/tiles/<layer>/<season>/<z>/<x>/<y>.png).
+
+Build all overview cubes ahead of time:
+    python -m backend.app.eo.tiles backend/data/<region> [layer ...]
+"""
+from pathlib import Path
+import math
+import os
+import sys
+import threading
+import numpy as np
+
+from .cube import commit_cube, create_cube
+from .resample import grid_geometry, resample
+from .sources import EOLayers, RegionStore, mapped
+from .viz_presets import SCALES
+
+TILE_SIZE = 256
+
+
+class TilePyramid:
+    def __init__(self, store: RegionStore):
+        self.store = store
+        stores = [store] + [
+            RegionStore(region_id=f"{store.region_id}@{p.parent.name[len('res_'):]}", root=p.parent)
+            for p in sorted(store.root.glob("res_*/meta.json"))
+        ]
+        self.sources = [EOLayers(st) for st in stores]
+        finest = min(self.sources, key=lambda s: s.grid.pixel_size or 1.0)
+        self.base = finest.grid
+        self.base_geom = grid_geometry(self.base)
+        self.zmax = max(0, math.ceil(math.log2(max(self.base.width, self.base.height) / TILE_SIZE)))
+        self._locks: dict = {}
+        self._locks_guard = threading.Lock()
+
+    # ---- geometry ----
+    def level(self, z: int) -> tuple:
+        """Target geometry (x0, y0, pixel, width, height) of level z."""
+        f = 2 ** (self.zmax - z)
+        x0, y0, px = self.base_geom[0], self.base_geom[1], self.base_geom[2]
+        return (x0, y0, px * f, math.ceil(self.base.width / f), math.ceil(self.base.height / f))
+
+    def info(self) -> dict:
+        levels = []
+        for z in range(self.zmax + 1):
+            _, _, px, w, h = self.level(z)
+            levels.append({"z": z, "pixel_size": px, "width": w, "height": h,
+                           "tiles_x": math.ceil(w / TILE_SIZE), "tiles_y": math.ceil(h / TILE_SIZE)})
+        return {
+            "tile_size": TILE_SIZE, "minzoom": 0, "maxzoom": self.zmax,
+            "origin": [self.base_geom[0], self.base_geom[1]], "crs": self.base.crs,
+            "seasons": self.base.seasons_total, "start_year": self.base.start_year,
+            "levels": levels,
+        }
+
+    # ---- overview cubes ----
+    def _source_for(self, layer: str, z: int) -> EOLayers | None:
+        px = self.level(z)[2]
+        have = [s for s in self.sources if s.cube(layer) is not None]
+        if not have:
+            return None
+        fine_enough = [s for s in have if (s.grid.pixel_size or 1.0) <= px + 1e-6]
+        if fine_enough:
+            return max(fine_enough, key=lambda s: s.grid.pixel_size or 1.0)
+        return min(have, key=lambda s: s.grid.pixel_size or 1.0)  # only coarser data: upsample
+
+    def _season_offset(self, src: EOLayers) -> int:
+        if self.base.start_year is None or src.grid.start_year is None:
+            return 0
+        return (self.base.start_year - src.grid.start_year) * self.base.seasons_per_year
+
+    def overview_path(self, layer: str, z: int) -> Path:
+        return self.store.root / "tiles" / layer / f"z{z}.npy"
+
+    def level_cube(self, layer: str, z: int) -> tuple[np.ndarray, int] | None:
+        """(cube for level z, season offset into it) or None if the layer has no data."""
+        src = self._source_for(layer, z)
+        if src is None:
+            return None
+        src_geom = grid_geometry(src.grid)
+        dst = self.level(z)
+        if src_geom[:2] == dst[:2] and src_geom[2] == dst[2] and src_geom[4:6] == dst[3:5]:
+            return src.cube(layer), self._season_offset(src)
+        path = self.overview_path(layer, z)
+        src_path = src.store.layer_cube(layer)
+        with self._lock(layer, z):
+            if not path.exists() or path.stat().st_mtime_ns < src_path.stat().st_mtime_ns:
+                self._build_overview(src, layer, src_geom, dst, path)
+        cube = mapped((self.store.region_id, layer, f"tiles_z{z}"), path, lambda: np.load(path, mmap_mode="r"))
+        return cube, self._season_offset(src)
+
+    def _build_overview(self, src: EOLayers, layer: str, src_geom: tuple, dst: tuple, path: Path) -> None:
+        how = SCALES[layer].downsample if layer in SCALES else "mean"
+        cube = src.cube(layer)
+        out = create_cube(path, (cube.shape[0], dst[4], dst[3]))
+        for t in range(cube.shape[0]):
+            out[t] = resample(cube[t], src_geom, dst, how)
+        commit_cube(path, out)
+
+    def _lock(self, layer: str, z: int) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((layer, z), threading.Lock())
+
+    # ---- tiles ----
+    def tile(self, layer: str, season: int, z: int, x: int, y: int) -> np.ndarray | None:
+        """(TILE_SIZE, TILE_SIZE) float32, NaN outside the data; None if out of range / no data."""
+        if not 0 <= z <= self.zmax:
+            return None
+        _, _, _, w, h = self.level(z)
+        if not (0 <= x < math.ceil(w / TILE_SIZE) and 0 <= y < math.ceil(h / TILE_SIZE)):
+            return None
+        found = self.level_cube(layer, z)
+        if found is None:
+            return None
+        cube, offset = found
+        t = season + offset
+        if not 0 <= t < cube.shape[0]:
+            return None
+        out = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+        win = cube[t, y * TILE_SIZE:(y + 1) * TILE_SIZE, x * TILE_SIZE:(x + 1) * TILE_SIZE]
+        out[:win.shape[0], :win.shape[1]] = win
+        return out
+
+    def tile_path(self, layer: str, season: int, z: int, x: int, y: int, ext: str = "png") -> Path:
+        return self.store.root / "tiles" / layer / str(season) / str(z) / str(x) / f"{y}.{ext}"
+
+    def data_mtime(self, layer: str, z: int) -> int | None:
+        """st_mtime_ns of the data level z is cut from (source layer, or its overview if newer)."""
+        src = self._source_for(layer, z)
+        if src is None:
+            return None
+        mtime = src.source_mtime(layer) or 0
+        try:
+            return max(mtime, self.overview_path(layer, z).stat().st_mtime_ns)
+        except OSError:  # level served straight from the source cube
+            return mtime
+
+    def tile_bytes(self, layer: str, season: int, z: int, x: int, y: int, encode) -> bytes | None:
+        """Disk-cached encoded tile; encode(arr) -> bytes. None if the tile does not exist."""
+        if not 0 <= season < self.base.seasons_total:
+            return None  # never look up (or create) paths for arbitrary seasons
+        path = self.tile_path(layer, season, z, x, y)
+        try:
+            fresh = path.stat().st_mtime_ns >= (self.data_mtime(layer, z) or 0)
+        except OSError:
+            fresh = False
+        if fresh:
+            return path.read_bytes()
+        arr = self.tile(layer, season, z, x, y)
+        if arr is None:
+            return None
+        body = encode(arr)
+        if not np.isfinite(arr).any():
+            return body  # nothing to keep on disk (e.g. a season the source does not cover)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+        return body
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1])
+    pyramid = TilePyramid(RegionStore(region_id=root.name, root=root))
+    for lyr in sys.argv[2:] or list(SCALES):
+        for zl in range(pyramid.zmax + 1):
+            if pyramid.level_cube(lyr, zl) is not None:
+                print(lyr, zl, pyramid.level(zl))
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 class Scale:
     vmin: float
     vmax: float
+    downsample: str = "mean"  # how tile overviews aggregate pixels: mean (continuous) | mode (classes)
 
 # Пресеты нормирования: подберём базово, можно потом заменить данными из readme_for_model.md
 SCALES = {
@@ -12,3 +13,22 @@ SCALES = {
     "dry":  Scale(0.0, 1.0),     # 1-SMAP 0..1
     "temp": Scale(-3.0, 3.0),    # аномалии, ±3°C ~ разумный предел
 }
+
+# /region/{id}/layer?mode=... (eo/climatology.py): anomaly is in layer units around 0
+ANOMALY_SCALES = {
+    "ndvi": Scale(-0.3, 0.3),
+    "rain": Scale(-200.0, 200.0),
+    "dry":  Scale(-0.3, 0.3),
+    "temp": Scale(-3.0, 3.0),
+}
+ZSCORE_SCALE = Scale(-3.0, 3.0)
+PERCENTILE_SCALE = Scale(0.0, 100.0)
+
+def mode_scale(layer: str, mode: str) -> Scale:
+    if mode == "anomaly":
+        return ANOMALY_SCALES[layer]
+    if mode == "zscore":
+        return ZSCORE_SCALE
+    if mode == "percentile":
+        return PERCENTILE_SCALE
+    return SCALES[layer]
@@ -0,0 +1,205 @@
+"""
+Zonal statistics (/region/{id}/zonal) over rectangles and polygons, for every season.
+
+mean/std come from per-season summed-area tables kept next to the cube:
+
+    layers/<layer>/sat.npy   float32 (T, 3, H+1, W): channels [valid count, sum, sum of squares]
+
+Compact form: the sums are of (value - offset_t), offset_t = the season's mean, and each table
+is an inclusive prefix sum *within* its SAT_BLOCK x SAT_BLOCK block, so no entry adds up more
+than SAT_BLOCK**2 pixels and float32 keeps the precision. Row H holds offset_t (channel 0,
+column 0). A rectangle costs 4 reads per season per block it touches, whatever its size.
+
+The tables are built lazily on the first /zonal call for a layer (only the resolution the API
+serves) and rebuilt when the layer's data is newer than sat.npy; ingest does not write them.
+A polygon is rasterized once on the region grid (cell centres, masks.polygon_mask), turned
+into row runs and cached in MASK_CACHE; each run is a 1-row box of the same tables.
+
+min/max/hist need the pixel values themselves and read the window (rect) or the mask's
+pixels (polygon) from the cube; histograms use the layer's display range (viz_presets).
+
+Build by hand (e.g. to warm a server):
+    python -m backend.app.eo.zonal backend/data/<region> [ndvi rain dry temp]
+"""
+from pathlib import Path
+import os
+import sys
+import threading
+import numpy as np
+
+from ..cache import LRUCache
+from ..masks import polygon_mask
+from .cube import commit_cube, create_cube
+from .sources import EOLayers, GridMeta, LayerNotFoundError, RegionStore, mapped
+
+ZONAL_STATS = ("mean", "std", "min", "max", "hist")
+ZONAL_MAX_BINS = 256
+SAT_BLOCK = 128  # block side; counts stay exact in float32 (<= 2**14 per entry)
+# (region, height, width, polygon) -> (4, R) int64 boxes [y0, y1, x0, x1]
+MASK_CACHE = LRUCache(int(os.getenv("ZONAL_MASK_CACHE_BYTES", str(16 * 1024 * 1024))))
+
+
+def _block_prefix(a: np.ndarray, block: int) -> np.ndarray:
+    """Inclusive 2-D prefix sums restarted at every block x block block (float64 in, same shape out)."""
+    h, w = a.shape
+    nby, nbx = -(-h // block), -(-w // block)
+    pad = np.zeros((nby * block, nbx * block))
+    pad[:h, :w] = a
+    blocks = pad.reshape(nby, block, nbx, block)
+    return blocks.cumsum(axis=1).cumsum(axis=3).reshape(nby * block, nbx * block)[:h, :w]
+
+
+def build(store: RegionStore, layer: str, grid: GridMeta | None = None) -> Path:
+    """Write the layer's block-local integral images (see module docstring), one season at a time."""
+    repo = EOLayers(store, grid)
+    grid = repo.grid
+    path = store.layer_sat(layer)
+    out = create_cube(path, (repo.seasons(layer), 3, grid.height + 1, grid.width))
+    for t in range(out.shape[0]):
+        try:
+            a = np.asarray(repo.get_array(layer, t), dtype=np.float64)
+        except LayerNotFoundError:
+            a = np.full((grid.height, grid.width), np.nan)
+        valid = np.isfinite(a)
+        offset = float(a[valid].mean()) if valid.any() else 0.0
+        v = np.where(valid, a - offset, 0.0)
+        for i, part in enumerate((valid.astype(np.float64), v, v * v)):
+            out[t, i, :grid.height] = _block_prefix(part, SAT_BLOCK)
+        out[t, :, grid.height] = 0.0
+        out[t, 0, grid.height, 0] = offset
+    return commit_cube(path, out)
+
+
+_build_locks: dict = {}
+_build_locks_guard = threading.Lock()
+
+
+def table(repo: EOLayers, layer: str) -> np.ndarray:
+    """Memory-mapped tables of the layer, (re)built first if missing or older than the layer data."""
+    path = repo.store.layer_sat(layer)
+    source = repo.source_mtime(layer)
+    if source is None:
+        raise LayerNotFoundError(f"No data for {layer} in region '{repo.store.region_id}'")
+
+    def fresh() -> bool:
+        try:
+            return path.stat().st_mtime_ns >= source
+        except OSError:
+            return False
+
+    if not fresh():
+        with _build_locks_guard:
+            lock = _build_locks.setdefault(str(path), threading.Lock())
+        with lock:  # one build per layer; concurrent callers wait for it
+            if not fresh():
+                build(repo.store, layer, repo.grid)
+    sat = mapped((repo.store.region_id, layer, "sat"), path, lambda: np.load(path, mmap_mode="r"))
+    if sat.ndim != 4 or sat.shape[1:] != (3, repo.grid.height + 1, repo.grid.width):
+        raise ValueError(f"Bad integral image shape for {layer}: {sat.shape}")
+    return sat
+
+
+def rect_boxes(x: int, y: int, w: int, h: int) -> np.ndarray:
+    return np.array([[y], [y + h], [x], [x + w]], dtype=np.int64)
+
+
+def polygon_boxes(region_id: str, shape: tuple, points: list) -> np.ndarray:
+    """Row runs of the rasterized polygon as boxes, cached per (region, grid, polygon)."""
+    key = (region_id, shape, tuple(map(tuple, points)))
+
+    def load():
+        mask = polygon_mask(shape, points)  # MaskError on a bad polygon
+        edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        rows, x0 = np.nonzero(edges == 1)  # both row-major, so starts and ends pair up
+        _, x1 = np.nonzero(edges == -1)
+        return np.stack([rows, rows + 1, x0, x1]).astype(np.int64)
+    return MASK_CACHE.get_or_load(key, load)
+
+
+def box_sums(sat: np.ndarray, boxes: np.ndarray, block: int = SAT_BLOCK) -> np.ndarray:
+    """(T, 3) [count, sum, sum of squares] over the union of disjoint boxes [y0, y1, x0, x1)."""
+    y0, y1, x0, x1 = boxes
+    h = sat.shape[2] - 1
+    acc = np.zeros((sat.shape[0], 3), dtype=np.float64)
+
+    def at(ys, xs, use):  # prefix value at (ys, xs), 0 where `use` is False; (T, 3)
+        if not use.any():
+            return 0.0
+        return np.asarray(sat[:, :, ys[use], xs[use]], dtype=np.float64).sum(axis=2)
+
+    for by in range(int(y0.min()) // block, (int(y1.max()) - 1) // block + 1):
+        oy = by * block
+        for bx in range(int(x0.min()) // block, (int(x1.max()) - 1) // block + 1):
+            ox = bx * block
+            a0, a1 = np.maximum(y0, oy), np.minimum(y1, oy + block)
+            b0, b1 = np.maximum(x0, ox), np.minimum(x1, ox + block)
+            ok = (a0 < a1) & (b0 < b1)
+            if not ok.any():
+                continue
+            a0, a1, b0, b1 = a0[ok], a1[ok], b0[ok], b1[ok]
+            top, left = a0 > oy, b0 > ox
+            every = np.ones(len(a0), dtype=bool)
+            acc += (at(a1 - 1, b1 - 1, every) - at(a0 - 1, b1 - 1, top)
+                    - at(a1 - 1, b0 - 1, left) + at(a0 - 1, b0 - 1, top & left))
+    # undo the per-season offset: sum(v) = sum(v') + n*o, sum(v^2) = sum(v'^2) + 2*o*sum(v') + n*o^2
+    off = np.asarray(sat[:, 0, h, 0], dtype=np.float64)
+    n, s1, s2 = acc.T
+    return np.stack([n, s1 + n * off, s2 + 2 * off * s1 + n * off * off], axis=1)
+
+
+def box_values(repo: EOLayers, layer: str, boxes: np.ndarray) -> np.ndarray:
+    """Pixel values (T, K) of the boxes."""
+    y0, y1, x0, x1 = boxes
+    if boxes.shape[1] == 1:
+        win = repo.window(layer, int(x0[0]), int(y0[0]), int(x1[0]), int(y1[0]))
+        return win.reshape(win.shape[0], -1)
+    lengths = x1 - x0
+    ys = np.repeat(y0, lengths)
+    xs = np.repeat(x0 - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return repo.timeseries(layer, xs, ys)
+
+
+def _moments(count: np.ndarray, total: np.ndarray, sq: np.ndarray) -> tuple:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(count > 0, total / count, np.nan)
+        var = np.where(count > 0, sq / count - mean * mean, np.nan)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def zonal(repo: EOLayers, layer: str, boxes: np.ndarray, stats, bins: int = 10,
+          value_range: tuple = (0.0, 1.0)) -> dict:
+    """Per-season statistics of one zone (see module docstring); lists have one value per season."""
+    count, total, sq = box_sums(table(repo, layer), boxes).T
+    mean, std = _moments(count, total, sq)
+    out = {"pixels": int((boxes[1] - boxes[0]) @ (boxes[3] - boxes[2])), "count": np.rint(count).astype(int).tolist()}
+    if "mean" in stats:
+        out["mean"] = mean
+    if "std" in stats:
+        out["std"] = std
+    if {"min", "max", "hist"} & set(stats):
+        values = box_values(repo, layer, boxes)
+        if "min" in stats:
+            out["min"] = np.fmin.reduce(values, axis=1)  # NaN only if the whole zone is NaN
+        if "max" in stats:
+            out["max"] = np.fmax.reduce(values, axis=1)
+        if "hist" in stats:
+            out["hist"] = histogram(values, bins, *value_range)
+    return out
+
+
+def histogram(values: np.ndarray, bins: int, vmin: float, vmax: float) -> dict:
+    """Per-season counts over [vmin, vmax] in `bins` equal bins; values outside go to the end bins."""
+    t = values.shape[0]
+    valid = np.isfinite(values)
+    idx = np.clip(((values[valid] - vmin) * (bins / (vmax - vmin))).astype(np.int64), 0, bins - 1)
+    season = np.nonzero(valid)[0]
+    counts = np.bincount(season * bins + idx, minlength=t * bins).reshape(t, bins)
+    return {"edges": np.linspace(vmin, vmax, bins + 1).tolist(), "counts": counts.tolist()}
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1])
+    st = RegionStore(region_id=root.name, root=root)
+    for lyr in sys.argv[2:] or ["ndvi", "rain", "dry", "temp"]:
+        if (root / "layers" / lyr).exists():
+            print(build(st, lyr))
@@ -1,23 +1,49 @@
-from fastapi import FastAPI, HTTPException, APIRouter
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager
+import asyncio
+import json
 from pathlib import Path
 import logging
+import os
+import numpy as np
 
 # ====== game imports ======
-from .storage import store
-from .models import NewGameRequest, PlanRequest
-from .sim.engine import new_game_state, apply_plan_and_tick
-from .sim.render import render_raster_png
+from . import metrics
+from .metrics import MetricsMiddleware
+from .cache import RASTER_CACHE, EncodedRaster
+from .storage import store, GameConflictError, SQLiteStore
+from . import snapshot
+from . import stream
+from . import bundle
+from .models import (
+    NewGameRequest, PlanRequest, PlanOp, PlanOpsRequest, WhatIfRequest, OptimizeRequest, SimulateRequest, TimeseriesRequest, ZonalRequest, Zone, ZONAL_MAX_ZONES, SIM_MAX_TURNS, PLAN_CROP_KEEP, FARM_LAYERS,
+)
+from .masks import MaskError
+from .sim.engine import (
+    new_game_state, apply_plan, apply_plan_ops, apply_plan_arrays, plan_arrays, apply_plan_and_tick, simulate,
+)
+from .sim.manifests import CROP_NAMES
+from .sim import config as sim_config
+from .sim.forcing import ForcingError
+from .sim.ensemble import check_size as check_ensemble_size, run_ensemble
+from .sim.whatif import check_weights, check_size as check_whatif_size, what_if, optimize
+from .sim.render import render_raster, render_quantized
+from .encoding import MEDIA_TYPES, check_format, raw_headers
 
 # ====== EO (satellite layers) optional import (даём внятную 503, если пакета ещё нет) ======
 _EO_AVAILABLE = True
 _EO_IMPORT_ERROR_TEXT = ""
 try:
-    from .eo.sources import EOLayers, RegionStore, GridMeta
-    from .eo.encode import to_grayscale_png
-    from .eo.viz_presets import SCALES
+    from .eo.sources import EOLayers, RegionStore, GridMeta, LAYER_CACHE, LayerNotFoundError
+    from .eo.encode import to_grayscale
+    from .eo.viz_presets import SCALES, mode_scale
+    from .eo.climatology import MODES as EO_MODES, anomaly
+    from .eo import zonal
+    from .eo.tiles import TilePyramid
 except Exception as _e:
     _EO_AVAILABLE = False
     _EO_IMPORT_ERROR_TEXT = f"{type(_e).__name__}: {_e}"
@@ -35,30 +61,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# added last = outermost: times the whole request, CORS included
+app.add_middleware(MetricsMiddleware)
 
 # --------------------------------------------------------------------------------------
 # Paths for Railway (Root Directory = backend/)
 #   __file__ = backend/app/main.py
 #   BASE_DIR  = backend/
 #   APP_DIR   = backend/app/
-#   DATA_ROOT = backend/data/
+#   DATA_ROOT = backend/data/  (env DATA_ROOT overrides, e.g. the benchmark fixtures)
 #   STATIC_DIR (SPA) = backend/app/static/  (сюда копируем frontend/dist/*)
 # --------------------------------------------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parents[1]
 APP_DIR = BASE_DIR / "app"
-DATA_ROOT = BASE_DIR / "data"
+DATA_ROOT = Path(os.getenv("DATA_ROOT", str(BASE_DIR / "data")))
 
 STATIC_DIR = APP_DIR / "static"  # прод-артефакты фронта
 FRONTEND_DIR = STATIC_DIR if (STATIC_DIR / "index.html").exists() else None
 
-if FRONTEND_DIR:
-    app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="spa")
-else:
-    logging.getLogger("app.main").warning(
-        "Frontend build not found at %s. Build Vite app and copy frontend/dist/* to backend/app/static/",
-        STATIC_DIR,
-    )
-
 # --------------------------------------------------------------------------------------
 # Health
 # --------------------------------------------------------------------------------------
@@ -66,15 +86,84 @@ else:
 def healthz():
     return {"ok": True}
 
+def _store_games() -> dict:
+    st = store.stats()
+    if st["backend"] == "sqlite":
+        return {"stored": st["games"], "resident": st["resident"]}
+    return {"resident": st["resident"], "spilled": st["spilled"]}
+
+def _caches() -> dict:
+    caches = {"rasters": RASTER_CACHE}
+    if _EO_AVAILABLE:
+        caches["eo_layers"] = LAYER_CACHE
+        caches["zonal_masks"] = zonal.MASK_CACHE
+    return caches
+
+metrics.gauge("farm_games", "Games in this process's store by state (resident = in memory).", _store_games, "state")
+metrics.gauge("farm_store_resident_bytes", "Bytes of games held in memory.", lambda: store.stats()["resident_bytes"])
+metrics.gauge("farm_cache_hits_total", "Cache hits.", lambda: {k: c.hits for k, c in _caches().items()}, "cache", "counter")
+metrics.gauge("farm_cache_misses_total", "Cache misses.", lambda: {k: c.misses for k, c in _caches().items()}, "cache", "counter")
+metrics.gauge("farm_cache_evictions_total", "Cache evictions.", lambda: {k: c.evictions for k, c in _caches().items()}, "cache", "counter")
+metrics.gauge("farm_cache_hit_ratio", "hits / (hits + misses) since start.",
+              lambda: {k: c.stats()["hit_ratio"] for k, c in _caches().items()}, "cache")
+metrics.gauge("farm_cache_bytes", "Bytes held by the cache.", lambda: {k: c.stats()["bytes"] for k, c in _caches().items()}, "cache")
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text format (app/metrics.py)."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # --------------------------------------------------------------------------------------
 # Game API
 # --------------------------------------------------------------------------------------
+@app.exception_handler(GameConflictError)
+def _game_conflict(request, exc: GameConflictError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(ForcingError)
+def _forcing_unavailable(request, exc: ForcingError):
+    # an EO-anchored game whose region data went away mid-game (see sim/forcing.py)
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@contextmanager
+def _game_for_update(gid: str, turn: int | None = None):
+    """Locked game for a state change; `turn` (optional) = the turn the client saw, 409 if it moved on."""
+    with store.checkout(gid, turn) as gs:
+        if gs is None:
+            raise HTTPException(404, "game not found")
+        yield gs
+    stream.notify(gid)  # after the commit, only if the update went through
+
 @app.post("/game/new")
 def game_new(req: NewGameRequest):
-    gs = new_game_state(req.region, req.seed)
+    presets = sim_config.current().presets
+    if req.preset not in presets:
+        raise HTTPException(400, f"Unknown preset '{req.preset}'. Expected one of: {', '.join(presets)}")
+    try:
+        gs = new_game_state(req.region, req.seed, req.size, req.preset, req.eo)
+    except ForcingError as e:
+        raise HTTPException(400, str(e))
     store[gs.id] = gs
     return gs.public()
 
+@app.get("/config")
+def get_config(region: str | None = None, preset: str = "default", sha: str | None = None):
+    """
+    Current compiled config (sim/config.py): hashes, presets, ids; with `region`, its resolved
+    coefficients. `sha` selects the version a running game is pinned to (its config_sha).
+    """
+    cfg = sim_config.config_for(sha) if sha else sim_config.current()
+    if sha and cfg.config_sha != sha:
+        raise HTTPException(404, f"config {sha} is not available")
+    out = cfg.summary()
+    if region is not None:
+        if region not in cfg.region_codes or preset not in cfg.presets:
+            raise HTTPException(404, "unknown region or preset")
+        out["coefficients"] = cfg.coefficients(region, preset)
+        out["preset"] = preset
+        out["multipliers"] = {g: cfg.multiplier(preset, g) for g in cfg.multiplier_groups}
+    return out
+
 @app.get("/game/{gid}/state")
 def game_state(gid: str):
     gs = store.get(gid)
@@ -83,43 +172,331 @@ def game_state(gid: str):
     return gs.public()
 
 @app.post("/game/{gid}/plan")
-def game_plan(gid: str, req: PlanRequest):
+def game_plan(gid: str, req: PlanRequest, turn: int | None = None):
+    with _game_for_update(gid, turn) as gs:
+        apply_plan(gs.farm, req.cells)
+    return {"ok": True}
+
+@app.post("/game/{gid}/plan/ops")
+def game_plan_ops(gid: str, req: PlanOpsRequest, turn: int | None = None):
+    """
+    Bulk plan edits: {"ops": [{"shape": "rect", "rect": [x, y, w, h], "crop": "wheat"},
+    {"shape": "polygon", "points": [[x, y], ...], "irrigation": true}, {"shape": "rle", "rle": [...]},
+    {"shape": "all", ...}]} applied in order (selection rules: app/masks.py).
+    """
+    with _game_for_update(gid, turn) as gs:
+        try:
+            cells = apply_plan_ops(gs.farm, req.ops)
+        except MaskError as e:
+            raise HTTPException(400, str(e))
+    return {"ok": True, "cells": cells}
+
+_PLAN_PARTS = ("both", "crop", "flags")
+
+@app.get("/game/{gid}/plan/raw")
+def game_plan_raw(gid: str):
+    """The plan as size*size crop-index bytes followed by size*size flag bytes (row-major)."""
     gs = store.get(gid)
     if not gs:
         raise HTTPException(404, "game not found")
-    # merge plan (simple overwrite per cell)
-    for cell_id, plan in req.cells.items():
-        try:
-            idx = int(cell_id)
-        except Exception:
-            continue
-        if 0 <= idx < len(gs.farm.cells):
-            cur = gs.farm.cells[idx].plan
-            cur.crop = plan.crop or cur.crop
-            cur.irrigation = plan.irrigation if plan.irrigation is not None else cur.irrigation
-            cur.drainage = plan.drainage if plan.drainage is not None else cur.drainage
+    crop, flags = plan_arrays(gs.farm)
+    return Response(content=crop.tobytes() + flags.tobytes(), media_type="application/octet-stream",
+                    headers={"X-Farm-Size": str(gs.farm.size), "X-Crops": ",".join(CROP_NAMES)})
+
+def _plan_raw(gid: str, data: bytes, part: str, turn: int | None):
+    with _game_for_update(gid, turn) as gs:
+        n = gs.farm.size
+        want = n * n * (2 if part == "both" else 1)
+        if len(data) != want:
+            raise HTTPException(400, f"expected {want} bytes for a {n}x{n} farm (part={part}), got {len(data)}")
+        buf = np.frombuffer(data, dtype=np.uint8)
+        crop = buf[:n * n].reshape(n, n) if part in ("both", "crop") else None
+        flags = buf[-n * n:].reshape(n, n) if part in ("both", "flags") else None
+        if crop is not None and ((crop >= len(CROP_NAMES)) & (crop != PLAN_CROP_KEEP)).any():
+            raise HTTPException(400, f"crop index must be < {len(CROP_NAMES)} or {PLAN_CROP_KEEP} (keep)")
+        apply_plan_arrays(gs.farm, crop, flags)
     return {"ok": True}
 
+@app.post("/game/{gid}/plan/raw")
+async def game_plan_raw_upload(gid: str, request: Request, part: str = "both", turn: int | None = None):
+    """
+    Raw plan upload (application/octet-stream, row-major uint8):
+      part=both  -> size*size crop indices (X-Crops order of GET, 255 = keep) + size*size flags
+      part=crop | flags -> just that array
+    Flags: bit0 irrigation, bit1 drainage; 0x80 = keep the cell's flags.
+    """
+    if part not in _PLAN_PARTS:
+        raise HTTPException(400, f"Unknown part '{part}'. Expected one of: {', '.join(_PLAN_PARTS)}")
+    data = await request.body()
+    return await run_in_threadpool(_plan_raw, gid, data, part, turn)
+
 @app.post("/game/{gid}/tick")
-def game_tick(gid: str):
+def game_tick(gid: str, turn: int | None = None):
+    with _game_for_update(gid, turn) as gs:
+        apply_plan_and_tick(gs)
+        return gs.public()
+
+@app.post("/game/{gid}/simulate")
+def game_simulate(gid: str, turns: int = Query(1, ge=1, le=SIM_MAX_TURNS), req: SimulateRequest | None = None,
+                  turn: int | None = None):
+    """
+    Fast-forward `turns` seasons server-side. Optional body: {"schedule": [{"turn": 12, "cells": {...}},
+    {"season": "summer", "cells": {...}}, ...]} with plans in the /plan format.
+    Returns the final state plus the per-turn trajectory as columns.
+    """
+    with _game_for_update(gid, turn) as gs:
+        trajectory = simulate(gs, turns, req.schedule if req else ())
+        return {"state": gs.public(), "trajectory": trajectory}
+
+@app.post("/game/{gid}/ensemble")
+def game_ensemble(gid: str, seeds: int = 1000, turns: int = Query(20, ge=1, le=SIM_MAX_TURNS),
+                  req: SimulateRequest | None = None):
+    """
+    Monte Carlo run of the current plan (+ optional schedule, as in /simulate) over `seeds`
+    event seeds (gs.seed + k). The game is not modified. Returns per-turn mean and
+    percentiles of cash and scores across the members.
+    """
+    gs = store.get(gid)
+    if not gs:
+        raise HTTPException(404, "game not found")
+    err = check_ensemble_size(gs, seeds)
+    if err:
+        raise HTTPException(400, err)
+    return run_ensemble(gs, seeds, turns, req.schedule if req else ())
+
+@app.post("/game/{gid}/whatif")
+def game_whatif(gid: str, req: WhatIfRequest, turns: int = Query(4, ge=1, le=SIM_MAX_TURNS),
+                seeds: int = 1):
+    """
+    Play candidate plans ({"candidates": [{"ops": [...], "cells": {...}}, ...]}, each applied on
+    top of the current plan) from the current state in one batch; the game is not modified.
+    Returns the candidates ranked by sum(weights[m] * m) after `turns` seasons, with deltas
+    against the current plan (averaged over `seeds` event seeds).
+    """
+    gs = store.get(gid)
+    if not gs:
+        raise HTTPException(404, "game not found")
+    err = check_weights(req.weights) or check_whatif_size(gs, 1 + len(req.candidates), seeds)
+    if err:
+        raise HTTPException(400, err)
+    try:
+        return what_if(gs, req.candidates, req.weights, turns, seeds)
+    except MaskError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/game/{gid}/optimize")
+def game_optimize(gid: str, req: OptimizeRequest, turns: int = Query(4, ge=1, le=SIM_MAX_TURNS),
+                  seeds: int = 1, apply: bool = False, turn: int | None = None):
+    """
+    Search zone plans (zones x zones blocks, one crop/irrigation/drainage choice each) that
+    maximise the weighted objective of /whatif within budget_ms. Returns the best plan as
+    /plan/ops ops; apply=true also writes it into the game (`turn` as in /plan).
+    """
+    gs = store.get(gid)
+    if not gs:
+        raise HTTPException(404, "game not found")
+    err = check_weights(req.weights) or check_whatif_size(gs, req.population, seeds)
+    bad = [c for c in req.crops or () if c not in CROP_NAMES]
+    if bad:
+        err = f"Unknown crop(s) {', '.join(bad)}. Expected: {', '.join(CROP_NAMES)}"
+    if err:
+        raise HTTPException(400, err)
+    out = optimize(gs, req.weights, turns, seeds, req.zones, req.population, req.generations,
+                   req.budget_ms, req.crops)
+    if apply:
+        with _game_for_update(gid, turn) as gs:
+            apply_plan_ops(gs.farm, [PlanOp(**op) for op in out["ops"]])
+    return out
+
+@app.get("/game/{gid}/snapshot")
+def game_snapshot(gid: str, codec: str | None = None):
+    """Binary snapshot of the game (format: app/snapshot.py); codec = none | zlib | zstd."""
+    err = snapshot.check_codec(codec) if codec else None
+    if err:
+        raise HTTPException(400, err)
     gs = store.get(gid)
     if not gs:
         raise HTTPException(404, "game not found")
-    apply_plan_and_tick(gs)
+    return Response(content=snapshot.encode(gs, codec), media_type=snapshot.MEDIA_TYPE,
+                    headers={"Content-Disposition": f'attachment; filename="{gid}-t{gs.turn}.snap"'})
+
+def _restore(gid: str, data: bytes):
+    try:
+        gs = snapshot.decode(data)
+    except snapshot.SnapshotError as e:
+        raise HTTPException(400, str(e))
+    gs.id = gid
+    store[gid] = gs  # new store revision, so cached rasters of the old state are not reused
+    stream.notify(gid)
     return gs.public()
 
+@app.put("/game/{gid}/snapshot")
+async def game_restore(gid: str, request: Request):
+    """Create or replace game `gid` from a snapshot in the request body."""
+    data = await request.body()
+    return await run_in_threadpool(_restore, gid, data)
+
+def _stream_tick(gid: str, turn: int | None):
+    with _game_for_update(gid, turn) as gs:
+        apply_plan_and_tick(gs)
+
+@app.websocket("/game/{gid}/stream")
+async def game_stream(websocket: WebSocket, gid: str, layers: str | None = None):
+    """
+    Push channel instead of polling /state + /raster: one binary frame per change with the state
+    and the changed cells of the subscribed layers (format in app/stream.py). `layers` is a
+    comma list (default: all). Messages from the client: {"subscribe": [...]}, {"tick": true,
+    "turn": n}, {"resync": true}.
+    """
+    names = layers.split(",") if layers else list(stream.STREAM_LAYERS)
+    await websocket.accept()
+    err = stream.check_layers(names)
+    if err:
+        await websocket.send_text(json.dumps({"error": err}))
+        return await websocket.close(code=1008)
+    if store.get(gid) is None:
+        await websocket.send_text(json.dumps({"error": "game not found"}))
+        return await websocket.close(code=1008)
+
+    diff = stream.LayerDiff(names)
+    waiter = stream.subscribe(gid)
+    event = waiter[1]
+    receiving = asyncio.ensure_future(websocket.receive_text())
+    # in-process changes always notify(); only other workers' (sqlite) need polling
+    poll = stream.STREAM_POLL_SECONDS if isinstance(store, SQLiteStore) else None
+    force, seen = True, None
+    try:
+        while True:
+            found = await run_in_threadpool(store.get_rev, gid)
+            if found is None:
+                await websocket.send_text(json.dumps({"error": "game not found"}))
+                break
+            gs, rev = found
+            if force or rev != seen:  # same revision: nothing to diff
+                frame = await run_in_threadpool(diff.frame, gs, force)
+                force, seen = False, rev
+                if frame is not None:
+                    await websocket.send_bytes(frame)
+
+            waiting = asyncio.ensure_future(event.wait())
+            done, _ = await asyncio.wait({receiving, waiting}, timeout=poll,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            waiting.cancel()
+            event.clear()
+            if receiving not in done:
+                continue  # notified, or poll for changes made by another worker
+            text = receiving.result()  # WebSocketDisconnect ends the loop
+            receiving = asyncio.ensure_future(websocket.receive_text())
+            try:
+                msg = json.loads(text)
+                if not isinstance(msg, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                await websocket.send_text(json.dumps({"error": f"bad message: {e}"}))
+                continue
+            if "subscribe" in msg:
+                err = stream.check_layers(msg["subscribe"])
+                if err:
+                    await websocket.send_text(json.dumps({"error": err}))
+                    continue
+                diff.subscribe(msg["subscribe"])
+                force = True  # newly subscribed layers go out in full now
+            if msg.get("resync"):
+                diff.resync()
+                force = True
+            if msg.get("tick"):
+                try:
+                    await run_in_threadpool(_stream_tick, gid, msg.get("turn"))
+                except HTTPException as e:
+                    await websocket.send_text(json.dumps({"error": e.detail}))
+                except GameConflictError as e:
+                    await websocket.send_text(json.dumps({"error": str(e), "conflict": True}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiving.cancel()
+        stream.unsubscribe(gid, waiter)
+
+# EO rasters change only on re-ingest (their cache keys carry the data mtime), farm rasters every
+# turn; both revalidate, which costs a 304 thanks to the strong ETag.
+_CC_EO = "public, no-cache"
+_CC_REVALIDATE = "private, no-cache"
+
+def _cached_raster(request: Request, key: tuple, encode, cache_control: str,
+                   fmt: str = "png", shape: tuple = ()) -> Response:
+    """Serve encoded bytes from RASTER_CACHE with a strong ETag; 304 on If-None-Match."""
+    entry = RASTER_CACHE.get_or_load(key, lambda: EncodedRaster.of(encode()))
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control, **raw_headers(fmt, shape)}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or entry.etag in (t.strip() for t in inm.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+def _check_format(fmt: str, level: int | None) -> None:
+    err = check_format(fmt, level)
+    if err:
+        raise HTTPException(400, err)
+
 @app.get("/game/{gid}/raster")
-def game_raster(gid: str, layer: str = "ndvi"):
+def game_raster(gid: str, request: Request, layer: str = "ndvi", format: str = "png", level: int | None = None,
+                turn: int | None = None):
+    """
+    format: png (zlib level 0..9) | webp (lossless) | u8 | f16 (raw, shape in X-Raster-* headers)
+    turn:   a past turn from the game's raster history (see /game/{gid}/history); default = now
+    """
+    _check_format(format, level)
+    found = store.get_rev(gid)
+    if not found:
+        raise HTTPException(404, "game not found")
+    gs, rev = found
+    shape = (gs.farm.size, gs.farm.size)
+    # the store revision changes with every saved change (in any worker), so
+    # (gid, rev, turn, layer, encoding) identifies the image
+    if turn is None or turn == gs.turn:
+        return _cached_raster(
+            request, ("game", gid, rev, gs.turn, layer, format, level),
+            lambda: render_raster(gs.farm.rasters(layer), format, level), _CC_REVALIDATE, format, shape,
+        )
+    u8 = gs.history.raster(turn, layer) if gs.history is not None else None
+    if u8 is None:
+        raise HTTPException(404, f"turn {turn} is not in the game's raster history")
+    return _cached_raster(
+        request, ("game", gid, rev, turn, layer, format, level),
+        lambda: render_quantized(u8, format, level), _CC_REVALIDATE, format, shape,
+    )
+
+@app.get("/game/{gid}/history")
+def game_history(gid: str):
+    """Turns whose rasters can be fetched with /game/{gid}/raster?turn=..."""
     gs = store.get(gid)
     if not gs:
         raise HTTPException(404, "game not found")
-    arr = gs.farm.rasters(layer)
-    png = render_raster_png(arr)
-    return Response(content=png, media_type="image/png")
+    if gs.history is None:
+        return {"turns": [], "stats": None}
+    return {"turns": gs.history.turns(), "stats": gs.history.stats()}
+
+@app.get("/game/{gid}/bundle")
+def game_bundle(gid: str, layers: str | None = None):
+    """
+    State + farm layers (default all four) as one binary body, quantized in one pass
+    (format in app/bundle.py). `layers` is a comma list.
+    """
+    names = layers.split(",") if layers else list(FARM_LAYERS)
+    err = bundle.check_layers(names)
+    if err:
+        raise HTTPException(400, err)
+    gs = store.get(gid)
+    if not gs:
+        raise HTTPException(404, "game not found")
+    body = bundle.encode_bundle(gs, names)
+    return Response(content=body if bundle.BUNDLE_MEMORYVIEW else body.tobytes(), media_type=bundle.MEDIA_TYPE,
+                    headers={"Cache-Control": _CC_REVALIDATE, "X-Game-Turn": str(gs.turn)})
 
 # --------------------------------------------------------------------------------------
 # EO layers API (frontend takes grayscale PNG and applies LUT client-side)
 # --------------------------------------------------------------------------------------
+_eo_repos: dict = {}  # region_id -> (meta version, EOLayers), reused until a re-ingest rewrites meta.json
+
 def _region_store(region_id: str) -> "RegionStore":
     if not _EO_AVAILABLE:
         raise HTTPException(
@@ -131,12 +508,33 @@ def _region_store(region_id: str) -> "RegionStore":
         raise HTTPException(status_code=404, detail=f"Region '{region_id}' not found at {root}")
     return RegionStore(region_id=region_id, root=root)
 
+def _region_cached(cache: dict, region_id: str, make):
+    # one object per region, rebuilt when its grid (meta.json) or its set of resolutions changes
+    store = _region_store(region_id)
+    version = store.meta_version()
+    item = cache.get(region_id)
+    if item is None or item[0] != version:
+        item = cache[region_id] = (version, make(store))
+    return item[1]
+
+def _region_repo(region_id: str) -> "EOLayers":
+    return _region_cached(_eo_repos, region_id, EOLayers)
+
+if _EO_AVAILABLE:
+    @app.exception_handler(LayerNotFoundError)
+    def _layer_not_found(request, exc: LayerNotFoundError):
+        return JSONResponse(status_code=404, content={"detail": str(exc)})
+
 @app.get("/region/{region_id}/layer")
-def get_region_layer(region_id: str, layer: str, season: int):
+def get_region_layer(region_id: str, layer: str, season: int, request: Request,
+                     format: str = "png", level: int | None = None, mode: str = "raw"):
     """
     Returns a grayscale PNG (uint8) for a seasonal EO layer.
     layer: ndvi|rain|dry|temp
     season: 0..(years*4-1)
+    format: png (zlib level 0..9) | webp (lossless) | u8 | f16 (raw, shape in X-Raster-* headers)
+    mode:   raw | anomaly (value - mean) | zscore | percentile (0..100), against the climatology of
+            the same season of the year (eo/climatology.py); scale in X-Raster-Range
     """
     if not _EO_AVAILABLE:
         raise HTTPException(
@@ -145,19 +543,89 @@ def get_region_layer(region_id: str, layer: str, season: int):
         )
     if layer not in SCALES:
         raise HTTPException(400, f"Unknown layer '{layer}'. Expected one of: {', '.join(SCALES.keys())}")
+    if mode not in EO_MODES:
+        raise HTTPException(400, f"Unknown mode '{mode}'. Expected one of: {', '.join(EO_MODES)}")
+
+    _check_format(format, level)
+    repo = _region_repo(region_id)
+    if not 0 <= season < repo.seasons(layer):
+        raise HTTPException(400, f"Season {season} out of range 0..{repo.seasons(layer) - 1}")
+    scale = mode_scale(layer, mode)
+    clim_mtime = None
+    if mode == "raw":
+        array = lambda: repo.get_array(layer, season)
+    else:
+        clim = repo.climatology(layer, season)
+        if clim is None:
+            raise HTTPException(404, f"No climatology for {layer} in region '{region_id}' "
+                                     f"(build it: python -m backend.app.eo.climatology)")
+        clim_mtime = repo.store.layer_climatology(layer).stat().st_mtime_ns
+        array = lambda: anomaly(repo.get_array(layer, season), clim, mode)
+    resp = _cached_raster(
+        request, ("eo", region_id, layer, season, format, level, mode, repo.source_mtime(layer), clim_mtime),
+        lambda: to_grayscale(array(), scale.vmin, scale.vmax, format, level), _CC_EO,
+        format, (repo.grid.height, repo.grid.width),
+    )
+    resp.headers["X-Raster-Range"] = f"{scale.vmin},{scale.vmax}"
+    return resp
+
+_eo_pyramids: dict = {}  # region_id -> (meta version, TilePyramid)
+
+def _region_pyramid(region_id: str) -> "TilePyramid":
+    return _region_cached(_eo_pyramids, region_id, TilePyramid)
+
+@app.get("/region/{region_id}/tiles.json")
+def get_region_tiles_info(region_id: str):
+    """Tile pyramid description: zoom range, per-level grid size and tile counts."""
+    return {"region": region_id, **_region_pyramid(region_id).info()}
 
-    store_ = _region_store(region_id)
-    repo = EOLayers(store_)
-    arr = repo.get_array(layer, season)
+@app.get("/region/{region_id}/tiles/{layer}/{season}/{z}/{x}/{y}")
+def get_region_tile(region_id: str, layer: str, season: int, z: int, x: int, y: str, request: Request,
+                    format: str = "png", level: int | None = None):
+    """
+    256x256 tile of a seasonal EO layer from the region's multi-resolution pyramid (see eo/tiles.py).
+    y may carry an extension ("12.png", "12.webp") which then selects the format.
+    """
+    y_str, _, ext = y.partition(".")
+    if ext:
+        format = ext
+    try:
+        y_i = int(y_str)
+    except ValueError:
+        raise HTTPException(400, f"Bad tile row '{y}'")
+    _check_format(format, level)
+    if layer not in SCALES:
+        raise HTTPException(400, f"Unknown layer '{layer}'. Expected one of: {', '.join(SCALES.keys())}")
+    pyr = _region_pyramid(region_id)
     scale = SCALES[layer]
-    png = to_grayscale_png(arr, scale.vmin, scale.vmax)
-    return Response(content=png, media_type="image/png")
+    encode = lambda arr: to_grayscale(arr, scale.vmin, scale.vmax, format, level)
+
+    def _encode():
+        if format == "png" and level is None:
+            body = pyr.tile_bytes(layer, season, z, x, y_i, encode)
+        else:
+            arr = pyr.tile(layer, season, z, x, y_i)
+            body = None if arr is None else encode(arr)
+        if body is None:
+            raise HTTPException(404, f"No tile {layer}/{season}/{z}/{x}/{y_i}")
+        return body
+
+    return _cached_raster(
+        request, ("tile", region_id, layer, season, z, x, y_i, format, level, pyr.data_mtime(layer, z)),
+        _encode, _CC_EO,
+        format, (256, 256),
+    )
+
+def _json_values(a) -> list:
+    # NaN (season not covered by the source data) -> null
+    return [None if v != v else float(v) for v in a]
 
 @app.get("/region/{region_id}/timeseries")
-def get_timeseries(region_id: str, layer: str, x: int, y: int):
+def get_timeseries(region_id: str, layer: str, x: int, y: int, w: int = 1, h: int = 1):
     """
     Return per-cell seasonal time-series at grid coords (x,y).
-    Follows GridMeta defaults (200x200, seasons=4*years).
+    With w/h > 1 returns the mean over the window [x, x+w) x [y, y+h) per season.
+    Follows the region grid (GridMeta defaults: 200x200, seasons=4*years).
     """
     if not _EO_AVAILABLE:
         raise HTTPException(
@@ -167,17 +635,130 @@ def get_timeseries(region_id: str, layer: str, x: int, y: int):
     if layer not in SCALES:
         raise HTTPException(400, f"Unknown layer '{layer}'. Expected one of: {', '.join(SCALES.keys())}")
 
-    store_ = _region_store(region_id)
-    repo = EOLayers(store_)
-    grid = GridMeta()
+    repo = _region_repo(region_id)
+    grid = repo.grid
 
     if not (0 <= x < grid.width and 0 <= y < grid.height):
         raise HTTPException(400, f"Point (x={x}, y={y}) out of grid bounds {grid.width}x{grid.height}")
+    if w < 1 or h < 1 or x + w > grid.width or y + h > grid.height:
+        raise HTTPException(400, f"Window {w}x{h} at (x={x}, y={y}) out of grid bounds {grid.width}x{grid.height}")
+
+    if w == 1 and h == 1:
+        values = repo.timeseries(layer, [x], [y])[:, 0]
+    else:
+        win = repo.window(layer, x, y, x + w, y + h)
+        valid = np.isfinite(win).sum(axis=(1, 2))
+        values = np.where(valid > 0, np.nansum(win, axis=(1, 2)) / np.maximum(valid, 1), np.nan)
+    return {"region": region_id, "layer": layer, "x": x, "y": y, "w": w, "h": h, "values": _json_values(values)}
+
+@app.post("/region/{region_id}/timeseries")
+def post_timeseries(region_id: str, req: TimeseriesRequest):
+    """Batched per-pixel time-series: one cube read for all requested points."""
+    if not _EO_AVAILABLE:
+        raise HTTPException(
+            503,
+            detail=f"EO stack not yet installed (.eo/*). Import error: {_EO_IMPORT_ERROR_TEXT}",
+        )
+    if req.layer not in SCALES:
+        raise HTTPException(400, f"Unknown layer '{req.layer}'. Expected one of: {', '.join(SCALES.keys())}")
+    if not req.points:
+        raise HTTPException(400, "points must not be empty")
+    if any(len(p) != 2 for p in req.points):
+        raise HTTPException(400, "points must be [x, y] pairs")
+
+    repo = _region_repo(region_id)
+    grid = repo.grid
+    pts = np.asarray(req.points, dtype=np.int64)
+    xs, ys = pts[:, 0], pts[:, 1]
+    bad = (xs < 0) | (xs >= grid.width) | (ys < 0) | (ys >= grid.height)
+    if bad.any():
+        i = int(np.argmax(bad))
+        raise HTTPException(400, f"Point (x={xs[i]}, y={ys[i]}) out of grid bounds {grid.width}x{grid.height}")
+
+    values = repo.timeseries(req.layer, xs, ys)  # (T,K)
+    return {
+        "region": region_id,
+        "layer": req.layer,
+        "points": req.points,
+        "values": [_json_values(values[:, k]) for k in range(values.shape[1])],
+    }
+
+def _zonal(region_id: str, layer: str, zones: list[Zone], stats: list[str], bins: int) -> dict:
+    if not _EO_AVAILABLE:
+        raise HTTPException(
+            503,
+            detail=f"EO stack not yet installed (.eo/*). Import error: {_EO_IMPORT_ERROR_TEXT}",
+        )
+    if layer not in SCALES:
+        raise HTTPException(400, f"Unknown layer '{layer}'. Expected one of: {', '.join(SCALES.keys())}")
+    bad = [s for s in stats if s not in zonal.ZONAL_STATS]
+    if bad:
+        raise HTTPException(400, f"Unknown stat(s) {', '.join(bad)}. Expected: {', '.join(zonal.ZONAL_STATS)}")
+    if not 1 <= bins <= zonal.ZONAL_MAX_BINS:
+        raise HTTPException(400, f"bins must be 1..{zonal.ZONAL_MAX_BINS}")
+    if not 1 <= len(zones) <= ZONAL_MAX_ZONES:
+        raise HTTPException(400, f"zones must have 1..{ZONAL_MAX_ZONES} entries")
+
+    repo = _region_repo(region_id)
+    grid = repo.grid
+    scale = SCALES[layer]
+    out = []
+    for i, zone in enumerate(zones):
+        if (zone.rect is None) == (zone.points is None):
+            raise HTTPException(400, f"zone {i}: give exactly one of rect or points")
+        if zone.rect is not None:
+            if len(zone.rect) != 4:
+                raise HTTPException(400, f"zone {i}: rect must be [x, y, w, h]")
+            x, y, w, h = zone.rect
+            if w < 1 or h < 1 or x < 0 or y < 0 or x + w > grid.width or y + h > grid.height:
+                raise HTTPException(400, f"zone {i}: rect {zone.rect} out of grid bounds {grid.width}x{grid.height}")
+            boxes = zonal.rect_boxes(x, y, w, h)
+        else:
+            try:
+                boxes = zonal.polygon_boxes(region_id, (grid.height, grid.width), zone.points)
+            except MaskError as e:
+                raise HTTPException(400, f"zone {i}: {e}")
+            if boxes.shape[1] == 0:
+                raise HTTPException(400, f"zone {i}: polygon covers no pixel centres")
+        z = zonal.zonal(repo, layer, boxes, stats, bins, (scale.vmin, scale.vmax))
+        out.append({k: _json_values(v) if isinstance(v, np.ndarray) else v for k, v in z.items()})
+    return {"region": region_id, "layer": layer, "seasons": repo.seasons(layer), "zones": out}
+
+@app.get("/region/{region_id}/zonal")
+def get_zonal(region_id: str, layer: str, x: int, y: int, w: int, h: int, stats: str = "mean,std", bins: int = 10):
+    """
+    Per-season statistics of the window [x, x+w) x [y, y+h): stats = comma list of
+    mean,std (from integral images, O(1) per season), min,max,hist (read the window).
+    """
+    res = _zonal(region_id, layer, [Zone(rect=[x, y, w, h])], stats.split(","), bins)
+    return {**res, **res.pop("zones")[0]}
+
+@app.post("/region/{region_id}/zonal")
+def post_zonal(region_id: str, req: ZonalRequest):
+    """Batched zonal stats: {"layer", "zones": [{"rect": [x, y, w, h]} | {"points": [[x, y], ...]}], "stats", "bins"}."""
+    return _zonal(region_id, req.layer, req.zones, req.stats, req.bins)
+
+# --------------------------------------------------------------------------------------
+# Admin
+# --------------------------------------------------------------------------------------
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # required as X-Admin-Token when set
+
+# poll conf/ and reload on change (CONF_WATCH_SECONDS; each worker process watches on its own)
+sim_config.start_watcher()
 
-    values = []
-    for t in range(grid.seasons_total):
-        values.append(float(repo.get_array(layer, t)[y, x]))
-    return {"region": region_id, "layer": layer, "x": x, "y": y, "values": values}
+@app.post("/admin/config/reload")
+def admin_config_reload(request: Request):
+    """
+    Recompile conf/ and make it the config for new games; running games keep theirs.
+    Invalid files leave the current config in place (422 with the validation errors).
+    Only this worker reloads right away; the others pick the change up through their file watchers.
+    """
+    if ADMIN_TOKEN and request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(403, "admin token required")
+    try:
+        return sim_config.reload()
+    except sim_config.ConfigError as e:
+        raise HTTPException(422, str(e))
 
 # --------------------------------------------------------------------------------------
 # Debug
@@ -194,5 +775,27 @@ def dbg_frontend():
         "eo_import_error": _EO_IMPORT_ERROR_TEXT or None,
     }
 
+@_dbg.get("/__debug_cache", include_in_schema=False)
+def dbg_cache():
+    return {"eo_layers": LAYER_CACHE.stats() if _EO_AVAILABLE else None, "rasters": RASTER_CACHE.stats()}
+
+@_dbg.get("/__debug_store", include_in_schema=False)
+def dbg_store():
+    return store.stats()
+
+@_dbg.get("/__debug_config", include_in_schema=False)
+def dbg_config():
+    return sim_config.stats()
+
 app.include_router(_dbg)
 
+# --------------------------------------------------------------------------------------
+# SPA (mounted last: a mount at "/" matches every path, so API routes must be registered first)
+# --------------------------------------------------------------------------------------
+if FRONTEND_DIR:
+    app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="spa")
+else:
+    logging.getLogger("app.main").warning(
+        "Frontend build not found at %s. Build Vite app and copy frontend/dist/* to backend/app/static/",
+        STATIC_DIR,
+    )
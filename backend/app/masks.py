@@ -0,0 +1,87 @@
+"""
+Cell selections for bulk plan edits (POST /game/{gid}/plan/ops).
+
+Every function returns an index for a (size, size) farm array that can be used directly in
+`arr[index] = value`: a pair of slices for rectangles, a boolean mask otherwise.
+Coordinates are in cells: x = column, y = row, cell (y, x) covers [x, x+1) x [y, y+1).
+"""
+import numpy as np
+
+
+class MaskError(ValueError):
+    pass
+
+
+def rect_index(size: int, x: int, y: int, w: int, h: int) -> tuple[slice, slice]:
+    """Cells x..x+w-1, y..y+h-1, clipped to the farm."""
+    if w < 0 or h < 0:
+        raise MaskError("rect width/height must be >= 0")
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(size, x + w), min(size, y + h)
+    return slice(y0, max(y0, y1)), slice(x0, max(x0, x1))
+
+
+def polygon_mask(size, points: list) -> np.ndarray:
+    """
+    Cells whose centre lies inside the polygon (even-odd rule); points = [[x, y], ...].
+    size: farm size, or (height, width) for non-square grids (EO regions).
+    """
+    height, width = (size, size) if isinstance(size, int) else size
+    pts = np.asarray(points, dtype=np.float64)
+    if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < 3:
+        raise MaskError("polygon needs at least 3 [x, y] points")
+    mask = np.zeros((height, width), dtype=bool)
+    # only rows/columns inside the bounding box can be hit
+    r0 = max(0, int(np.floor(pts[:, 1].min() - 0.5)))
+    r1 = min(height, int(np.ceil(pts[:, 1].max() + 0.5)))
+    c0 = max(0, int(np.floor(pts[:, 0].min() - 0.5)))
+    c1 = min(width, int(np.ceil(pts[:, 0].max() + 0.5)))
+    if r0 >= r1 or c0 >= c1:
+        return mask
+    cy = np.arange(r0, r1) + 0.5
+    cx = np.arange(c0, c1) + 0.5
+    inside = np.zeros((r1 - r0, c1 - c0), dtype=bool)
+    for (xa, ya), (xb, yb) in zip(pts, np.roll(pts, -1, axis=0)):
+        crosses = (ya <= cy) != (yb <= cy)  # edge spans the row centre (half-open)
+        if not crosses.any():
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = xa + (cy - ya) * (xb - xa) / (yb - ya)
+        rows = np.nonzero(crosses)[0]
+        inside[rows] ^= cx[None, :] < x_at[rows, None]
+    mask[r0:r1, c0:c1] = inside
+    return mask
+
+
+def rle_mask(size: int, runs: list) -> np.ndarray:
+    """
+    Row-major run lengths alternating unselected/selected, starting with unselected
+    (e.g. [3, 2, 5] = skip 3 cells, select 2, skip 5). Runs past the last cell are an error;
+    cells after the last run are unselected.
+    """
+    try:
+        runs = np.asarray(runs, dtype=np.int64)
+    except (OverflowError, ValueError, TypeError):
+        raise MaskError("rle must be a list of non-negative run lengths") from None
+    if runs.ndim != 1 or (runs < 0).any():
+        raise MaskError("rle must be a list of non-negative run lengths")
+    if (runs > size * size).any():  # before summing, so the total cannot overflow
+        raise MaskError(f"rle run longer than the farm ({size * size} cells)")
+    total = int(runs.sum())
+    if total > size * size:
+        raise MaskError(f"rle covers {total} cells, farm has {size * size}")
+    values = np.arange(len(runs)) % 2 == 1
+    flat = np.zeros(size * size, dtype=bool)
+    flat[:total] = np.repeat(values, runs)
+    return flat.reshape(size, size)
+
+
+def rle_encode(mask: np.ndarray) -> list[int]:
+    """Inverse of rle_mask (handy for clients and tests)."""
+    flat = np.asarray(mask, dtype=bool).ravel()
+    change = np.flatnonzero(np.diff(flat.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    runs = np.diff(bounds).tolist()
+    if flat.size and flat[0]:
+        runs.insert(0, 0)
+    return runs
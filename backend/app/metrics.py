@@ -0,0 +1,190 @@
+"""
+Process-local metrics in the Prometheus text format (GET /metrics), without extra dependencies.
+
+    HTTP      farm_http_request_duration_seconds{method,route,status}  histogram (MetricsMiddleware)
+              farm_http_request_bytes_total / farm_http_response_bytes_total{route}
+    spans     farm_span_duration_seconds{span}  histogram, see @timed / span(): tick, ensemble_tick,
+              farm_rasters, render, bundle, eo_encode, eo_get_array
+    gauges    registered with gauge(name, help, fn); fn returns a number or {label value: number}
+              (caches, store), evaluated at scrape time
+
+`route` is the route template (/game/{gid}/tick), never the raw path, so label cardinality
+stays bounded; requests that match no API route (SPA, 404s) are counted as route="other".
+Every worker process keeps its own numbers: with uvicorn --workers N a scrape sees one worker.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(x: float) -> str:
+    return repr(float(x)) if x != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, s in items:
+            cum = 0
+            for le, n in zip(self.buckets + (float("inf"),), s[:-1]):
+                cum += n
+                le_label = 'le="%s"' % _num(le)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le_label)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(s[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cum}")
+        return out
+
+
+class Gauge:
+    """Value read at scrape time; kind="counter" for totals kept elsewhere (e.g. LRUCache.hits)."""
+
+    def __init__(self, name: str, help: str, fn, labelname: str = "", kind: str = "gauge"):
+        self.name, self.help, self.fn, self.labelname, self.kind = name, help, fn, labelname, kind
+
+    def render(self) -> list[str]:
+        try:
+            value = self.fn()
+        except Exception:  # a broken collector must not take /metrics down
+            return []
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            out += [f"{self.name}{_labels((self.labelname,), (k,))} {_num(v)}" for k, v in sorted(value.items())]
+        else:
+            out.append(f"{self.name} {_num(value)}")
+        return out
+
+
+_registry: list = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name: str, help: str, fn, labelname: str = "", kind: str = "gauge") -> Gauge:
+    return register(Gauge(name, help, fn, labelname, kind))
+
+
+def render() -> str:
+    return "\n".join(line for m in _registry for line in m.render()) + "\n"
+
+
+# ---- spans ----
+SPANS = register(Histogram("farm_span_duration_seconds", "Time spent in instrumented hot paths.", ("span",)))
+
+
+@contextmanager
+def span(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPANS.observe(time.perf_counter() - t0, name)
+
+
+def timed(name: str):
+    """Decorator: record every call of the function as span `name` (also when it raises)."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                SPANS.observe(time.perf_counter() - t0, name)
+        return inner
+    return wrap
+
+
+# ---- HTTP ----
+HTTP_LATENCY = register(Histogram("farm_http_request_duration_seconds", "HTTP request latency.",
+                                  ("method", "route", "status")))
+HTTP_REQUEST_BYTES = register(Counter("farm_http_request_bytes_total", "Request body bytes.", ("route",)))
+HTTP_RESPONSE_BYTES = register(Counter("farm_http_response_bytes_total", "Response body bytes.", ("route",)))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request from first byte in to last byte out."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status, sent, received = 500, 0, 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "other"  # set by the router on match
+            HTTP_LATENCY.observe(time.perf_counter() - t0, scope["method"], route, str(status))
+            HTTP_REQUEST_BYTES.inc(received, route)
+            HTTP_RESPONSE_BYTES.inc(sent, route)
@@ -1,6 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Optional, Literal
 import uuid, math
+import numpy as np
+
+from .metrics import timed
+from .sim.history import RasterHistory
 
 Season = Literal["spring","summer","autumn","winter"]
 
@@ -12,9 +16,98 @@ class PlanCell(BaseModel):
 class PlanRequest(BaseModel):
     cells: Dict[str, PlanCell] = Field(default_factory=dict)
 
+PLAN_OPS_MAX = 1000
+POLYGON_POINTS_MAX = 4096
+RLE_RUNS_MAX = 1024 * 1024 + 1  # one run per cell of the largest farm (FARM_SIZE_MAX), plus the leading skip
+
+class PlanOp(BaseModel):
+    # one selection (rect / polygon / rle / all, see app/masks.py) + what to set there;
+    # None fields are left unchanged
+    shape: Literal["rect","polygon","rle","all"]
+    rect: Optional[List[int]] = None                 # [x, y, w, h]
+    points: Optional[List[List[float]]] = Field(None, max_length=POLYGON_POINTS_MAX)  # [[x, y], ...]
+    rle: Optional[List[int]] = Field(None, max_length=RLE_RUNS_MAX)  # run lengths, unselected first
+    crop: Optional[str] = None
+    irrigation: Optional[bool] = None
+    drainage: Optional[bool] = None
+
+class PlanOpsRequest(BaseModel):
+    ops: List[PlanOp] = Field(default_factory=list, max_length=PLAN_OPS_MAX)
+
+WHATIF_MAX_CANDIDATES = 256
+OPTIMIZE_MAX_MS = 30000
+
+class PlanCandidate(BaseModel):
+    # a variant of the game's current plan: ops (as in /plan/ops) first, then cells (as in /plan)
+    ops: List[PlanOp] = Field(default_factory=list, max_length=PLAN_OPS_MAX)
+    cells: Dict[str, PlanCell] = Field(default_factory=dict)
+
+class WhatIfRequest(BaseModel):
+    candidates: List[PlanCandidate] = Field(default_factory=list, max_length=WHATIF_MAX_CANDIDATES)
+    # objective = sum(weight * final metric), metrics as in /ensemble
+    weights: Dict[str, float] = Field(default_factory=lambda: {"score_economy": 1.0})
+
+class OptimizeRequest(BaseModel):
+    weights: Dict[str, float] = Field(default_factory=lambda: {"score_economy": 1.0})
+    crops: Optional[List[str]] = None                # crops the optimizer may plant (default: all)
+    zones: int = Field(4, ge=1, le=32)               # farm split into zones x zones blocks, one choice each
+    population: int = Field(32, ge=4, le=WHATIF_MAX_CANDIDATES)
+    generations: int = Field(200, ge=1, le=10000)
+    budget_ms: int = Field(2000, ge=10, le=OPTIMIZE_MAX_MS)
+
+# Raw plan arrays (/game/{gid}/plan/raw): uint8 crop index per cell + uint8 flags per cell
+PLAN_FLAG_IRRIGATION = 0x01
+PLAN_FLAG_DRAINAGE = 0x02
+PLAN_FLAGS_KEEP = 0x80  # flags byte with this bit: leave the cell's flags unchanged
+PLAN_CROP_KEEP = 0xFF   # crop byte: leave the cell's crop unchanged
+
+FARM_SIZE_MAX = 1024
+
+class EOAnchor(BaseModel):
+    """Farm placed on a window of an EO region: per-cell climate forcing (sim/forcing.py)."""
+    region_id: str                    # EO region under DATA_ROOT, e.g. CA_SanJoaquin_West
+    x: int                            # window [x, x+w) x [y, y+h) in region grid pixels
+    y: int
+    w: int = Field(ge=1)
+    h: int = Field(ge=1)
+    layers: List[str] = Field(default_factory=lambda: ["rain", "dry"])
+    start_season: Optional[int] = None  # EO season of turn 0; default: the game's start year
+
 class NewGameRequest(BaseModel):
     region: Literal["california","amu_darya","sahel"]
     seed: Optional[int] = None
+    size: int = Field(32, ge=1, le=FARM_SIZE_MAX)  # farm is size x size cells
+    preset: str = "default"  # difficulty preset from conf/calibration_coeffs.yaml
+    eo: Optional[EOAnchor] = None
+
+SIM_MAX_TURNS = 400  # 100 years per /simulate call
+
+class ScheduledPlan(BaseModel):
+    # applied before the tick of game turn `turn`, or before every `season` tick (rotations);
+    # season plans go first, so a turn plan can override them
+    turn: Optional[int] = None
+    season: Optional[Season] = None
+    cells: Dict[str, PlanCell] = Field(default_factory=dict)
+
+class SimulateRequest(BaseModel):
+    schedule: List[ScheduledPlan] = Field(default_factory=list)
+
+class TimeseriesRequest(BaseModel):
+    layer: str
+    points: List[List[int]] = Field(default_factory=list)  # [[x, y], ...] in grid coords
+
+ZONAL_MAX_ZONES = 64
+
+class Zone(BaseModel):
+    rect: Optional[List[int]] = None  # [x, y, w, h] in grid coords
+    # polygon [[x, y], ...]; pixels whose centre is inside count
+    points: Optional[List[List[float]]] = Field(None, max_length=POLYGON_POINTS_MAX)
+
+class ZonalRequest(BaseModel):
+    layer: str
+    zones: List[Zone] = Field(default_factory=list)
+    stats: List[str] = Field(default_factory=lambda: ["mean", "std"])
+    bins: int = 10
 
 class CellPlan(BaseModel):
     crop: str = "fallow"
@@ -29,32 +122,53 @@ class Cell(BaseModel):
     last_crop: str = "fallow"
     plan: CellPlan = Field(default_factory=CellPlan)
 
+# Farm state is kept as structure-of-arrays (one contiguous (size, size) array per attribute)
+# so the engine can update the whole grid with vectorized numpy ops.
+# Crops are stored as indices into sim.manifests.CROP_NAMES.
+FARM_LAYERS = ("ndvi", "moisture", "salinity", "fertility")
+FARM_ARRAYS = FARM_LAYERS + ("crop", "last_crop", "irrigation", "drainage")
+
 class Farm(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     size: int = 32  # 32x32 = 1km @ ~31m cell
-    cells: List[Cell] = Field(default_factory=list)
+    moisture: Optional[np.ndarray] = None
+    salinity: Optional[np.ndarray] = None
+    fertility: Optional[np.ndarray] = None
+    ndvi: Optional[np.ndarray] = None
+    crop: Optional[np.ndarray] = None        # uint8 crop index (current plan)
+    last_crop: Optional[np.ndarray] = None   # uint8 crop index (last season)
+    irrigation: Optional[np.ndarray] = None  # bool
+    drainage: Optional[np.ndarray] = None    # bool
 
     def __init__(self, **data):
         super().__init__(**data)
-        if not self.cells:
-            self.cells = [Cell() for _ in range(self.size*self.size)]
-
+        shape = (self.size, self.size)
+        c = Cell()
+        for name, default in (("moisture", c.moisture), ("salinity", c.salinity),
+                              ("fertility", c.fertility), ("ndvi", c.ndvi)):
+            if getattr(self, name) is None:
+                setattr(self, name, np.full(shape, default, dtype=np.float64))
+        for name in ("crop", "last_crop"):
+            if getattr(self, name) is None:
+                setattr(self, name, np.zeros(shape, dtype=np.uint8))  # 0 == fallow
+        for name in ("irrigation", "drainage"):
+            if getattr(self, name) is None:
+                setattr(self, name, np.zeros(shape, dtype=bool))
+
+    @property
+    def n_cells(self) -> int:
+        return self.size * self.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in FARM_ARRAYS)
+
+    @timed("farm_rasters")
     def rasters(self, layer: str):
-        import numpy as np
-        n = self.size
-        arr = np.zeros((n, n), dtype="float32")
-        for i, c in enumerate(self.cells):
-            y = i // n; x = i % n
-            if layer == "ndvi":
-                arr[y,x] = c.ndvi
-            elif layer == "moisture":
-                arr[y,x] = c.moisture
-            elif layer == "salinity":
-                arr[y,x] = c.salinity
-            elif layer == "fertility":
-                arr[y,x] = c.fertility
-            else:
-                arr[y,x] = 0.0
-        return arr.clip(0.0, 1.0)
+        if layer not in FARM_LAYERS:
+            return np.zeros((self.size, self.size), dtype="float32")
+        return getattr(self, layer).clip(0.0, 1.0).astype("float32")
 
 class Finance(BaseModel):
     cash: float = 10000.0
@@ -78,6 +192,8 @@ class Region(BaseModel):
     climate: Climate
 
 class GameState(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str
     region: Region
     farm: Farm
@@ -85,6 +201,13 @@ class GameState(BaseModel):
     year: int = 2014
     season: Season = "spring"
     turn: int = 0  # total seasons played
+    seed: int = 1337  # drives the event draws (sim/events.py)
+    # difficulty preset and the compiled config (sim/config.py) the game was created with
+    preset: str = "default"
+    config_sha: str = ""
+    manifests_sha: str = ""
+    eo: Optional[EOAnchor] = None  # per-cell rain/dry forcing from EO rasters (sim/forcing.py)
+    history: Optional[RasterHistory] = Field(default=None, exclude=True)  # past rasters (sim/history.py)
 
     def public(self):
         return {
@@ -92,6 +215,11 @@ class GameState(BaseModel):
             "year": self.year,
             "season": self.season,
             "turn": self.turn,
+            "seed": self.seed,
+            "preset": self.preset,
+            "config_sha": self.config_sha,
+            "manifests_sha": self.manifests_sha,
+            "eo": self.eo.dict() if self.eo is not None else None,
             "region": self.region.dict(),
             "finance": self.finance.dict(),
             "kpis": {
@@ -110,11 +238,11 @@ class GameState(BaseModel):
         if nxt == "spring":
             self.year += 1
 
-    def avg_ndvi(self): 
-        return sum(c.ndvi for c in self.farm.cells)/len(self.farm.cells)
-    def avg_moisture(self): 
-        return sum(c.moisture for c in self.farm.cells)/len(self.farm.cells)
-    def avg_salinity(self): 
-        return sum(c.salinity for c in self.farm.cells)/len(self.farm.cells)
-    def avg_fertility(self): 
-        return sum(c.fertility for c in self.farm.cells)/len(self.farm.cells)
+    def avg_ndvi(self):
+        return float(self.farm.ndvi.mean())
+    def avg_moisture(self):
+        return float(self.farm.moisture.mean())
+    def avg_salinity(self):
+        return float(self.farm.salinity.mean())
+    def avg_fertility(self):
+        return float(self.farm.fertility.mean())
@@ -0,0 +1,533 @@
+"""
+Manifest compiler: conf/crops_manifest.json, conf/infrastructure_manifest.json and
+conf/calibration_coeffs.yaml are validated once and turned into dense numpy tables.
+
+    crops      (n_crops,) columns + ndvi_profile (n_crops, 4), indexed by CompiledConfig.crop_ids
+    infra      capex/opex/labor/energy (n_infra,), effects (n_infra, n_effects) with neutral
+               defaults (1.0 for *_multiplier, 0.0 otherwise), availability (n_infra, n_regions)
+    coeffs     (n_presets, n_regions, n_coeffs): globals -> preset group multipliers -> region
+               overrides, in the file's apply_order (presets/default stands for the chosen preset)
+    events     (n_regions, n_events) alert thresholds with region event_overrides (published by
+               /config for clients; the engine's event shocks are shock_bands below)
+
+The engine's own crop model and climate (sim/manifests.py: unitless yield/water/salt per crop,
+seasonal rain/temp and event shocks per region) is compiled into the same object, together with
+the preset multipliers it applies (stresses, event_prob), so a tick reads everything from one
+immutable CompiledConfig.
+
+manifests_sha hashes the two JSON manifests, config_sha everything that went into the tables
+(canonical JSON, so formatting and key order do not matter). Games record both.
+
+Hot reload: reload() (POST /admin/config/reload, or the CONF_WATCH_SECONDS file watcher)
+compiles the files again off to the side and, only if they are valid, swaps the new object in
+as current(). Compiled configs are never modified, so a tick that already holds one is
+unaffected. New games take current(); running games stay on config_for(gs.config_sha). The
+source files of every compiled version are archived under CONF_ARCHIVE_DIR/<config_sha>/, so
+another worker process (or this one after a restart) can recompile a version it never saw.
+If a version cannot be recovered, config_for() falls back to current() and the engine
+(sim/engine.py tick_params) records the sha the game really runs with.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import yaml
+
+from .manifests import CROPS, CROP_NAMES, REGIONS
+
+CONF_DIR = Path(os.getenv("CONF_DIR", str(Path(__file__).resolve().parents[2] / "conf")))
+CROPS_FILE = "crops_manifest.json"
+INFRA_FILE = "infrastructure_manifest.json"
+CALIBRATION_FILE = "calibration_coeffs.yaml"
+DEFAULT_PRESET = "default"
+# next to the game database by default: games pin config_sha, so the archive must outlive restarts
+# as long as the games do (GAME_DB on a persistent volume)
+CONF_ARCHIVE_DIR = Path(os.getenv("CONF_ARCHIVE_DIR", os.path.join(
+    os.path.dirname(os.getenv("GAME_DB", "")) or tempfile.gettempdir(), "farm-config")))
+CONF_WATCH_SECONDS = float(os.getenv("CONF_WATCH_SECONDS", "5"))  # 0 disables the file watcher
+CONF_KEEP = int(os.getenv("CONF_KEEP", "8"))  # compiled versions kept in memory besides current()
+SEASONS = ("spring", "summer", "autumn", "winter")
+
+_CROP_COLUMNS = ("growth_length_seasons", "base_yield_kg_per_ha", "water_req_mm_total", "salinity_tolerance",
+                 "heat_tolerance", "price_usd_per_ton_baseline", "pest_pressure_mod")
+_INFRA_COLUMNS = ("capex_usd_per_ha", "opex_usd_per_ha_per_season", "labor_hours_per_ha_per_season",
+                  "energy_kwh_per_ha_per_season")
+_UNIT_RANGE = ("salinity_tolerance", "heat_tolerance", "pest_pressure_mod")
+
+
+class ConfigError(ValueError):
+    """The manifests or calibration file are invalid; lists every problem found."""
+
+
+@dataclass(frozen=True)
+class CompiledConfig:
+    config_sha: str
+    manifests_sha: str
+    version: str
+    # conf region ids; the engine's region codes map onto them through REGIONS[code]["conf_id"]
+    region_ids: tuple
+    region_codes: tuple
+    presets: tuple
+    # engine crop model (indexed by Farm.crop)
+    crop_yield: np.ndarray
+    crop_water: np.ndarray
+    crop_salt: np.ndarray
+    crop_ndvi_peak: np.ndarray
+    crop_price: np.ndarray
+    crop_fertility: np.ndarray
+    seasonal_rain: np.ndarray          # (n_region_codes, 4) in SEASONS order
+    seasonal_temp: np.ndarray
+    shock_bands: np.ndarray            # (n_region_codes, 4, n_bands, 4): [lo, hi, rain, temp]; lo = hi pads
+    # manifest tables
+    crop_ids: tuple
+    crops: dict                        # column -> (n_crops,); plus ndvi_profile (n_crops, 4)
+    crop_region: np.ndarray            # (n_crops,) index into region_ids
+    infra_ids: tuple
+    infra_categories: tuple
+    infra: dict                        # column -> (n_infra,)
+    effect_names: tuple
+    infra_effects: np.ndarray          # (n_infra, n_effects)
+    infra_regions: np.ndarray          # (n_infra, n_regions) bool
+    coeff_names: tuple
+    coeffs: np.ndarray                 # (n_presets, n_regions, n_coeffs)
+    multiplier_groups: tuple
+    multipliers: np.ndarray            # (n_presets, n_groups)
+    event_names: tuple
+    events: np.ndarray                 # (n_regions, n_events)
+    source: dict = field(default_factory=dict, compare=False)  # where the files were read from
+
+    def preset_index(self, preset: str) -> int:
+        return self.presets.index(preset)
+
+    def region_code_index(self, code: str) -> int:
+        return self.region_codes.index(code)
+
+    def multiplier(self, preset: str, group: str) -> float:
+        if group not in self.multiplier_groups:
+            return 1.0
+        return float(self.multipliers[self.preset_index(preset), self.multiplier_groups.index(group)])
+
+    def coefficients(self, region_code: str, preset: str = DEFAULT_PRESET) -> dict:
+        r = self.region_ids.index(REGIONS[region_code]["conf_id"])
+        row = self.coeffs[self.preset_index(preset), r]
+        return dict(zip(self.coeff_names, row.tolist()))
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "config_sha": self.config_sha,
+            "manifests_sha": self.manifests_sha,
+            "presets": list(self.presets),
+            "regions": {code: REGIONS[code]["conf_id"] for code in self.region_codes},
+            "crops": list(CROP_NAMES),
+            "manifest_crops": list(self.crop_ids),
+            "infrastructure": list(self.infra_ids),
+            "coefficients": list(self.coeff_names),
+            "multiplier_groups": list(self.multiplier_groups),
+            "events": list(self.event_names),
+        }
+
+
+def _sha(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _number(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _check_records(name: str, records, required: tuple, errors: list) -> None:
+    if not isinstance(records, list):
+        errors.append(f"{name}: expected a list of objects")
+        return
+    seen = set()
+    for i, rec in enumerate(records):
+        if not isinstance(rec, dict):
+            errors.append(f"{name}[{i}]: expected an object")
+            continue
+        rid = rec.get("id")
+        if not isinstance(rid, str) or not rid:
+            errors.append(f"{name}[{i}]: missing id")
+        elif rid in seen:
+            errors.append(f"{name}: duplicate id '{rid}'")
+        seen.add(rid)
+        for key in required:
+            if not _number(rec.get(key)):
+                errors.append(f"{name}[{rid or i}].{key}: expected a number")
+            elif rec[key] < 0:
+                errors.append(f"{name}[{rid or i}].{key}: must be >= 0")
+
+
+def _mapping(value, what: str, errors: list) -> dict:
+    """value if it is a mapping (None = empty); otherwise record the error and return {}."""
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        errors.append(f"{CALIBRATION_FILE}: {what} must be a mapping, got {type(value).__name__}")
+        return {}
+    return value
+
+
+def _validate(crops, infra, cal, errors: list) -> None:
+    if not isinstance(cal, dict):
+        errors.append(f"{CALIBRATION_FILE}: expected a mapping")
+        return
+    glob = cal.get("globals")
+    if not isinstance(glob, dict) or not all(_number(v) for v in glob.values()):
+        errors.append(f"{CALIBRATION_FILE}: globals must map names to numbers")
+        glob = {}
+    events = cal.get("events")
+    if not isinstance(events, dict) or not all(_number(v) for v in events.values()):
+        errors.append(f"{CALIBRATION_FILE}: events must map names to numbers")
+        events = {}
+    groups = _mapping(cal.get("groups"), "groups", errors)
+    for g, names in groups.items():
+        if names is not None and not isinstance(names, list):
+            errors.append(f"{CALIBRATION_FILE}: group '{g}' must be a list of coefficient names")
+            continue
+        for n in names or ():
+            if not isinstance(n, str) or n not in glob:
+                errors.append(f"{CALIBRATION_FILE}: group '{g}' names unknown coefficient '{n}'")
+    presets = _mapping(cal.get("presets"), "presets", errors)
+    if DEFAULT_PRESET not in presets:
+        errors.append(f"{CALIBRATION_FILE}: preset '{DEFAULT_PRESET}' is required")
+    for p, spec in presets.items():
+        spec = _mapping(spec, f"preset '{p}'", errors)
+        mult = _mapping(spec.get("multipliers"), f"preset '{p}' multipliers", errors)
+        for g, v in mult.items():
+            if g not in groups:
+                errors.append(f"{CALIBRATION_FILE}: preset '{p}' multiplies unknown group '{g}'")
+            elif not _number(v) or v < 0:
+                errors.append(f"{CALIBRATION_FILE}: preset '{p}' multiplier '{g}' must be a number >= 0")
+    regions = _mapping(cal.get("regions"), "regions", errors)
+    for r, spec in regions.items():
+        spec = _mapping(spec, f"region '{r}'", errors)
+        for n, v in _mapping(spec.get("overrides"), f"region '{r}' overrides", errors).items():
+            if n not in glob or not _number(v):
+                errors.append(f"{CALIBRATION_FILE}: region '{r}' overrides unknown/non-numeric '{n}'")
+        for n, v in _mapping(spec.get("event_overrides"), f"region '{r}' event_overrides", errors).items():
+            if n not in events or not _number(v):
+                errors.append(f"{CALIBRATION_FILE}: region '{r}' event_overrides unknown/non-numeric '{n}'")
+    order = cal.get("apply_order", ["globals", f"presets/{DEFAULT_PRESET}", "regions"])
+    if (not isinstance(order, list) or not all(isinstance(o, str) for o in order)
+            or sorted(order) != sorted(["globals", f"presets/{DEFAULT_PRESET}", "regions"]) or order[0] != "globals"):
+        errors.append(f"{CALIBRATION_FILE}: apply_order must start with globals and list "
+                      f"presets/{DEFAULT_PRESET} and regions once")
+
+    _check_records(CROPS_FILE, crops, _CROP_COLUMNS, errors)
+    _check_records(INFRA_FILE, infra, _INFRA_COLUMNS, errors)
+    for rec in crops if isinstance(crops, list) else ():
+        if not isinstance(rec, dict):
+            continue
+        rid = rec.get("id")
+        if not isinstance(rec.get("region"), str) or rec["region"] not in regions:
+            errors.append(f"{CROPS_FILE}[{rid}].region: unknown region '{rec.get('region')}'")
+        prof = rec.get("ndvi_profile")
+        if not (isinstance(prof, list) and len(prof) == len(SEASONS) and all(_number(v) and 0 <= v <= 1 for v in prof)):
+            errors.append(f"{CROPS_FILE}[{rid}].ndvi_profile: expected {len(SEASONS)} values in 0..1")
+        for key in _UNIT_RANGE:
+            if _number(rec.get(key)) and rec[key] > 1:
+                errors.append(f"{CROPS_FILE}[{rid}].{key}: must be in 0..1")
+        soil = rec.get("soil_effects") or {}
+        if not isinstance(soil, dict) or not all(_number(v) for v in soil.values()):
+            errors.append(f"{CROPS_FILE}[{rid}].soil_effects: values must be numbers")
+    for rec in infra if isinstance(infra, list) else ():
+        if not isinstance(rec, dict):
+            continue
+        rid = rec.get("id")
+        infra_regions = rec.get("regions") or []
+        if not isinstance(infra_regions, list):
+            errors.append(f"{INFRA_FILE}[{rid}].regions: expected a list")
+            infra_regions = []
+        for r in infra_regions:
+            if not isinstance(r, str) or r not in regions:
+                errors.append(f"{INFRA_FILE}[{rid}].regions: unknown region '{r}'")
+        if not isinstance(rec.get("category"), str):
+            errors.append(f"{INFRA_FILE}[{rid}].category: expected a string")
+        effects = rec.get("effects")
+        if not isinstance(effects, dict) or not all(_number(v) or isinstance(v, bool) for v in effects.values()):
+            errors.append(f"{INFRA_FILE}[{rid}].effects: expected an object of numbers/booleans")
+    for code, reg in REGIONS.items():
+        if reg.get("conf_id") not in regions:
+            errors.append(f"sim/manifests.py: region '{code}' maps to unknown conf region '{reg.get('conf_id')}'")
+
+
+def _resolve_coeffs(cal: dict, presets: tuple, region_ids: tuple, coeff_names: tuple) -> np.ndarray:
+    glob = cal["globals"]
+    groups = cal.get("groups") or {}
+    order = cal.get("apply_order", ["globals", f"presets/{DEFAULT_PRESET}", "regions"])
+    out = np.empty((len(presets), len(region_ids), len(coeff_names)), dtype=np.float64)
+    col = {n: i for i, n in enumerate(coeff_names)}
+    for p, preset in enumerate(presets):
+        mult = cal["presets"][preset].get("multipliers") or {}
+        for r, region in enumerate(region_ids):
+            values = np.array([glob[n] for n in coeff_names], dtype=np.float64)
+            for step in order[1:]:
+                if step == "regions":
+                    for n, v in (cal["regions"][region] or {}).get("overrides", {}).items():
+                        values[col[n]] = v
+                else:  # presets/<default>: the game's preset takes its place
+                    for g, m in mult.items():
+                        for n in groups.get(g) or ():
+                            values[col[n]] *= m
+            out[p, r] = values
+    return out
+
+
+_FILES = (CROPS_FILE, INFRA_FILE, CALIBRATION_FILE)
+
+
+def read_sources(conf_dir: Path = CONF_DIR) -> dict:
+    """{file name: text} of the conf files."""
+    try:
+        return {name: (Path(conf_dir) / name).read_text(encoding="utf-8") for name in _FILES}
+    except OSError as e:
+        raise ConfigError(f"cannot read config from {conf_dir}: {e}") from None
+
+
+def compile_config(conf_dir: Path = CONF_DIR) -> CompiledConfig:
+    """Read, validate and compile the conf files; raises ConfigError listing every problem."""
+    return compile_sources(read_sources(conf_dir), str(conf_dir))
+
+
+def compile_sources(sources: dict, origin: str = "") -> CompiledConfig:
+    try:
+        crops = json.loads(sources[CROPS_FILE])
+        infra = json.loads(sources[INFRA_FILE])
+        cal = yaml.safe_load(sources[CALIBRATION_FILE])
+    except (ValueError, yaml.YAMLError) as e:
+        raise ConfigError(f"cannot parse config from {origin or 'sources'}: {e}") from None
+    errors: list[str] = []
+    _validate(crops, infra, cal, errors)
+    if errors:
+        raise ConfigError("invalid config:\n  " + "\n  ".join(errors))
+    try:
+        return _compile(crops, infra, cal, sources, origin)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:  # a shape _validate does not know yet
+        raise ConfigError(f"invalid config from {origin or 'sources'}: {type(e).__name__}: {e}") from e
+
+
+def _compile(crops, infra, cal, sources: dict, origin: str) -> CompiledConfig:
+    region_ids = tuple(cal["regions"])
+    region_codes = tuple(REGIONS)
+    presets = tuple(cal["presets"])
+    coeff_names = tuple(sorted(cal["globals"]))
+    event_names = tuple(sorted(cal["events"]))
+    groups = tuple(cal.get("groups") or ())
+
+    crop_ids = tuple(c["id"] for c in crops)
+    crop_cols = {k: np.array([c[k] for c in crops], dtype=np.float64) for k in _CROP_COLUMNS}
+    crop_cols["ndvi_profile"] = np.array([c["ndvi_profile"] for c in crops], dtype=np.float64).reshape(-1, len(SEASONS))
+    for k in sorted({k for c in crops for k in c.get("soil_effects") or {}}):
+        crop_cols[k] = np.array([(c.get("soil_effects") or {}).get(k, 0.0) for c in crops], dtype=np.float64)
+
+    effect_names = tuple(sorted({k for i in infra for k in i["effects"]}))
+    effects = np.array([[float(i["effects"].get(k, 1.0 if k.endswith("_multiplier") else 0.0)) for k in effect_names]
+                        for i in infra], dtype=np.float64).reshape(len(infra), len(effect_names))
+
+    events = np.array([[{**cal["events"], **((cal["regions"][r] or {}).get("event_overrides") or {})}[n]
+                        for n in event_names] for r in region_ids], dtype=np.float64)
+    multipliers = np.array([[(cal["presets"][p].get("multipliers") or {}).get(g, 1.0) for g in groups]
+                            for p in presets], dtype=np.float64).reshape(len(presets), len(groups))
+
+    def crop_column(key):
+        return np.array([CROPS[name][key] for name in CROP_NAMES], dtype=np.float64)
+
+    engine = {"crops": CROPS, "regions": REGIONS}
+    manifests_sha = _sha({"crops": crops, "infrastructure": infra})
+    return CompiledConfig(
+        config_sha=_sha({"manifests_sha": manifests_sha, "calibration": cal, "engine": engine}),
+        manifests_sha=manifests_sha,
+        version=str(cal.get("version", "")),
+        region_ids=region_ids,
+        region_codes=region_codes,
+        presets=presets,
+        crop_yield=crop_column("yield"),
+        crop_water=crop_column("water"),
+        crop_salt=crop_column("salt"),
+        crop_ndvi_peak=crop_column("ndvi_peak"),
+        crop_price=crop_column("price"),
+        crop_fertility=crop_column("fertility"),
+        seasonal_rain=np.array([[REGIONS[c]["seasonal_rain"][s] for s in SEASONS] for c in region_codes]),
+        seasonal_temp=np.array([[REGIONS[c]["seasonal_temp"][s] for s in SEASONS] for c in region_codes]),
+        shock_bands=_shock_bands(region_codes),
+        crop_ids=crop_ids,
+        crops=crop_cols,
+        crop_region=np.array([region_ids.index(c["region"]) for c in crops], dtype=np.int64),
+        infra_ids=tuple(i["id"] for i in infra),
+        infra_categories=tuple(i["category"] for i in infra),
+        infra={k: np.array([i[k] for i in infra], dtype=np.float64) for k in _INFRA_COLUMNS},
+        effect_names=effect_names,
+        infra_effects=effects,
+        infra_regions=np.array([[r in (i.get("regions") or ()) for r in region_ids] for i in infra], dtype=bool),
+        coeff_names=coeff_names,
+        coeffs=_resolve_coeffs(cal, presets, region_ids, coeff_names),
+        multiplier_groups=groups,
+        multipliers=multipliers,
+        event_names=event_names,
+        events=events,
+        source={"origin": origin},
+    )
+
+
+def _shock_bands(region_codes: tuple) -> np.ndarray:
+    per_season = [[[(*e["draw"], e.get("rain", 1.0), e.get("temp", 1.0))
+                    for e in REGIONS[c].get("shocks", ()) if s in e["seasons"]] for s in SEASONS]
+                  for c in region_codes]
+    n = max([1] + [len(bands) for seasons in per_season for bands in seasons])
+    out = np.zeros((len(region_codes), len(SEASONS), n, 4), dtype=np.float64)
+    for i, seasons in enumerate(per_season):
+        for j, bands in enumerate(seasons):
+            if bands:
+                out[i, j, :len(bands)] = bands
+    return out
+
+
+# ---- versions: current() for new games, config_for(sha) for running ones ----
+log = logging.getLogger("app.sim.config")
+
+_lock = threading.Lock()        # serialises reloads and registry updates; readers never wait
+_versions: "OrderedDict[str, CompiledConfig]" = OrderedDict()
+_current: CompiledConfig | None = None
+_reloads = {"ok": 0, "failed": 0, "last_error": None, "last_reload": None}
+
+
+def _archive(cfg: CompiledConfig, sources: dict) -> None:
+    target = CONF_ARCHIVE_DIR / cfg.config_sha
+    if target.exists():
+        return
+    try:
+        CONF_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{cfg.config_sha[:12]}.", dir=CONF_ARCHIVE_DIR))
+        for name, text in sources.items():
+            (tmp / name).write_text(text, encoding="utf-8")
+        try:
+            os.rename(tmp, target)
+        except OSError:  # another worker archived the same version first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except OSError as e:
+        log.warning("cannot archive config %s: %s", cfg.config_sha[:12], e)
+
+
+def _remember(cfg: CompiledConfig, sha: str | None = None) -> None:
+    sha = sha or cfg.config_sha
+    with _lock:
+        _versions[sha] = cfg
+        _versions.move_to_end(sha)
+        while len(_versions) > CONF_KEEP + 1:
+            sha = next(iter(_versions))
+            if _current is not None and sha == _current.config_sha:
+                _versions.move_to_end(sha)
+                continue
+            del _versions[sha]
+
+
+def current() -> CompiledConfig:
+    return _current
+
+
+def config_for(sha: str) -> CompiledConfig:
+    """The compiled config a game runs with (recompiled from the archive if not in memory)."""
+    cfg = _current
+    if not sha or sha == cfg.config_sha:
+        return cfg
+    found = _versions.get(sha)
+    if found is not None:
+        return found
+    if len(sha) != 64 or not all(ch in "0123456789abcdef" for ch in sha):
+        log.warning("bad config sha %r; using current %s", sha[:80], cfg.config_sha[:12])
+        return cfg
+    try:
+        found = compile_sources(read_sources(CONF_ARCHIVE_DIR / sha), f"archive/{sha[:12]}")
+    except ConfigError as e:
+        log.warning("config %s is not available (%s); using current %s", sha[:12], e, cfg.config_sha[:12])
+        return cfg
+    if found.config_sha != sha:  # the engine's inline tables changed since it was archived
+        log.warning("config %s recompiles as %s", sha[:12], found.config_sha[:12])
+    _remember(found, sha)
+    return found
+
+
+def reload(conf_dir: Path = CONF_DIR) -> dict:
+    """Recompile conf_dir and make it current() if valid; on errors the current config stays."""
+    global _current
+    try:
+        sources = read_sources(conf_dir)
+        cfg = compile_sources(sources, str(conf_dir))
+    except ConfigError as e:
+        with _lock:
+            _reloads["failed"] += 1
+            _reloads["last_error"] = str(e)
+        log.error("config reload failed, keeping %s: %s", _current.config_sha[:12], e)
+        raise
+    _archive(cfg, sources)
+    _remember(cfg)
+    with _lock:
+        previous, _current = _current, cfg  # the swap: one reference assignment
+        _reloads["ok"] += 1
+        _reloads["last_error"] = None
+        _reloads["last_reload"] = time.time()
+    changed = previous is None or previous.config_sha != cfg.config_sha
+    if changed and previous is not None:
+        log.info("config reloaded: %s -> %s", previous.config_sha[:12], cfg.config_sha[:12])
+    return {"changed": changed, "config_sha": cfg.config_sha,
+            "previous_sha": previous.config_sha if previous else None}
+
+
+def stats() -> dict:
+    with _lock:
+        return {"current": _current.config_sha, "loaded": list(_versions), **_reloads,
+                "watch_seconds": CONF_WATCH_SECONDS}
+
+
+# ---- file watcher ----
+_watcher: threading.Thread | None = None
+
+
+def _mtimes(conf_dir: Path) -> tuple:
+    out = []
+    for name in _FILES:
+        try:
+            st = (Path(conf_dir) / name).stat()
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+
+def _watch(conf_dir: Path, interval: float) -> None:
+    seen = _mtimes(conf_dir)
+    while True:
+        time.sleep(interval)
+        now = _mtimes(conf_dir)
+        if now == seen:
+            continue
+        seen = now
+        try:
+            reload(conf_dir)
+        except ConfigError:
+            pass  # logged; try again on the next change
+        except Exception:  # never let one bad save end the watcher for the life of the process
+            log.exception("config watcher: reload of %s failed", conf_dir)
+
+
+def start_watcher(conf_dir: Path = CONF_DIR, interval: float = CONF_WATCH_SECONDS) -> None:
+    """Poll the conf files every `interval` seconds and reload() on change (once per process)."""
+    global _watcher
+    with _lock:
+        if _watcher is not None or interval <= 0:
+            return
+        _watcher = threading.Thread(target=_watch, args=(conf_dir, interval), name="conf-watch", daemon=True)
+        _watcher.start()
+
+
+# compiled once at import: a broken conf/ fails the app at startup, not on the first tick
+reload()
@@ -1,120 +1,388 @@
-import uuid, random
+import os, uuid, threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from typing import Dict
 import numpy as np
-from ..models import GameState, Region, Climate, Farm, Finance
-from .manifests import CROPS, REGIONS
-from .events import apply_event_shocks
+from ..models import (
+    GameState, Region, Climate, EOAnchor, Farm, Finance, PlanCell, PlanOp, ScheduledPlan, FARM_LAYERS,
+    PLAN_FLAG_IRRIGATION, PLAN_FLAG_DRAINAGE, PLAN_FLAGS_KEEP, PLAN_CROP_KEEP,
+)
+from ..masks import MaskError, rect_index, polygon_mask, rle_mask
+from .manifests import (
+    crop_index, REGIONS,
+)
+from .config import DEFAULT_PRESET, SEASONS, config_for, current
+from .events import apply_event_shocks, event_draws, event_shocks
+from .forcing import check_anchor, factors as forcing_factors
+from .history import HISTORY_TURNS, RasterHistory
+from ..metrics import timed
 
-def new_game_state(region_code: str, seed: int | None) -> GameState:
-    rng = random.Random(seed or 1337)
-    reg = REGIONS[region_code]
+# seasonal phenology: lower in winter, highest in summer
+PHENOLOGY = {"spring":0.9,"summer":1.0,"autumn":0.8,"winter":0.5}
+
+def new_game_state(region_code: str, seed: int | None, size: int = 32, preset: str = DEFAULT_PRESET,
+                   eo: EOAnchor | None = None) -> GameState:
+    cfg = current()  # the game stays on this version across config reloads
+    r = cfg.region_code_index(region_code)
     region = Region(
         code = region_code,
-        display_name = reg["display"],
+        display_name = REGIONS[region_code]["display"],
         climate = Climate(
-            seasonal_rain = reg["seasonal_rain"],
-            seasonal_temp = reg["seasonal_temp"],
+            seasonal_rain = dict(zip(SEASONS, cfg.seasonal_rain[r].tolist())),
+            seasonal_temp = dict(zip(SEASONS, cfg.seasonal_temp[r].tolist())),
         )
     )
-    farm = Farm(size=32)
+    farm = Farm(size=size)
     # Init some spatial variation
     n = farm.size
-    for i, c in enumerate(farm.cells):
-        y = i // n; x = i % n
-        c.moisture = 0.4 + 0.1*np.sin(x/7) + 0.05*np.cos(y/5)
-        c.salinity = 0.2 + 0.1*np.sin(x/13) * np.cos(y/11)
-        c.fertility = 0.55 + 0.1*np.cos(x/9) * np.cos(y/9)
-        c.ndvi = max(0.1, c.fertility - c.salinity*0.25)
+    y, x = np.mgrid[0:n, 0:n].astype(np.float64)
+    farm.moisture[:] = 0.4 + 0.1*np.sin(x/7) + 0.05*np.cos(y/5)
+    farm.salinity[:] = 0.2 + 0.1*np.sin(x/13) * np.cos(y/11)
+    farm.fertility[:] = 0.55 + 0.1*np.cos(x/9) * np.cos(y/9)
+    farm.ndvi[:] = np.maximum(0.1, farm.fertility - farm.salinity*0.25)
     gs = GameState(
         id=str(uuid.uuid4())[:8],
         region=region,
         farm=farm,
         finance=Finance(),
+        seed=seed or 1337,
+        preset=preset,
+        config_sha=cfg.config_sha,
+        manifests_sha=cfg.manifests_sha,
     )
+    if eo is not None:
+        gs.eo = check_anchor(eo, gs.year)  # ForcingError if the window or its data is unusable
+    if HISTORY_TURNS > 0:
+        gs.history = RasterHistory(size)
+        gs.history.record(gs.turn, farm)
     return gs
 
 def season_index(season: str) -> int:
     return ["spring","summer","autumn","winter"].index(season)
 
-def apply_plan_and_tick(gs: GameState) -> None:
-    # 1) event shocks (droughts/floods/heatwaves) -> modifies climate shock multipliers this season
-    apply_event_shocks(gs)
-    rain = gs.region.climate.seasonal_rain[gs.season] * gs.region.climate.shock_rain
-    temp = gs.region.climate.seasonal_temp[gs.season] * gs.region.climate.shock_temp
+def apply_plan(farm: Farm, cells: Dict[str, PlanCell]) -> None:
+    """Merge a plan into the farm (simple overwrite per cell; bad ids are ignored)."""
+    idx, crops, irr, drn = [], [], [], []
+    for cell_id, plan in cells.items():
+        try:
+            i = int(cell_id)
+        except Exception:
+            continue
+        if 0 <= i < farm.n_cells:
+            if plan.crop:
+                crops.append((i, crop_index(plan.crop)))
+            if plan.irrigation is not None:
+                irr.append((i, plan.irrigation))
+            if plan.drainage is not None:
+                drn.append((i, plan.drainage))
+    # one scattered write per field; repeated ids keep the last value, as before
+    for arr, pairs in ((farm.crop, crops), (farm.irrigation, irr), (farm.drainage, drn)):
+        if pairs:
+            ids, values = zip(*pairs)
+            arr.flat[list(ids)] = values
+
+def plan_op_index(size: int, op: PlanOp):
+    """Farm array index selected by a PlanOp (see app/masks.py); raises MaskError."""
+    if op.shape == "all":
+        return (slice(None), slice(None))
+    if op.shape == "rect":
+        if not op.rect or len(op.rect) != 4:
+            raise MaskError("rect op needs rect=[x, y, w, h]")
+        return rect_index(size, *op.rect)
+    if op.shape == "polygon":
+        return polygon_mask(size, op.points or [])
+    if op.rle is None:
+        raise MaskError("rle op needs rle=[runs...]")
+    return rle_mask(size, op.rle)
+
+def apply_plan_ops(farm: Farm, ops: list[PlanOp]) -> int:
+    """
+    Apply bulk plan edits in order (later ops win). All selections are validated before
+    anything is written, so a bad op leaves the farm untouched. Returns the cells touched.
+    """
+    sel = [plan_op_index(farm.size, op) for op in ops]
+    touched = np.zeros((farm.size, farm.size), dtype=bool)
+    for op, index in zip(ops, sel):
+        if op.crop:
+            farm.crop[index] = crop_index(op.crop)
+        if op.irrigation is not None:
+            farm.irrigation[index] = op.irrigation
+        if op.drainage is not None:
+            farm.drainage[index] = op.drainage
+        touched[index] = True
+    return int(touched.sum())
+
+def plan_arrays(farm: Farm) -> tuple[np.ndarray, np.ndarray]:
+    """(crop index, flag bitfield) uint8 rasters in the /plan/raw format."""
+    flags = (farm.irrigation.astype(np.uint8) * PLAN_FLAG_IRRIGATION) | \
+            (farm.drainage.astype(np.uint8) * PLAN_FLAG_DRAINAGE)
+    return farm.crop.astype(np.uint8, copy=True), flags
+
+def apply_plan_arrays(farm: Farm, crop: np.ndarray | None, flags: np.ndarray | None) -> None:
+    """Write raw (size, size) uint8 plan rasters; PLAN_CROP_KEEP / PLAN_FLAGS_KEEP cells are skipped."""
+    if crop is not None:
+        np.copyto(farm.crop, crop, where=crop != PLAN_CROP_KEEP)
+    if flags is not None:
+        keep = (flags & PLAN_FLAGS_KEEP) != 0
+        np.copyto(farm.irrigation, (flags & PLAN_FLAG_IRRIGATION) != 0, where=~keep)
+        np.copyto(farm.drainage, (flags & PLAN_FLAG_DRAINAGE) != 0, where=~keep)
+
+# Large farms are ticked in row bands ("tiles") so temporaries stay bounded per worker
+# (~SIM_TILE_CELLS cells each) and bands run in parallel on a thread pool: every update
+# is per-cell, numpy releases the GIL inside ufuncs, and threads write straight into
+# views of the farm arrays without copying state between processes.
+TILE_CELLS = int(os.getenv("SIM_TILE_CELLS", str(256 * 256)))
+WORKERS = int(os.getenv("SIM_WORKERS", str(os.cpu_count() or 1)))
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="sim-tile")
+        return _pool
+
+def tile_slices(size: int) -> list[slice]:
+    rows = max(1, TILE_CELLS // max(1, size))
+    return [slice(r, min(r + rows, size)) for r in range(0, size, rows)]
+
+# Per-tile partial sums returned by _tick_cells (combined in _turn_stats)
+_P_INCOME, _P_IRR, _P_DRN, _P_FERT, _P_NDVI, _P_MOIST, _P_MOIST_M2, _P_SAL, _P_SAL_M2 = range(9)
+
+def tick_params(gs: GameState) -> SimpleNamespace:
+    """
+    Compiled tables (sim/config.py) the game was created with, its preset's multipliers and,
+    for EO-anchored games, this season's per-cell rain/temp multipliers (sim/forcing.py).
+    """
+    cfg = config_for(gs.config_sha)
+    if gs.config_sha and gs.config_sha != cfg.config_sha:
+        # archived version lost or recompiled differently: report what the game now runs with
+        gs.config_sha, gs.manifests_sha = cfg.config_sha, cfg.manifests_sha
+    forcing = forcing_factors(gs)
+    return SimpleNamespace(cfg=cfg, stress=cfg.multiplier(gs.preset, "stresses"),
+                           event_prob=cfg.multiplier(gs.preset, "event_prob"),
+                           rain=forcing.get("rain"), temp=forcing.get("temp"))
+
+def _tick_cells(moisture, salinity, fertility, ndvi, crop, irr, drn, rain, temp, phen: float,
+                p: SimpleNamespace) -> np.ndarray:
+    """
+    Advance one block of cells in place. State arrays are (..., h, w); the plan (crop/irr/drn, (h, w)
+    or per member (..., h, w)) and rain/temp (scalars, (..., 1, 1) or per cell) broadcast over the leading
+    axes, which is how an ensemble of K members runs as one (K, h, w) block. `p` = tick_params(gs).
+    Returns partial sums (..., 9).
+    """
+    c = p.cfg
+    water_need = c.crop_water[crop]
+
+    # moisture update; irrigation boost 0.25
+    et = 0.25 + 0.35*temp  # evapotranspiration driver
+    np.clip(moisture + rain + 0.25*irr - et, 0.0, 1.0, out=moisture)
+
+    # salinity accumulates if high irrigation without drainage; decreases with drainage + rainfall
+    sal = salinity + np.where(irr & ~drn, 0.05*(0.5 + water_need), 0.0)
+    sal -= 0.04*(rain + 0.4*drn)
+    np.clip(sal, 0.0, 1.0, out=salinity)
+
+    # fertility: small gain with legumes/alfalfa/cover; small loss with exhaustive crops
+    np.clip(fertility + c.crop_fertility[crop], 0.2, 1.0, out=fertility)
 
-    # 2) per-cell water balance & salinity
-    n = gs.farm.size
-    for c in gs.farm.cells:
-        crop = CROPS.get(c.plan.crop, CROPS["fallow"])
-        water_need = crop["water"]
-        # irrigation and drainage toggles
-        irrigation_boost = 0.25 if c.plan.irrigation else 0.0
-        drainage_relief = 0.1 if c.plan.drainage else 0.0
-
-        # moisture update
-        et = 0.25 + 0.35*temp  # evapotranspiration driver
-        c.moisture = c.moisture + rain + irrigation_boost - et
-        c.moisture = max(0.0, min(1.0, c.moisture))
-
-        # salinity accumulates if high irrigation without drainage; decreases with drainage + rainfall
-        if c.plan.irrigation and not c.plan.drainage:
-            c.salinity += 0.05*(0.5 + water_need)
-        c.salinity -= 0.04*(rain + (0.4 if c.plan.drainage else 0.0))
-        c.salinity = max(0.0, min(1.0, c.salinity))
-
-        # fertility: small gain with legumes/alfalfa/cover; small loss with exhaustive crops
-        if c.plan.crop in ("alfalfa",):
-            c.fertility += 0.02
-        elif c.plan.crop in ("wheat","maize","cotton","millet"):
-            c.fertility -= 0.01
-        else:
-            c.fertility += 0.005  # fallow/cover
-        c.fertility = max(0.2, min(1.0, c.fertility))
-
-        # NDVI response: peak by crop, damped by stress penalties
-        stress_water = max(0.0, water_need - c.moisture)  # unmet demand
-        # salinity stress: ratio vs crop tolerance
-        tol = max(1e-3, CROPS.get(c.plan.crop, CROPS["fallow"])["salt"])
-        stress_salt = max(0.0, (c.salinity - tol*0.5))
-        growth = crop["ndvi_peak"] * (1.0 - 0.6*stress_water - 0.5*stress_salt) * (0.8 + 0.4*c.fertility)
-        growth = max(0.05, min(0.95, growth))
-        # seasonal phenology: lower in winter, highest in summer
-        phen = {"spring":0.9,"summer":1.0,"autumn":0.8,"winter":0.5}[gs.season]
-        target_ndvi = growth * phen
-        # relax towards target
-        c.ndvi = 0.6*c.ndvi + 0.4*target_ndvi
-
-        # update last_crop at the end of season
-        c.last_crop = c.plan.crop or c.last_crop
+    # NDVI response: peak by crop, damped by stress penalties
+    stress_water = np.maximum(0.0, water_need - moisture)  # unmet demand
+    # salinity stress: ratio vs crop tolerance
+    tol = np.maximum(1e-3, c.crop_salt[crop])
+    stress_salt = np.maximum(0.0, salinity - tol*0.5)
+    growth = c.crop_ndvi_peak[crop] * (1.0 - 0.6*p.stress*stress_water - 0.5*p.stress*stress_salt) * (0.8 + 0.4*fertility)
+    np.clip(growth, 0.05, 0.95, out=growth)
+    # relax towards target
+    ndvi[:] = 0.6*ndvi + 0.4*(growth * phen)
 
+    # finances: proxy yield by ndvi and fertility; price scaled for cell fraction
+    yield_factor = ndvi * (0.5 + 0.5*fertility)
+    cells = (-2, -1)
+    out = np.empty(moisture.shape[:-2] + (9,), dtype=np.float64)
+    out[..., _P_INCOME] = (c.crop_yield[crop] * yield_factor * c.crop_price[crop] / 100.0).sum(axis=cells)
+    out[..., _P_IRR] = np.count_nonzero(irr, axis=cells)
+    out[..., _P_DRN] = np.count_nonzero(drn, axis=cells)
+    out[..., _P_FERT] = fertility.sum(axis=cells)
+    out[..., _P_NDVI] = ndvi.sum(axis=cells)
+    # moisture/salinity: sum and sum of squared deviations from the tile mean (for a stable std)
+    n = moisture.shape[-2] * moisture.shape[-1]
+    for arr, i_sum, i_m2 in ((moisture, _P_MOIST, _P_MOIST_M2), (salinity, _P_SAL, _P_SAL_M2)):
+        s = arr.sum(axis=cells)
+        out[..., i_sum] = s
+        out[..., i_m2] = np.square(arr - (s/n)[..., None, None]).sum(axis=cells)
+    return out
+
+def _tick_tile(f: Farm, rows: slice, rain, temp, phen: float, p: SimpleNamespace) -> np.ndarray:
+    if np.ndim(rain):
+        rain = rain[rows]
+    if np.ndim(temp):
+        temp = temp[rows]
+    out = _tick_cells(f.moisture[rows], f.salinity[rows], f.fertility[rows], f.ndvi[rows],
+                      f.crop[rows], f.irrigation[rows], f.drainage[rows], rain, temp, phen, p)
+    # update last_crop at the end of season
+    f.last_crop[rows] = f.crop[rows]
+    return out
+
+def _combine_std(parts: np.ndarray, counts: np.ndarray, i_sum: int, i_m2: int):
+    # parallel variance (Chan et al.): M2 = sum(M2_i + n_i*(mean_i - mean)^2)
+    n = counts.sum()
+    mean = parts[..., i_sum].sum(axis=0) / n
+    m2 = (parts[..., i_m2] + counts*np.square(parts[..., i_sum]/counts - mean)).sum(axis=0)
+    return np.sqrt(m2 / n)
+
+def _turn_stats(parts: np.ndarray, counts: np.ndarray) -> dict:
+    """Finance inputs and farm means from per-tile sums: parts (tiles, ..., 9), counts (tiles,)."""
+    counts = counts.reshape((-1,) + (1,) * (parts.ndim - 2))
+    n = counts.sum()
+    total = parts.sum(axis=0)
+    return {
+        "income": total[..., _P_INCOME],
+        "cost": 1.2*total[..., _P_IRR] + 0.8*total[..., _P_DRN],
+        "avg_ndvi": total[..., _P_NDVI]/n,
+        "avg_moisture": total[..., _P_MOIST]/n,
+        "avg_salinity": total[..., _P_SAL]/n,
+        "avg_fertility": total[..., _P_FERT]/n,
+        "std_moisture": _combine_std(parts, counts, _P_MOIST, _P_MOIST_M2),
+        "std_salinity": _combine_std(parts, counts, _P_SAL, _P_SAL_M2),
+    }
+
+def _update_finance(fin, st: dict) -> None:
+    """Finance/score update; fin is a Finance or holds one array per field (ensembles)."""
+    income, cost = st["income"], st["cost"]
     # 3) finances (extremely simplified)
-    income = 0.0; cost = 0.0
-    for c in gs.farm.cells:
-        crop = CROPS.get(c.plan.crop, CROPS["fallow"])
-        # proxy yield by ndvi and fertility
-        yield_factor = c.ndvi * (0.5 + 0.5*c.fertility)
-        y = crop["yield"] * yield_factor
-        income += y * crop["price"] / 100.0  # scaling for cell fraction
-        if c.plan.irrigation: cost += 1.2
-        if c.plan.drainage: cost += 0.8
-    gs.finance.cash += income - cost
+    fin.cash += income - cost
 
     # 4) scoring snapshots
-    gs.finance.score_economy = 0.7*gs.finance.score_economy + 0.3*(income - cost)
+    fin.score_economy = 0.7*fin.score_economy + 0.3*(income - cost)
     # sustainability: high fertility, low salinity, moderate moisture
-    sustain = (1.2*avg_attr(gs.farm.cells, "fertility") - 0.8*avg_attr(gs.farm.cells, "salinity")
-               - 0.2*abs(avg_attr(gs.farm.cells,"moisture")-0.6))
-    gs.finance.score_sustain = 0.7*gs.finance.score_sustain + 0.3*sustain
+    sustain = 1.2*st["avg_fertility"] - 0.8*st["avg_salinity"] - 0.2*abs(st["avg_moisture"] - 0.6)
+    fin.score_sustain = 0.7*fin.score_sustain + 0.3*sustain
     # risk: variance of moisture/salinity (lower is better)
-    risk = - (np.std([c.moisture for c in gs.farm.cells]) + np.std([c.salinity for c in gs.farm.cells]))
-    gs.finance.score_risk = 0.7*gs.finance.score_risk + 0.3*risk
+    risk = - (st["std_moisture"] + st["std_salinity"])
+    fin.score_risk = 0.7*fin.score_risk + 0.3*risk
     # efficiency: NDVI per unit cost
-    eff = (avg_attr(gs.farm.cells,"ndvi")+1e-4)/(1.0+cost/100.0)
-    gs.finance.score_efficiency = 0.7*gs.finance.score_efficiency + 0.3*eff
+    eff = (st["avg_ndvi"] + 1e-4)/(1.0 + cost/100.0)
+    fin.score_efficiency = 0.7*fin.score_efficiency + 0.3*eff
+
+@timed("tick")
+def apply_plan_and_tick(gs: GameState) -> dict:
+    """Play one season. Returns the turn's finance and farm means (taken from the tile sums)."""
+    # 1) event shocks (droughts/floods/heatwaves) -> modifies climate shock multipliers this season
+    p = tick_params(gs)
+    apply_event_shocks(gs, p.cfg, p.event_prob)
+    rain = gs.region.climate.seasonal_rain[gs.season] * gs.region.climate.shock_rain
+    temp = gs.region.climate.seasonal_temp[gs.season] * gs.region.climate.shock_temp
+    if p.rain is not None:
+        rain = rain * p.rain
+    if p.temp is not None:
+        temp = temp * p.temp
+
+    # 2) water balance, salinity, fertility, NDVI and per-tile finance sums (see _tick_cells)
+    f = gs.farm
+    phen = PHENOLOGY[gs.season]
+    tiles = tile_slices(f.size)
+    if len(tiles) == 1:
+        parts = [_tick_tile(f, tiles[0], rain, temp, phen, p)]
+    else:
+        parts = list(_executor().map(lambda rows: _tick_tile(f, rows, rain, temp, phen, p), tiles))
+    counts = np.array([(t.stop - t.start) * f.size for t in tiles], dtype=np.float64)
+    st = {k: float(v) for k, v in _turn_stats(np.stack(parts), counts).items()}
+
+    # 3-4) finances and scores
+    _update_finance(gs.finance, st)
 
     # 5) advance time
     gs.turn += 1
     gs.advance_season()
+    if gs.history is not None:
+        gs.history.record(gs.turn, f)
+    return {k: st[k] for k in TRAJECTORY_TURN}
+
+def scheduled_plans(schedule: list[ScheduledPlan]):
+    """-> plans_for(gs): plan dicts due before the next tick (season plans first, then turn plans)."""
+    by_season: Dict[str, list] = {}
+    by_turn: Dict[int, list] = {}
+    for entry in schedule:
+        if entry.season is not None:
+            by_season.setdefault(entry.season, []).append(entry.cells)
+        if entry.turn is not None:
+            by_turn.setdefault(entry.turn, []).append(entry.cells)
+    return lambda gs: by_season.get(gs.season, []) + by_turn.get(gs.turn, [])
+
+# Columns of the simulate() trajectory: one row per played season (turn/year/season as played),
+# values are the state after that season
+TRAJECTORY_FINANCE = ("cash", "score_economy", "score_sustain", "score_risk", "score_efficiency")
+TRAJECTORY_TURN = ("income", "cost", "avg_ndvi", "avg_moisture", "avg_salinity", "avg_fertility")
+
+def simulate(gs: GameState, turns: int, schedule: list[ScheduledPlan] = ()) -> dict:
+    """
+    Play `turns` seasons in a row, applying scheduled plans before the matching ticks.
+    Returns the trajectory as columns: {"turn": [...], "year": [...], "season": [...], "cash": [...], ...}.
+    """
+    plans_for = scheduled_plans(schedule)
+    cols = {name: np.empty(turns, dtype=np.float64) for name in TRAJECTORY_FINANCE + TRAJECTORY_TURN}
+    turn_col = np.empty(turns, dtype=np.int64)
+    year_col = np.empty(turns, dtype=np.int64)
+    season_col = []
+    for i in range(turns):
+        for cells in plans_for(gs):
+            apply_plan(gs.farm, cells)
+        turn_col[i] = gs.turn
+        year_col[i] = gs.year
+        season_col.append(gs.season)
+        stats = apply_plan_and_tick(gs)
+        for name in TRAJECTORY_TURN:
+            cols[name][i] = stats[name]
+        for name in TRAJECTORY_FINANCE:
+            cols[name][i] = getattr(gs.finance, name)
+    return {"turn": turn_col.tolist(), "year": year_col.tolist(), "season": season_col,
+            **{name: col.tolist() for name, col in cols.items()}}
 
-def avg_attr(cells, k):
-    return float(sum(getattr(c,k) for c in cells)/len(cells))
+# Ensembles: K members share the game's plan and calendar but each draws events from its own
+# seed. Member state is stacked as (K, size, size) and ticked by the same _tick_cells kernel
+# in blocks of ~SIM_TILE_CELLS cells; a member with seed s follows exactly the game with seed s.
+FINANCE_FIELDS = ("cash", "loan", "score_economy", "score_sustain", "score_risk", "score_efficiency")
+
+def ensemble_state(gs: GameState, k: int) -> tuple[dict, SimpleNamespace]:
+    """Per-member copies of the game's farm layers (K, size, size) and finance fields (K,)."""
+    state = {name: np.repeat(getattr(gs.farm, name)[None], k, axis=0) for name in FARM_LAYERS}
+    fin = SimpleNamespace(**{name: np.full(k, getattr(gs.finance, name)) for name in FINANCE_FIELDS})
+    return state, fin
+
+@timed("ensemble_tick")
+def ensemble_tick(gs: GameState, state: dict, fin: SimpleNamespace, seeds: np.ndarray,
+                  plan: tuple | None = None) -> dict:
+    """
+    One season for every member. gs supplies the plan, season and turn and is advanced like a
+    normal game; its own farm layers and finance are left as they are. `plan` = per-member
+    (crop, irrigation, drainage) arrays of shape (K, size, size) replaces the game's plan
+    (what-if evaluation, sim/whatif.py). Returns the per-member turn stats (arrays of shape (K,)).
+    """
+    p = tick_params(gs)
+    shock_rain, shock_temp = event_shocks(p.cfg, gs.region.code, gs.season, event_draws(seeds, gs.turn),
+                                         p.event_prob)
+    rain = (gs.region.climate.seasonal_rain[gs.season] * shock_rain)[:, None, None]
+    temp = (gs.region.climate.seasonal_temp[gs.season] * shock_temp)[:, None, None]
+    if p.rain is not None:
+        rain = rain * p.rain
+    if p.temp is not None:
+        temp = temp * p.temp
+    f = gs.farm
+    phen = PHENOLOGY[gs.season]
+    block = max(1, TILE_CELLS // f.n_cells)
+    parts = np.empty((len(seeds), 9), dtype=np.float64)
+    for k0 in range(0, len(seeds), block):
+        m = slice(k0, k0 + block)
+        crop, irr, drn = (f.crop, f.irrigation, f.drainage) if plan is None else (a[m] for a in plan)
+        parts[m] = _tick_cells(state["moisture"][m], state["salinity"][m], state["fertility"][m],
+                               state["ndvi"][m], crop, irr, drn,
+                               rain[m], temp[m], phen, p)
+    f.last_crop[:] = f.crop
+    st = _turn_stats(parts[None], np.array([float(f.n_cells)]))
+    _update_finance(fin, st)
+    gs.turn += 1
+    gs.advance_season()
+    return st
@@ -0,0 +1,91 @@
+"""
+Monte Carlo ensembles: play the same plan (and schedule) K times with different event seeds
+and summarise the spread of the outcomes.
+
+Members are stacked along an extra leading axis and ticked together (engine.ensemble_tick);
+large ensembles are cut into shards that run on a process pool, each shard on its own copy
+of the game. Member k uses seed gs.seed + k, so member 0 replays the game's own future.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import multiprocessing
+import os
+import threading
+import numpy as np
+
+from ..models import GameState, ScheduledPlan
+from .engine import apply_plan, ensemble_state, ensemble_tick, scheduled_plans
+
+ENSEMBLE_MAX_SEEDS = int(os.getenv("ENSEMBLE_MAX_SEEDS", "5000"))
+# seeds * farm cells per request; member state is 4 float64 layers (~32 bytes per member cell)
+ENSEMBLE_MAX_CELLS = int(os.getenv("ENSEMBLE_MAX_CELLS", str(1 << 23)))
+ENSEMBLE_WORKERS = int(os.getenv("ENSEMBLE_WORKERS", str(os.cpu_count() or 1)))
+SHARD_MIN_SEEDS = 64  # smaller shards cost more in pickling than they save
+# not fork: the server process has threads (uvicorn, config watcher) and open sqlite handles
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+PERCENTILES = (5, 25, 50, 75, 95)
+METRICS = ("cash", "score_sustain", "score_risk", "score_economy", "score_efficiency")
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=ENSEMBLE_WORKERS,
+                                        mp_context=multiprocessing.get_context(_START_METHOD))
+        return _pool
+
+def check_size(gs: GameState, seeds: int) -> str | None:
+    """Error message if the ensemble is too large, None if fine."""
+    if not 1 <= seeds <= ENSEMBLE_MAX_SEEDS:
+        return f"seeds must be 1..{ENSEMBLE_MAX_SEEDS}"
+    if seeds * gs.farm.n_cells > ENSEMBLE_MAX_CELLS:
+        return (f"ensemble too large: {seeds} seeds x {gs.farm.n_cells} cells "
+                f"(limit {ENSEMBLE_MAX_CELLS} member cells)")
+    return None
+
+def _run_shard(args) -> dict:
+    """-> {metric: (turns, k) array, "turn"/"year"/"season": calendar} on a private copy of the game."""
+    gs, seeds, turns, schedule = args
+    plans_for = scheduled_plans(schedule)
+    state, fin = ensemble_state(gs, len(seeds))
+    out = {name: np.empty((turns, len(seeds)), dtype=np.float64) for name in METRICS}
+    out.update(turn=[], year=[], season=[])
+    for t in range(turns):
+        for cells in plans_for(gs):
+            apply_plan(gs.farm, cells)
+        out["turn"].append(gs.turn)
+        out["year"].append(gs.year)
+        out["season"].append(gs.season)
+        ensemble_tick(gs, state, fin, seeds)
+        for name in METRICS:
+            out[name][t] = getattr(fin, name)
+    return out
+
+def run_ensemble(gs: GameState, seeds: int, turns: int, schedule: list[ScheduledPlan] = ()) -> dict:
+    """
+    Play `turns` seasons for `seeds` members; the game itself is not modified.
+    Returns per-turn columns: turn/year/season as played, and per metric
+    {"mean": [...], "p5": [...], ..., "p95": [...]} over the members.
+    """
+    all_seeds = gs.seed + np.arange(seeds, dtype=np.int64)
+    n_shards = max(1, min(ENSEMBLE_WORKERS, seeds // SHARD_MIN_SEEDS))
+    # members need the farm and calendar, not the raster history (memo entry: history -> None)
+    jobs = [(copy.deepcopy(gs, {id(gs.history): None}), chunk, turns, list(schedule))
+            for chunk in np.array_split(all_seeds, n_shards)]
+    if n_shards == 1:
+        shards = [_run_shard(jobs[0])]
+    else:
+        shards = list(_executor().map(_run_shard, jobs))
+
+    out = {"seeds": seeds, "seed_base": gs.seed, "percentiles": list(PERCENTILES),
+           "turn": shards[0]["turn"], "year": shards[0]["year"], "season": shards[0]["season"]}
+    for name in METRICS:
+        values = np.concatenate([s[name] for s in shards], axis=1)  # (turns, seeds)
+        pct = np.percentile(values, PERCENTILES, axis=1)
+        out[name] = {"mean": values.mean(axis=1).tolist(),
+                     **{f"p{q}": row.tolist() for q, row in zip(PERCENTILES, pct)}}
+    return out
@@ -1,25 +1,35 @@
-import random
+import numpy as np
 from ..models import GameState
+from .config import SEASONS
 
-# Very small illustrative event system. Region- and season-specific modifiers.
-def apply_event_shocks(gs: GameState) -> None:
-    # reset shocks
-    gs.region.climate.shock_rain = 1.0
-    gs.region.climate.shock_temp = 1.0
+# Event draws are a pure function of (game seed, turn): a game replays identically no matter
+# what else ran in the process, after a reload, or as one member of an ensemble.
+def event_draws(seeds, turn: int) -> np.ndarray:
+    """Uniform [0, 1) draw per seed for this turn (splitmix64 of seed and turn), vectorized over seeds."""
+    with np.errstate(over="ignore"):  # uint64 arithmetic wraps mod 2**64 on purpose
+        x = np.asarray(seeds, dtype=np.int64).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ np.uint64(turn)) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
 
-    r = random.random()
-    if gs.region.code == "california" and gs.season in ("spring","summer"):
-        # occasional drought
-        if r < 0.18:
-            gs.region.climate.shock_rain = 0.55
-            gs.region.climate.shock_temp = 1.1
-    if gs.region.code == "amu_darya" and gs.season in ("summer","autumn"):
-        # salinity/hot wind episode -> effectively increases ET
-        if r < 0.15:
-            gs.region.climate.shock_temp = 1.15
-    if gs.region.code == "sahel" and gs.season == "summer":
-        # monsoon shift (either heavy rain or deficit)
-        if r < 0.12:
-            gs.region.climate.shock_rain = 1.35
-        elif r < 0.24:
-            gs.region.climate.shock_rain = 0.65
+# Very small illustrative event system. Region- and season-specific modifiers; the bands live in
+# sim/manifests.py (REGIONS[code]["shocks"]) and are read from the game's compiled config.
+def event_shocks(cfg, region_code: str, season: str, r, event_prob: float = 1.0):
+    """(shock_rain, shock_temp) for draw(s) r; arrays in, arrays out. event_prob scales how often events fire (presets)."""
+    r = np.asarray(r, dtype=np.float64)
+    shock_rain = np.ones_like(r)
+    shock_temp = np.ones_like(r)
+    bands = cfg.shock_bands[cfg.region_code_index(region_code), SEASONS.index(season)]
+    for lo, hi, rain, temp in bands:
+        if hi > lo:
+            hit = (r >= lo*event_prob) & (r < hi*event_prob)
+            shock_rain[hit] = rain
+            shock_temp[hit] = temp
+    return shock_rain, shock_temp
+
+def apply_event_shocks(gs: GameState, cfg, event_prob: float = 1.0) -> None:
+    shock_rain, shock_temp = event_shocks(cfg, gs.region.code, gs.season, event_draws(gs.seed, gs.turn), event_prob)
+    gs.region.climate.shock_rain = float(shock_rain)
+    gs.region.climate.shock_temp = float(shock_temp)
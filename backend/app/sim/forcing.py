@@ -0,0 +1,171 @@
+"""
+Per-cell climate forcing from EO rasters for games anchored to an EO region (GameState.eo).
+
+The farm's size x size cells are laid over the window [x, x+w) x [y, y+h) of the region grid.
+Once per anchor a resampling index is built: for every farm cell the EO pixels it reads and
+their weights, plus each layer's per-pixel mean for every season of the year (the baseline,
+gathered to farm cells). Along an axis where farm cells are smaller than pixels that is the
+2 nearest pixel centres (bilinear); where they are larger, every pixel the cell's footprint
+overlaps, weighted by the overlap (area mean), so coarse farms do not skip pixels. A tick is
+then one gather + weighted sum per layer:
+
+    factor = resampled EO value of this season / its season-of-year mean   (per cell)
+    rain   = seasonal_rain[season] * shock * factor("rain")
+    temp   = seasonal_temp[season] * shock * factor("dry")   # SMAP dryness drives evaporation
+
+so the region calibration (manifests/config) stays the average and the EO record supplies the
+spatial pattern and the wet/dry years. Cells with no data (NaN) keep factor 1; factors are
+clipped to 0..FORCING_MAX_FACTOR. Turn t plays EO season (start_season + t) mod T, looping over
+the record.
+
+Indexes are cached in FORCING_CACHE by anchor and farm size (not by game), so restored or
+copied games (what-if, ensembles) reuse them.
+"""
+from pathlib import Path
+import os
+import numpy as np
+
+from ..cache import LRUCache
+from ..models import EOAnchor, GameState
+
+# EO layer -> engine driver it scales
+FORCING_DRIVERS = {"rain": "rain", "dry": "temp"}
+FORCING_MAX_FACTOR = float(os.getenv("FORCING_MAX_FACTOR", "3"))
+FORCING_CACHE = LRUCache(int(os.getenv("FORCING_CACHE_BYTES", str(64 * 1024 * 1024))),
+                         sizeof=lambda f: f.nbytes)
+DATA_ROOT = Path(os.getenv("DATA_ROOT", str(Path(__file__).resolve().parents[2] / "data")))
+
+
+class ForcingError(ValueError):
+    """Bad anchor (unknown region/layer, window outside the grid) or its EO data is missing."""
+
+
+class Forcing:
+    """Resampling index of one anchor: farm cell -> EO pixels and weights, plus the baselines."""
+
+    def __init__(self, repo, anchor: EOAnchor, size: int):
+        self.repo, self.size = repo, size
+        self.index, self.weights = resample_index(anchor, size, repo.grid.width)
+        self.per_year = repo.grid.seasons_per_year
+        self.seasons = {layer: repo.seasons(layer) for layer in anchor.layers}
+        self.start = anchor.start_season if anchor.start_season is not None else 0
+        # (per_year, size, size) season-of-year mean at every farm cell
+        self.baseline = {layer: self._baseline(layer, anchor) for layer in anchor.layers}
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + self.weights.nbytes + sum(b.nbytes for b in self.baseline.values())
+
+    def _baseline(self, layer: str, a: EOAnchor) -> np.ndarray:
+        # pixel means over the window only (the region's climatology.npy may not be built)
+        win = self.repo.window(layer, a.x, a.y, a.x + a.w, a.y + a.h)
+        rows, cols = np.divmod(self.index, self.repo.grid.width)
+        local = (rows - a.y) * win.shape[2] + (cols - a.x)  # index into the window
+        out = []
+        for s in range(self.per_year):
+            block = win[s::self.per_year]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.nansum(block, axis=0) / np.isfinite(block).sum(axis=0)
+            out.append(self._resample(mean.ravel()[local]))
+        return np.stack(out)
+
+    def gather(self, arr: np.ndarray) -> np.ndarray:
+        """Resample a region-grid array (H, W) to the farm (size, size); NaN-aware."""
+        return self._resample(np.asarray(arr).ravel()[self.index])
+
+    def _resample(self, v: np.ndarray) -> np.ndarray:
+        # v: (n_cells, taps) pixel values at self.index; NaN taps drop out of the weighting
+        ok = np.isfinite(v)
+        w = np.where(ok, self.weights, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = (np.where(ok, v, 0.0) * w).sum(axis=1) / w.sum(axis=1)
+        return out.reshape(self.size, self.size)
+
+    def factors(self, turn: int) -> dict:
+        """{driver: (size, size) multiplier} for the season played at `turn`."""
+        out = {}
+        for layer, t_total in self.seasons.items():
+            t = (self.start + turn) % t_total
+            value = self.gather(self.repo.get_array(layer, t))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                f = value / self.baseline[layer][t % self.per_year]
+            out[FORCING_DRIVERS[layer]] = np.clip(np.where(np.isfinite(f), f, 1.0), 0.0, FORCING_MAX_FACTOR)
+        return out
+
+
+def resample_index(anchor: EOAnchor, size: int, grid_width: int) -> tuple[np.ndarray, np.ndarray]:
+    """(n_cells, taps) flat region-grid pixel indices and weights of every farm cell (see module docstring)."""
+    def axis(origin: int, extent: int):
+        # -> (size, n) pixel indices along the axis and their weights (rows sum to 1)
+        scale = extent / size
+        if scale <= 1:
+            # cell centres in pixel units, relative to pixel centres; clamped to the window
+            c = np.clip((np.arange(size) + 0.5) * scale - 0.5, 0, extent - 1)
+            i0 = np.floor(c).astype(np.int64)
+            f = c - i0
+            return origin + np.stack([i0, np.minimum(i0 + 1, extent - 1)], axis=1), np.stack([1 - f, f], axis=1)
+        # cell footprint [lo, hi) in pixels; weight = overlap with each pixel [j, j+1)
+        lo = np.arange(size) * scale
+        j = np.floor(lo).astype(np.int64)[:, None] + np.arange(int(np.ceil(scale)) + 1)
+        overlap = np.clip(np.minimum(j + 1, lo[:, None] + scale) - np.maximum(j, lo[:, None]), 0.0, None)
+        return origin + np.minimum(j, extent - 1), overlap / overlap.sum(axis=1, keepdims=True)
+
+    ys, wy = axis(anchor.y, anchor.h)
+    xs, wx = axis(anchor.x, anchor.w)
+    n = size * size
+    index = (ys[:, None, :, None] * grid_width + xs[None, :, None, :]).reshape(n, -1)
+    weights = (wy[:, None, :, None] * wx[None, :, None, :]).reshape(n, -1)
+    return index, weights
+
+
+def _repo(region_id: str):
+    from ..eo.sources import EOLayers, RegionStore  # EO stack is optional for plain games
+
+    root = DATA_ROOT / region_id
+    if not region_id or "/" in region_id or region_id.startswith(".") or not root.is_dir():
+        raise ForcingError(f"EO region '{region_id}' not found")
+    return EOLayers(RegionStore(region_id=region_id, root=root))
+
+
+def check_anchor(anchor: EOAnchor, year: int) -> EOAnchor:
+    """Validated copy of the anchor with start_season filled in (season of `year` spring)."""
+    repo = _repo(anchor.region_id)
+    grid = repo.grid
+    bad = [layer for layer in anchor.layers if layer not in FORCING_DRIVERS]
+    if bad or not anchor.layers or len(set(anchor.layers)) != len(anchor.layers):
+        raise ForcingError(f"eo.layers must be distinct names from: {', '.join(FORCING_DRIVERS)}")
+    if anchor.x < 0 or anchor.y < 0 or anchor.x + anchor.w > grid.width or anchor.y + anchor.h > grid.height:
+        raise ForcingError(f"eo window {anchor.w}x{anchor.h} at ({anchor.x}, {anchor.y}) is outside "
+                           f"the region grid {grid.width}x{grid.height}")
+    for layer in anchor.layers:
+        if repo.cube(layer) is None and not repo.store.layer_npy(layer, 0).exists():
+            raise ForcingError(f"EO region '{anchor.region_id}' has no '{layer}' layer")
+    start = anchor.start_season
+    if start is None:
+        start = max(0, (year - grid.start_year) * grid.seasons_per_year) if grid.start_year else 0
+    return anchor.model_copy(update={"start_season": start})
+
+
+def forcing_for(gs: GameState) -> Forcing | None:
+    """The game's resampling index (built on first use, then cached), None for plain games."""
+    if gs.eo is None:
+        return None
+    a = gs.eo
+    key = (a.region_id, a.x, a.y, a.w, a.h, tuple(a.layers), a.start_season, gs.farm.size)
+    try:
+        return FORCING_CACHE.get_or_load(key, lambda: Forcing(_repo(a.region_id), a, gs.farm.size))
+    except (OSError, ValueError) as e:  # LayerNotFoundError, bad shapes, removed region
+        if isinstance(e, ForcingError):
+            raise
+        raise ForcingError(f"EO forcing for region '{a.region_id}' is unavailable: {e}") from e
+
+
+def factors(gs: GameState) -> dict:
+    """{driver: (size, size)} for the season about to be played; {} for plain games."""
+    f = forcing_for(gs)
+    if f is None:
+        return {}
+    try:
+        return f.factors(gs.turn)
+    except (OSError, ValueError) as e:
+        raise ForcingError(f"EO forcing for region '{gs.eo.region_id}' is unavailable: {e}") from e
@@ -0,0 +1,181 @@
+"""
+Per-turn raster history of a game (replay / timelapse).
+
+Every recorded turn keeps the four farm layers quantized to uint8 (exactly what
+/game/{gid}/raster draws, see render.quantize). Every HISTORY_KEYFRAME-th frame is a
+keyframe holding the full rasters; the frames in between hold the XOR with the previous
+frame. Unchanged cells XOR to 0 and slowly drifting ones to small values, so the zlib-
+compressed deltas are a fraction of a keyframe. A past turn is rebuilt from the nearest
+keyframe at or before it plus at most HISTORY_KEYFRAME - 1 deltas.
+
+The buffer is a ring of at most HISTORY_TURNS frames; when it is full the oldest frames are
+dropped and the new oldest frame is turned into a keyframe.
+"""
+from collections import deque
+import os
+import threading
+import zlib
+import numpy as np
+
+from .render import quantize
+
+HISTORY_TURNS = int(os.getenv("HISTORY_TURNS", "120"))  # 30 years of seasons; 0 disables
+HISTORY_KEYFRAME = max(1, int(os.getenv("HISTORY_KEYFRAME", "8")))
+HISTORY_LAYERS = ("ndvi", "moisture", "salinity", "fertility")
+_ZLEVEL = 1
+
+
+class Frame:
+    __slots__ = ("turn", "key", "data")
+
+    def __init__(self, turn: int, key: bool, data: dict):
+        self.turn = turn
+        self.key = key      # True: data holds full rasters, False: XOR with the previous frame
+        self.data = data    # layer -> zlib-compressed uint8 bytes
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(b) for b in self.data.values())
+
+
+class RasterHistory:
+    def __init__(self, size: int, capacity: int = HISTORY_TURNS, keyframe: int = HISTORY_KEYFRAME):
+        self.size = size
+        self.capacity = max(1, capacity)
+        self.keyframe = keyframe
+        self.frames: deque[Frame] = deque()
+        self._last: dict | None = None  # uint8 rasters of the newest frame (delta base)
+        self._since_key = 0
+        self._lock = threading.RLock()  # ticks append while raster requests read
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # ---- recording ----
+    def record(self, turn: int, farm) -> None:
+        """Add the farm's current rasters as `turn` (turns are recorded in increasing order)."""
+        current = {name: quantize(getattr(farm, name)) for name in HISTORY_LAYERS}
+        with self._lock:
+            self._append(turn, current)
+
+    def _append(self, turn: int, current: dict) -> None:
+        if self.frames and turn <= self.frames[-1].turn:
+            self._truncate(turn - 1)
+        key = self._last is None or self._since_key + 1 >= self.keyframe
+        if key:
+            data = {name: zlib.compress(u8, _ZLEVEL) for name, u8 in current.items()}
+            self._since_key = 0
+        else:
+            data = {name: zlib.compress(np.bitwise_xor(u8, self._last[name]), _ZLEVEL)
+                    for name, u8 in current.items()}
+            self._since_key += 1
+        self.frames.append(Frame(turn, key, data))
+        self._last = current
+        while len(self.frames) > self.capacity:
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        # frames[0] is always a keyframe; if frames[1] is a delta, store it in full first
+        if len(self.frames) > 1 and not self.frames[1].key:
+            full = self._rebuild(1)
+            self.frames[1] = Frame(self.frames[1].turn, True,
+                                   {name: zlib.compress(u8, _ZLEVEL) for name, u8 in full.items()})
+        self.frames.popleft()
+
+    def truncate(self, last_turn: int) -> None:
+        """Forget frames after last_turn (e.g. the game was restored to an earlier snapshot)."""
+        with self._lock:
+            self._truncate(last_turn)
+
+    def _truncate(self, last_turn: int) -> None:
+        while self.frames and self.frames[-1].turn > last_turn:
+            self.frames.pop()
+        if self.frames:
+            self._last = self._rebuild(len(self.frames) - 1)
+            self._since_key = len(self.frames) - 1 - max(
+                i for i, f in enumerate(self.frames) if f.key)
+        else:
+            self._last, self._since_key = None, 0
+
+    # ---- reading ----
+    def turns(self) -> list[int]:
+        with self._lock:
+            return [f.turn for f in self.frames]
+
+    def raster(self, turn: int, layer: str) -> np.ndarray | None:
+        """uint8 (size, size) raster of `layer` at `turn`, None if that turn is not kept."""
+        if layer not in HISTORY_LAYERS:
+            return None
+        with self._lock:
+            if not self.frames:
+                return None
+            i = self._index(turn)
+            return None if i is None else self._rebuild(i, (layer,))[layer]
+
+    def _index(self, turn: int) -> int | None:
+        i = turn - self.frames[0].turn
+        if not 0 <= i < len(self.frames) or self.frames[i].turn != turn:
+            # turns are consecutive unless the game was restored; fall back to a search
+            i = next((j for j, f in enumerate(self.frames) if f.turn == turn), None)
+        return i
+
+    def _unpack(self, blob: bytes) -> np.ndarray:
+        return np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(self.size, self.size)
+
+    def _rebuild(self, i: int, layers=HISTORY_LAYERS) -> dict:
+        k = i
+        while not self.frames[k].key:
+            k -= 1
+        out = {name: self._unpack(self.frames[k].data[name]).copy() for name in layers}
+        for j in range(k + 1, i + 1):
+            for name in layers:
+                np.bitwise_xor(out[name], self._unpack(self.frames[j].data[name]), out=out[name])
+        return out
+
+    # ---- accounting / persistence ----
+    def dump(self) -> tuple[dict, list[bytes]]:
+        """(JSON-able description, blobs in the order it lists them) for app/snapshot.py."""
+        with self._lock:
+            return self._dump()
+
+    def _dump(self) -> tuple[dict, list[bytes]]:
+        meta = {"size": self.size, "capacity": self.capacity, "keyframe": self.keyframe,
+                "layers": list(HISTORY_LAYERS),
+                "frames": [[f.turn, f.key] for f in self.frames]}
+        blobs = [f.data[name] for f in self.frames for name in HISTORY_LAYERS]
+        return meta, blobs
+
+    @classmethod
+    def load(cls, meta: dict, blobs: list[bytes]) -> "RasterHistory":
+        h = cls(meta["size"], meta["capacity"], meta["keyframe"])
+        layers = meta["layers"]
+        it = iter(blobs)
+        for turn, key in meta["frames"]:
+            h.frames.append(Frame(int(turn), bool(key), {name: next(it) for name in layers}))
+        if h.frames and not h.frames[0].key:
+            raise ValueError("history must start with a keyframe")
+        h.truncate(h.frames[-1].turn if h.frames else -1)  # restores the delta base
+        return h
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            base = 0 if self._last is None else sum(a.nbytes for a in self._last.values())
+            return sum(f.nbytes for f in self.frames) + base
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": len(self.frames),
+                "first_turn": self.frames[0].turn if self.frames else None,
+                "last_turn": self.frames[-1].turn if self.frames else None,
+                "capacity": self.capacity,
+                "keyframe": self.keyframe,
+                "bytes": self.nbytes,
+            }
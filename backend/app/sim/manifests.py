@@ -1,28 +1,53 @@
-# Minimal, inline manifests. You can replace with JSON files later.
+# Minimal, inline manifests: the engine's unitless crop model. The calibrated manifests in
+# backend/conf/ are compiled alongside them by sim/config.py.
 CROPS = {
-    # base_yield (t/ha), water_need (0..1), salt_tol (0..1), ndvi_peak (0..1)
-    "fallow": {"yield": 0.0, "water": 0.2, "salt": 1.0, "ndvi_peak": 0.15, "price": 0.0},
-    "wheat":  {"yield": 3.5, "water": 0.5, "salt": 0.5, "ndvi_peak": 0.75, "price": 220.0},
-    "maize":  {"yield": 6.0, "water": 0.7, "salt": 0.4, "ndvi_peak": 0.80, "price": 210.0},
-    "cotton": {"yield": 2.0, "water": 0.8, "salt": 0.6, "ndvi_peak": 0.70, "price": 300.0},
-    "alfalfa":{"yield": 10.0, "water": 0.6, "salt": 0.7, "ndvi_peak": 0.85, "price": 180.0},
-    "millet": {"yield": 1.5, "water": 0.35,"salt": 0.8, "ndvi_peak": 0.60, "price": 170.0},
+    # base_yield (t/ha), water_need (0..1), salt_tol (0..1), ndvi_peak (0..1), fertility delta per season
+    "fallow": {"yield": 0.0, "water": 0.2, "salt": 1.0, "ndvi_peak": 0.15, "price": 0.0, "fertility": 0.005},
+    "wheat":  {"yield": 3.5, "water": 0.5, "salt": 0.5, "ndvi_peak": 0.75, "price": 220.0, "fertility": -0.01},
+    "maize":  {"yield": 6.0, "water": 0.7, "salt": 0.4, "ndvi_peak": 0.80, "price": 210.0, "fertility": -0.01},
+    "cotton": {"yield": 2.0, "water": 0.8, "salt": 0.6, "ndvi_peak": 0.70, "price": 300.0, "fertility": -0.01},
+    "alfalfa":{"yield": 10.0, "water": 0.6, "salt": 0.7, "ndvi_peak": 0.85, "price": 180.0, "fertility": 0.02},
+    "millet": {"yield": 1.5, "water": 0.35,"salt": 0.8, "ndvi_peak": 0.60, "price": 170.0, "fertility": -0.01},
 }
 
+# Farm.crop stores indices into CROP_NAMES (0 is always fallow); the dense per-crop tables
+# the engine reads are compiled from CROPS by sim/config.py.
+CROP_NAMES = list(CROPS)
+CROP_INDEX = {name: i for i, name in enumerate(CROP_NAMES)}
+
+def crop_index(name) -> int:
+    """Crop name -> index; unknown names behave as fallow (same as CROPS.get(name, CROPS["fallow"]))."""
+    return CROP_INDEX.get(name, CROP_INDEX["fallow"])
+
+# Event shocks: in the listed seasons a draw r in [lo, hi) * event_prob (the preset's
+# multiplier) scales that season's rain/temp by the given factors (1.0 when omitted).
 REGIONS = {
     "california": {
+        "conf_id": "CA_SanJoaquin_West",
         "display": "California (water-limited orchards)",
         "seasonal_rain": {"spring":0.35,"summer":0.1,"autumn":0.25,"winter":0.5},
-        "seasonal_temp": {"spring":0.6,"summer":0.9,"autumn":0.6,"winter":0.3}
+        "seasonal_temp": {"spring":0.6,"summer":0.9,"autumn":0.6,"winter":0.3},
+        "shocks": [  # occasional drought
+            {"seasons": ["spring","summer"], "draw": [0.0, 0.18], "rain": 0.55, "temp": 1.1},
+        ]
     },
     "amu_darya": {
+        "conf_id": "UZ_Khorezm_AmuDarya",
         "display": "Amu Darya / Khorezm (salinity & drainage)",
         "seasonal_rain": {"spring":0.25,"summer":0.15,"autumn":0.2,"winter":0.3},
-        "seasonal_temp": {"spring":0.5,"summer":0.85,"autumn":0.55,"winter":0.25}
+        "seasonal_temp": {"spring":0.5,"summer":0.85,"autumn":0.55,"winter":0.25},
+        "shocks": [  # salinity/hot wind episode -> effectively increases ET
+            {"seasons": ["summer","autumn"], "draw": [0.0, 0.15], "temp": 1.15},
+        ]
     },
     "sahel": {
+        "conf_id": "NE_Niger_Sahel",
         "display": "Sahel (rain-fed, erosion risk)",
         "seasonal_rain": {"spring":0.1,"summer":0.55,"autumn":0.25,"winter":0.05},
-        "seasonal_temp": {"spring":0.7,"summer":0.9,"autumn":0.7,"winter":0.6}
+        "seasonal_temp": {"spring":0.7,"summer":0.9,"autumn":0.7,"winter":0.6},
+        "shocks": [  # monsoon shift (either heavy rain or deficit)
+            {"seasons": ["summer"], "draw": [0.0, 0.12], "rain": 1.35},
+            {"seasons": ["summer"], "draw": [0.12, 0.24], "rain": 0.65},
+        ]
     }
 }
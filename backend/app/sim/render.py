@@ -1,11 +1,32 @@
-import io
 import numpy as np
-from PIL import Image
 
-def render_raster_png(arr: np.ndarray) -> bytes:
-    arr = np.clip(arr, 0.0, 1.0)
+from ..encoding import encode_raster
+from ..metrics import timed
+
+def quantize(arr: np.ndarray) -> np.ndarray:
     # grayscale 0..255
-    im = Image.fromarray((arr*255).astype("uint8"), mode="L")
-    buf = io.BytesIO()
-    im.save(buf, format="PNG", optimize=True)
-    return buf.getvalue()
+    return (np.clip(arr, 0.0, 1.0)*255).astype("uint8")
+
+def quantize_into(farm, layers, out: np.ndarray) -> np.ndarray:
+    """quantize() of several farm layers into out[i] (uint8 (n, size, size), may be a view of a buffer)."""
+    tmp = None
+    for i, name in enumerate(layers):
+        arr = getattr(farm, name)
+        if tmp is None or tmp.dtype != arr.dtype:
+            tmp = np.empty_like(arr)
+        np.clip(arr, 0.0, 1.0, out=tmp)
+        np.multiply(tmp, 255, out=out[i], casting="unsafe")  # truncates like astype
+    return out
+
+@timed("render")
+def render_raster(arr: np.ndarray, fmt: str = "png", level: int | None = None) -> bytes:
+    """Encode a 0..1 farm raster in any of encoding.FORMATS."""
+    return encode_raster(quantize(arr), fmt, level, unit=np.clip(arr, 0.0, 1.0))
+
+@timed("render")
+def render_quantized(u8: np.ndarray, fmt: str = "png", level: int | None = None) -> bytes:
+    """Encode an already quantized raster (e.g. from sim.history); f16 gets the quantized values."""
+    return encode_raster(u8, fmt, level, unit=u8.astype(np.float32) / 255.0)
+
+def render_raster_png(arr: np.ndarray, level: int | None = None) -> bytes:
+    return render_raster(arr, "png", level)
@@ -0,0 +1,169 @@
+"""
+What-if plan evaluation and a plan optimizer.
+
+K candidate plans are played from a copy of the current game as one batch: the ensemble
+machinery (engine.ensemble_tick) with a per-member plan instead of per-member weather. With
+seeds > 1 every candidate is also played under seeds gs.seed + s and the final metrics are
+averaged, so a plan is not tuned to a single weather draw (s = 0 is the game's own future).
+
+The optimizer is a small genetic search: the farm is cut into zones x zones blocks, a genome
+holds one (crop, irrigation, drainage) choice per block, and every generation is evaluated as
+one batch. It stops after `generations` or `budget_ms`, whichever comes first, and returns the
+best plan as /plan/ops rect ops.
+"""
+from types import SimpleNamespace
+import copy
+import time
+import numpy as np
+
+from ..models import GameState, PlanCandidate
+from .engine import apply_plan, apply_plan_ops, ensemble_state, ensemble_tick
+from .ensemble import ENSEMBLE_MAX_CELLS, METRICS
+from .manifests import CROP_NAMES, CROP_INDEX
+
+def check_weights(weights: dict) -> str | None:
+    unknown = sorted(set(weights) - set(METRICS))
+    if unknown:
+        return f"Unknown metric(s) {', '.join(unknown)}. Expected: {', '.join(METRICS)}"
+    if not weights:
+        return "weights must name at least one metric"
+    return None
+
+def check_size(gs: GameState, members: int, seeds: int) -> str | None:
+    """Error message if the batch is too large, None if fine."""
+    if not 1 <= seeds <= 64:
+        return "seeds must be 1..64"
+    if members * seeds * gs.farm.n_cells > ENSEMBLE_MAX_CELLS:
+        return (f"batch too large: {members} plans x {seeds} seeds x {gs.farm.n_cells} cells "
+                f"(limit {ENSEMBLE_MAX_CELLS} member cells)")
+    return None
+
+def candidate_plans(gs: GameState, candidates: list[PlanCandidate]) -> tuple:
+    """(crop, irrigation, drainage) of shape (1 + K, size, size); member 0 is the current plan."""
+    f = gs.farm
+    k = 1 + len(candidates)
+    plan = tuple(np.repeat(a[None], k, axis=0) for a in (f.crop, f.irrigation, f.drainage))
+    for i, cand in enumerate(candidates, start=1):
+        view = SimpleNamespace(size=f.size, n_cells=f.n_cells,
+                               crop=plan[0][i], irrigation=plan[1][i], drainage=plan[2][i])
+        apply_plan_ops(view, cand.ops)  # MaskError propagates (400 in the API)
+        apply_plan(view, cand.cells)
+    return plan
+
+def evaluate(gs: GameState, plan: tuple, turns: int, seeds: int = 1) -> dict:
+    """Final metrics per plan {metric: (K,)} after `turns` seasons, averaged over `seeds`."""
+    k = len(plan[0])
+    g = copy.deepcopy(gs, {id(gs.history): None})  # plays forward; the game is not touched
+    state, fin = ensemble_state(g, k * seeds)
+    member_seeds = np.tile(gs.seed + np.arange(seeds, dtype=np.int64), k)
+    if seeds > 1:
+        plan = tuple(np.repeat(a, seeds, axis=0) for a in plan)
+    for _ in range(turns):
+        ensemble_tick(g, state, fin, member_seeds, plan)
+    return {name: getattr(fin, name).reshape(k, seeds).mean(axis=1) for name in METRICS}
+
+def objective(metrics: dict, weights: dict) -> np.ndarray:
+    return sum(w * metrics[name] for name, w in weights.items())
+
+def _row(metrics: dict, i: int, score: np.ndarray, base: dict | None = None) -> dict:
+    row = {"objective": float(score[i]), **{name: float(metrics[name][i]) for name in METRICS}}
+    if base is not None:
+        row["delta"] = {name: row[name] - base[name] for name in ("objective",) + METRICS}
+    return row
+
+def what_if(gs: GameState, candidates: list[PlanCandidate], weights: dict, turns: int, seeds: int = 1) -> dict:
+    """Candidates ranked by objective, each with its metrics and deltas against the current plan."""
+    metrics = evaluate(gs, candidate_plans(gs, candidates), turns, seeds)
+    score = objective(metrics, weights)
+    base = _row(metrics, 0, score)
+    ranking = [{"candidate": int(i) - 1, **_row(metrics, i, score, base)}
+               for i in np.argsort(-score[1:], kind="stable") + 1]
+    return {"turns": turns, "seeds": seeds, "weights": weights, "baseline": base, "ranking": ranking}
+
+# ---- optimizer ----
+def _zones(size: int, zones: int) -> tuple[np.ndarray, list]:
+    """(size, size) zone id per cell and the [x, y, w, h] rect of every zone."""
+    zones = min(zones, size)
+    edges = np.linspace(0, size, zones + 1).astype(int)
+    band = np.repeat(np.arange(zones), np.diff(edges))
+    zone_id = band[:, None] * zones + band[None, :]
+    rects = [[int(edges[c]), int(edges[r]), int(edges[c + 1] - edges[c]), int(edges[r + 1] - edges[r])]
+             for r in range(zones) for c in range(zones)]
+    return zone_id, rects
+
+def _seed_genomes(gs: GameState, zone_id: np.ndarray, n_zones: int, choices: np.ndarray) -> list:
+    """The current plan snapped to zones (majority per zone) and every crop planted everywhere."""
+    f = gs.farm
+    ids = zone_id.ravel()
+    counts = np.zeros((n_zones, len(CROP_NAMES)), dtype=np.int64)
+    np.add.at(counts, (ids, f.crop.ravel()), 1)
+    allowed = counts[:, choices]
+    crop = np.where(allowed.sum(axis=1) > 0, allowed.argmax(axis=1), 0)
+    area = np.bincount(ids, minlength=n_zones)
+    flags = ((np.bincount(ids, f.irrigation.ravel(), n_zones) * 2 > area).astype(np.int64)
+             | (np.bincount(ids, f.drainage.ravel(), n_zones) * 2 > area).astype(np.int64) << 1)
+    genomes = [(crop, flags)]
+    genomes += [(np.full(n_zones, c), np.zeros(n_zones, dtype=np.int64)) for c in range(len(choices))]
+    return genomes
+
+def optimize(gs: GameState, weights: dict, turns: int, seeds: int = 1, zones: int = 4, population: int = 32,
+             generations: int = 200, budget_ms: int = 2000, crops: list[str] | None = None) -> dict:
+    """Best zone plan found within the budget, as /plan/ops ops, with its metrics vs the current plan."""
+    t0 = time.perf_counter()
+    deadline = t0 + budget_ms / 1000.0
+    rng = np.random.default_rng(gs.seed)
+    choices = np.array([CROP_INDEX[c] for c in (crops or CROP_NAMES)], dtype=np.uint8)
+    zone_id, rects = _zones(gs.farm.size, zones)
+    n_zones = len(rects)
+
+    def plans(crop_g, flag_g):
+        return (choices[crop_g][:, zone_id], (flag_g & 1 != 0)[:, zone_id], (flag_g & 2 != 0)[:, zone_id])
+
+    f = gs.farm
+    base_metrics = evaluate(gs, tuple(a[None] for a in (f.crop, f.irrigation, f.drainage)), turns, seeds)
+    base = _row(base_metrics, 0, objective(base_metrics, weights))
+
+    seeded = _seed_genomes(gs, zone_id, n_zones, choices)[:population]
+    crop_g = np.empty((population, n_zones), dtype=np.int64)
+    flag_g = np.empty((population, n_zones), dtype=np.int64)
+    for i, (c, fl) in enumerate(seeded):
+        crop_g[i], flag_g[i] = c, fl
+    crop_g[len(seeded):] = rng.integers(0, len(choices), (population - len(seeded), n_zones))
+    flag_g[len(seeded):] = rng.integers(0, 4, (population - len(seeded), n_zones))
+    metrics = evaluate(gs, plans(crop_g, flag_g), turns, seeds)
+    score = objective(metrics, weights)
+    evaluated, best_curve, gen = population, [float(score.max())], 0
+
+    elite = max(1, population // 4)
+    while gen < generations and time.perf_counter() < deadline:
+        gen += 1
+        order = np.argsort(-score, kind="stable")
+        keep = order[:elite]
+        n_child = population - elite
+        # tournament selection of two parents per child, uniform crossover, per-gene mutation
+        a = rng.integers(0, population, (2, n_child))
+        b = rng.integers(0, population, (2, n_child))
+        pa = np.where(score[a[0]] >= score[b[0]], a[0], b[0])
+        pb = np.where(score[a[1]] >= score[b[1]], a[1], b[1])
+        mix = rng.random((n_child, n_zones)) < 0.5
+        child_c = np.where(mix, crop_g[pa], crop_g[pb])
+        child_f = np.where(mix, flag_g[pa], flag_g[pb])
+        mutate = rng.random((n_child, n_zones)) < 1.0 / n_zones
+        mutate[np.arange(n_child), rng.integers(0, n_zones, n_child)] = True  # at least one gene
+        child_c = np.where(mutate, rng.integers(0, len(choices), child_c.shape), child_c)
+        child_f = np.where(mutate, rng.integers(0, 4, child_f.shape), child_f)
+        child_metrics = evaluate(gs, plans(child_c, child_f), turns, seeds)
+        crop_g = np.concatenate([crop_g[keep], child_c])
+        flag_g = np.concatenate([flag_g[keep], child_f])
+        metrics = {name: np.concatenate([metrics[name][keep], child_metrics[name]]) for name in METRICS}
+        score = objective(metrics, weights)
+        evaluated += n_child
+        best_curve.append(float(score.max()))
+
+    best = int(np.argmax(score))
+    ops = [{"shape": "rect", "rect": rect, "crop": CROP_NAMES[choices[crop_g[best, z]]],
+            "irrigation": bool(flag_g[best, z] & 1), "drainage": bool(flag_g[best, z] & 2)}
+           for z, rect in enumerate(rects)]
+    return {"turns": turns, "seeds": seeds, "weights": weights, "zones": int(np.sqrt(n_zones)),
+            "generations": gen, "evaluated": evaluated, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "baseline": base, "best": _row(metrics, best, score, base), "ops": ops, "curve": best_curve}
@@ -0,0 +1,255 @@
+"""
+Binary GameState snapshots (spill files, the SQLite store, /game/{gid}/snapshot).
+
+Layout (little-endian):
+    magic     8 bytes  b"FNSNAP\\r\\n"
+    version   u32      SNAPSHOT_VERSION
+    head_len  u32
+    header    head_len bytes of UTF-8 JSON:
+                {"codec": "none"|"zlib"|"zstd", "payload_nbytes": <uncompressed>,
+                 "state": <GameState fields except farm>, "farm_size": N,
+                 "arrays": [{"name", "dtype", "shape", "offset"}, ...],
+                 "history": {<RasterHistory.dump() meta>, "blobs": [[offset, length], ...]}}  (v2+)
+    payload   farm arrays as raw C-order bytes, each at a 64-byte aligned offset, then the
+              raster history frames; compressed as one stream unless codec == "none"
+
+Uncompressed snapshots decode without copying: the farm arrays are views into the buffer
+(pass a bytearray to get writable arrays, e.g. read_snapshot()). Compressed payloads are
+inflated straight into one preallocated buffer that the arrays then view.
+"""
+from pathlib import Path
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+from .models import FARM_ARRAYS, FARM_SIZE_MAX, Farm, GameState
+from .sim.history import HISTORY_LAYERS, RasterHistory
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+_INFLATE_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+MAGIC = b"FNSNAP\r\n"
+SNAPSHOT_VERSION = 2  # 2: raster history
+CODECS = ("none", "zlib", "zstd")
+DEFAULT_CODEC = os.getenv("SNAPSHOT_CODEC", "zstd" if zstandard is not None else "zlib")
+MEDIA_TYPE = "application/vnd.farm-navigators.snapshot"
+
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 64
+_CHUNK = 1 << 20
+# dtypes the engine expects for each farm array
+_DTYPES = {name: "<f8" for name in ("ndvi", "moisture", "salinity", "fertility")}
+_DTYPES.update(crop="|u1", last_crop="|u1", irrigation="|b1", drainage="|b1")
+
+
+class SnapshotError(ValueError):
+    """Not a snapshot, an unsupported version/codec, or inconsistent contents."""
+
+
+def check_codec(codec: str) -> str | None:
+    """Error message for an unusable codec, None if fine."""
+    if codec not in CODECS:
+        return f"Unknown codec '{codec}'. Expected one of: {', '.join(CODECS)}"
+    if codec == "zstd" and zstandard is None:
+        return "zstd is not available (pip install zstandard)"
+    return None
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def encode(gs: GameState, codec: str | None = None, level: int | None = None) -> bytes:
+    codec = codec or DEFAULT_CODEC
+    err = check_codec(codec)
+    if err:
+        raise SnapshotError(err)
+    arrays, offset = [], 0
+    for name in FARM_ARRAYS:
+        arr = np.ascontiguousarray(getattr(gs.farm, name), dtype=_DTYPES[name])
+        arrays.append((name, arr, offset))
+        offset = _aligned(offset + arr.nbytes)
+    history, blobs = None, []
+    if gs.history is not None:
+        history, blobs = gs.history.dump()
+        history["blobs"] = []
+        for blob in blobs:
+            history["blobs"].append([offset, len(blob)])
+            offset += len(blob)
+    payload = bytearray(offset)
+    for _, arr, off in arrays:
+        payload[off:off + arr.nbytes] = arr.data.cast("B")
+    for blob, (off, n) in zip(blobs, history["blobs"] if history else ()):
+        payload[off:off + n] = blob
+
+    if codec == "zlib":
+        body = zlib.compress(payload, 1 if level is None else level)
+    elif codec == "zstd":
+        body = zstandard.ZstdCompressor(level=3 if level is None else level).compress(payload)
+    else:
+        body = payload
+    header = json.dumps({
+        "codec": codec,
+        "payload_nbytes": len(payload),
+        "state": gs.model_dump(mode="json", exclude={"farm"}),
+        "farm_size": gs.farm.size,
+        "arrays": [{"name": name, "dtype": arr.dtype.str, "shape": list(arr.shape), "offset": off}
+                   for name, arr, off in arrays],
+        "history": history,
+    }, separators=(",", ":")).encode("utf-8")
+    return b"".join((_PREFIX.pack(MAGIC, SNAPSHOT_VERSION, len(header)), header, body))
+
+
+def _header(buf: memoryview) -> tuple[dict, int]:
+    if len(buf) < _PREFIX.size:
+        raise SnapshotError("not a game snapshot")
+    magic, version, head_len = _PREFIX.unpack_from(buf)
+    if magic != MAGIC:
+        raise SnapshotError("not a game snapshot")
+    if version > SNAPSHOT_VERSION:
+        raise SnapshotError(f"snapshot version {version} is newer than supported ({SNAPSHOT_VERSION})")
+    start = _PREFIX.size + head_len
+    try:
+        return json.loads(bytes(buf[_PREFIX.size:start])), start
+    except ValueError as e:
+        raise SnapshotError(f"bad snapshot header: {e}") from None
+
+
+def _inflate(body: memoryview, codec: str, nbytes: int) -> bytearray:
+    out = bytearray(nbytes)
+    pos = 0
+    if codec == "zlib":
+        d = zlib.decompressobj()
+    elif codec == "zstd" and zstandard is not None:
+        d = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        raise SnapshotError(f"cannot decode codec '{codec}'")
+    try:
+        for i in range(0, len(body), _CHUNK):
+            piece = d.decompress(body[i:i + _CHUNK])
+            out[pos:pos + len(piece)] = piece
+            pos += len(piece)
+    except _INFLATE_ERRORS as e:
+        raise SnapshotError(f"corrupt snapshot payload: {e}") from None
+    if pos != nbytes:
+        raise SnapshotError("truncated snapshot payload")
+    return out
+
+
+def decode(data) -> GameState:
+    """GameState from snapshot bytes; farm arrays are views into `data` (or the inflated payload)."""
+    try:
+        return _decode(memoryview(data))
+    except SnapshotError:
+        raise
+    except (KeyError, TypeError, ValueError, AttributeError) as e:  # incl. pydantic ValidationError
+        raise SnapshotError(f"malformed snapshot: {type(e).__name__}: {e}") from None
+
+
+def _decode(buf: memoryview) -> GameState:
+    head, start = _header(buf)
+    if not isinstance(head, dict):
+        raise SnapshotError("bad snapshot header: not an object")
+    size = head.get("farm_size")
+    if not isinstance(size, int) or not 1 <= size <= FARM_SIZE_MAX:
+        raise SnapshotError(f"bad farm size {size!r}")
+    nbytes = head["payload_nbytes"]
+    cell_bytes = sum(np.dtype(d).itemsize for d in _DTYPES.values())
+    limit = size * size * cell_bytes + len(_DTYPES) * _ALIGN
+    history = head.get("history")
+    if history:
+        _check_history(history, size)
+        # compressed uint8 frames; zlib never grows data by more than a few bytes per 16 KiB
+        limit += len(history["blobs"]) * (size * size + 1024)
+    if not isinstance(nbytes, int) or not 0 <= nbytes <= limit:
+        raise SnapshotError(f"bad payload size {nbytes!r}")
+    codec = head.get("codec", "none")
+    if codec == "none":
+        payload = buf[start:start + nbytes]
+        if len(payload) != nbytes:
+            raise SnapshotError("truncated snapshot payload")
+        if payload.readonly:  # e.g. bytes: the engine updates farm arrays in place
+            payload = bytearray(payload)
+    else:
+        payload = _inflate(buf[start:], codec, nbytes)
+
+    specs = {a["name"]: a for a in head["arrays"]}
+    arrays = {}
+    for name in FARM_ARRAYS:
+        a = specs.get(name)
+        if a is None or a["dtype"] != _DTYPES[name] or a["shape"] != [size, size]:
+            raise SnapshotError(f"snapshot array '{name}' is missing or has the wrong dtype/shape")
+        dtype = np.dtype(a["dtype"])
+        if a["offset"] + size * size * dtype.itemsize > nbytes:
+            raise SnapshotError(f"snapshot array '{name}' is out of bounds")
+        arrays[name] = np.frombuffer(payload, dtype=dtype, count=size * size, offset=a["offset"]).reshape(size, size)
+    farm = Farm(size=size, **arrays)
+    gs = GameState(farm=farm, **head["state"])
+    if history:
+        blobs = []
+        for off, n in history["blobs"]:
+            if not (0 <= off and off + n <= nbytes):
+                raise SnapshotError("snapshot history frame is out of bounds")
+            blob = bytes(payload[off:off + n])
+            if _inflated_size(blob, size * size) != size * size:
+                raise SnapshotError(f"snapshot history frame is not a {size}x{size} raster")
+            blobs.append(blob)
+        try:
+            gs.history = RasterHistory.load(history, blobs)
+        except (ValueError, StopIteration, zlib.error) as e:
+            raise SnapshotError(f"bad snapshot history: {e}") from None
+    return gs
+
+
+def _check_history(history, size: int) -> None:
+    """Structure of the header's history block (RasterHistory.dump() plus blob offsets)."""
+    if not isinstance(history, dict):
+        raise SnapshotError("bad snapshot history: not an object")
+    if history.get("size") != size:
+        raise SnapshotError("snapshot history does not match the farm size")
+    if history.get("layers") != list(HISTORY_LAYERS):
+        raise SnapshotError(f"snapshot history layers must be {list(HISTORY_LAYERS)}")
+    for name in ("capacity", "keyframe"):
+        if not isinstance(history.get(name), int) or history[name] < 1:
+            raise SnapshotError(f"bad snapshot history {name} {history.get(name)!r}")
+    frames, blobs = history.get("frames"), history.get("blobs")
+    if not isinstance(frames, list) or not all(
+            isinstance(f, list) and len(f) == 2 and isinstance(f[0], int) and isinstance(f[1], bool) for f in frames):
+        raise SnapshotError("bad snapshot history frames")
+    if not isinstance(blobs, list) or len(blobs) != len(frames) * len(HISTORY_LAYERS) or not all(
+            isinstance(b, list) and len(b) == 2 and all(isinstance(v, int) and v >= 0 for v in b) for b in blobs):
+        raise SnapshotError("bad snapshot history blobs")
+
+
+def _inflated_size(blob: bytes, limit: int) -> int:
+    # decompressed length of a history frame, reading at most limit + 1 bytes of it
+    d = zlib.decompressobj()
+    try:
+        n = len(d.decompress(blob, limit + 1))
+    except zlib.error:
+        return -1
+    return n if d.eof else -1
+
+
+def write_snapshot(gs: GameState, path: Path, codec: str | None = None) -> int:
+    """Atomic write; returns the snapshot size in bytes."""
+    data = encode(gs, codec)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{id(data)}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def read_snapshot(path: Path) -> GameState:
+    """Reads into a bytearray, so the arrays of an uncompressed snapshot are writable views."""
+    with open(path, "rb") as fh:
+        buf = bytearray(os.fstat(fh.fileno()).st_size)
+        fh.readinto(buf)
+    return decode(buf)
@@ -1,2 +1,568 @@
-# Simple in-memory store for demo / free-tier deploys
-store = {}
+"""
+Game sessions. Two backends with the same interface, selected by GAME_STORE:
+
+memory (default, one worker)
+  Bounded in-memory store that spills idle games to disk. Resident games are kept in LRU
+  order under a byte budget (farm arrays + a fixed overhead). A game is spilled to
+  GAME_SPILL_DIR/<gid>.snap (app/snapshot.py) when it has been idle longer than
+  GAME_TTL_SECONDS or when the budget is exceeded, and is loaded back transparently by the
+  next get(). Spilled games are deleted after GAME_SPILL_TTL_SECONDS without access.
+
+sqlite (several uvicorn workers)
+  Games live in one SQLite database in WAL mode (GAME_DB) shared by all worker processes on
+  the box; each process keeps decoded games in a small LRU and reuses them while their
+  revision is unchanged.
+
+Reads use store.get(gid). Changes go through `with store.checkout(gid, expect_turn) as gs:`,
+which holds the per-game lock (a flock on GAME_LOCK_DIR/<gid>.lock with sqlite, so plan/tick
+calls on the same game are serialized across workers), optionally checks that the game is
+still at `expect_turn`, and stores the game on exit. Saves are versioned: a write based on
+an outdated revision raises StaleGameError instead of overwriting a newer state. checkout also
+moves the game to a new revision before the change, so whatever is read (and cached, e.g.
+rasters) while it runs is keyed by a revision that is dead once it is stored.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import itertools
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: in-process locking only
+    fcntl = None
+
+from . import snapshot
+from .models import GameState
+
+log = logging.getLogger("app.storage")
+
+GAME_STORE_BYTES = int(os.getenv("GAME_STORE_BYTES", str(256 * 1024 * 1024)))
+GAME_TTL_SECONDS = float(os.getenv("GAME_TTL_SECONDS", "1800"))
+GAME_SPILL_TTL_SECONDS = float(os.getenv("GAME_SPILL_TTL_SECONDS", str(7 * 24 * 3600)))
+GAME_SPILL_DIR = Path(os.getenv("GAME_SPILL_DIR", os.path.join(tempfile.gettempdir(), "farm-sessions")))
+GAME_OVERHEAD_BYTES = 16 * 1024  # pydantic models, region, finance
+GAME_STORE = os.getenv("GAME_STORE", "memory")
+GAME_DB = Path(os.getenv("GAME_DB", os.path.join(tempfile.gettempdir(), "farm-games.sqlite")))
+GAME_LOCK_DIR = Path(os.getenv("GAME_LOCK_DIR", str(GAME_DB) + ".locks"))
+GAME_LOCK_TIMEOUT = float(os.getenv("GAME_LOCK_TIMEOUT", "30"))
+
+
+class GameConflictError(RuntimeError):
+    """The game cannot be changed right now (answered with 409)."""
+
+
+class StaleGameError(GameConflictError):
+    """The game moved on (other turn / newer revision) since the caller looked at it."""
+
+
+class GameBusyError(GameConflictError):
+    """Another request held the game's lock for longer than GAME_LOCK_TIMEOUT."""
+
+
+def game_nbytes(gs: GameState) -> int:
+    history = gs.history.nbytes if gs.history is not None else 0
+    return gs.farm.nbytes + history + GAME_OVERHEAD_BYTES
+
+
+def game_to_bytes(gs: GameState) -> bytes:
+    return snapshot.encode(gs)
+
+
+def game_from_bytes(data: bytes) -> GameState:
+    return snapshot.decode(data)
+
+
+def dump_game(gs: GameState, path: Path) -> None:
+    snapshot.write_snapshot(gs, path)
+
+
+def load_game(path: Path) -> GameState:
+    return snapshot.read_snapshot(path)
+
+
+def _check_turn(gs: GameState, expect_turn: int | None) -> None:
+    if expect_turn is not None and gs.turn != expect_turn:
+        raise StaleGameError(f"game is at turn {gs.turn}, not {expect_turn}")
+
+
+class GameLocks:
+    """
+    Per-game mutex: a thread lock, plus an exclusive flock on <lock_dir>/<gid>.lock across processes.
+    Thread locks only exist while someone holds or waits for them; lock files are removed with
+    hold(gid, discard=True) when the game is deleted.
+    """
+
+    def __init__(self, lock_dir: Path | None = None, timeout: float = GAME_LOCK_TIMEOUT):
+        self.lock_dir = Path(lock_dir) if lock_dir is not None and fcntl is not None else None
+        self.timeout = timeout
+        self._locks: dict = {}  # gid -> [lock, holders + waiters]
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, gid: str, discard: bool = False):
+        with self._guard:
+            entry = self._locks.setdefault(gid, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(timeout=self.timeout):
+                raise GameBusyError(f"game {gid} is busy")
+            try:
+                if self.lock_dir is None:
+                    yield
+                    return
+                fh = self._flock(gid)
+                try:
+                    yield
+                finally:
+                    if discard:
+                        (self.lock_dir / f"{gid}.lock").unlink(missing_ok=True)
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                    fh.close()
+            finally:
+                entry[0].release()
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[gid]
+
+    def _flock(self, gid: str):
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        path = self.lock_dir / f"{gid}.lock"
+        deadline = time.monotonic() + self.timeout
+        while True:
+            fh = open(path, "a+b")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            raise GameBusyError(f"game {gid} is busy")
+                        time.sleep(0.005)
+                try:  # the holder may have discarded the file meanwhile: lock the current one
+                    if os.fstat(fh.fileno()).st_ino == os.stat(path).st_ino:
+                        return fh
+                except FileNotFoundError:
+                    pass
+            except BaseException:
+                fh.close()
+                raise
+            fh.close()
+
+
+def _valid_gid(gid: str) -> bool:
+    return bool(gid) and "/" not in gid and "\\" not in gid and not gid.startswith(".")
+
+
+class SessionStore:
+    """dict-like (get / [] / in / len) store of GameState by id; see module docstring."""
+
+    def __init__(self, max_bytes: int = GAME_STORE_BYTES, ttl: float = GAME_TTL_SECONDS,
+                 spill_dir: Path = GAME_SPILL_DIR, spill_ttl: float = GAME_SPILL_TTL_SECONDS):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self.spill_dir = Path(spill_dir)
+        self.spill_ttl = spill_ttl
+        # gid -> (gs, bytes, last access, rev); rev is new on every store, see get_rev()
+        self._games: "OrderedDict[str, tuple[GameState, int, float, int]]" = OrderedDict()
+        self._revs = itertools.count(1)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._locks = GameLocks()
+        self._pinned: dict = {}  # gid -> number of open checkouts (never spilled meanwhile)
+        self._last_spill_sweep = 0.0
+        self.spills = 0
+        self.rehydrations = 0
+        self.expired = 0
+
+    def spill_path(self, gid: str) -> Path:
+        return self.spill_dir / f"{gid}.snap"
+
+    # ---- dict interface ----
+    def get(self, gid: str, default=None) -> GameState | None:
+        with self._lock:
+            item = self._games.get(gid)
+            if item is not None:
+                gs = item[0]
+                self._games[gid] = (gs, item[1], time.monotonic(), item[3])
+                self._games.move_to_end(gid)
+            else:
+                gs = self._rehydrate(gid)
+            self._evict()
+        return gs if gs is not None else default
+
+    def get_rev(self, gid: str) -> tuple[GameState, int] | None:
+        """(game, revision); the revision changes whenever the game is stored (checkout, restore)."""
+        with self._lock:
+            gs = self.get(gid)
+            return (gs, self._games[gid][3]) if gs is not None else None
+
+    def __getitem__(self, gid: str) -> GameState:
+        gs = self.get(gid)
+        if gs is None:
+            raise KeyError(gid)
+        return gs
+
+    def __setitem__(self, gid: str, gs: GameState) -> None:
+        with self._lock:
+            self._put(gid, gs)
+            self._evict()
+
+    def __contains__(self, gid: str) -> bool:
+        with self._lock:
+            return gid in self._games or self._spill_file(gid) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._games) + len(self._spilled_ids())
+
+    @contextmanager
+    def checkout(self, gid: str, expect_turn: int | None = None):
+        """Hold the game's lock while the caller changes it; yields None if there is no such game."""
+        if not _valid_gid(gid):
+            yield None
+            return
+        with self._locks.hold(gid):
+            with self._lock:
+                self._pinned[gid] = self._pinned.get(gid, 0) + 1
+            try:
+                gs = self.get(gid)
+                if gs is not None:
+                    _check_turn(gs, expect_turn)
+                    with self._lock:  # new revision before the change: nothing read while it
+                        self._put(gid, gs)  # runs is cached under a revision that outlives it
+                yield gs
+                if gs is not None:
+                    with self._lock:
+                        item = self._games.get(gid)
+                        if item is not None and item[0] is gs:
+                            self._put(gid, gs)  # farm size may have changed
+            finally:
+                with self._lock:
+                    if self._pinned[gid] == 1:
+                        del self._pinned[gid]
+                    else:
+                        self._pinned[gid] -= 1
+                    self._evict()
+
+    def pop(self, gid: str, default=None):
+        with self._lock:
+            item = self._games.pop(gid, None)
+            if item is not None:
+                self._bytes -= item[1]
+            path = self._spill_file(gid)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            return item[0] if item is not None else default
+
+    # ---- internals ----
+    def _put(self, gid: str, gs: GameState) -> None:
+        old = self._games.pop(gid, None)
+        if old is not None:
+            self._bytes -= old[1]
+        size = game_nbytes(gs)
+        self._games[gid] = (gs, size, time.monotonic(), next(self._revs))
+        self._bytes += size
+
+    def _spill_file(self, gid: str) -> Path | None:
+        if not _valid_gid(gid):
+            return None
+        path = self.spill_path(gid)
+        return path if path.is_file() else None
+
+    def _spilled_ids(self) -> list[str]:
+        if not self.spill_dir.is_dir():
+            return []
+        return [p.stem for p in self.spill_dir.glob("*.snap")]
+
+    def _rehydrate(self, gid: str) -> GameState | None:
+        path = self._spill_file(gid)
+        if path is None:
+            return None
+        try:
+            gs = load_game(path)
+        except Exception:
+            log.exception("[store] cannot load spilled game %s", path)
+            return None
+        path.unlink(missing_ok=True)
+        self._put(gid, gs)
+        self.rehydrations += 1
+        return gs
+
+    def _spill(self, gid: str) -> None:
+        gs, size, _, _ = self._games.pop(gid)
+        self._bytes -= size
+        dump_game(gs, self.spill_path(gid))
+        self.spills += 1
+
+    def _evict(self) -> None:
+        """
+        Spill idle games, then least-recently-used ones until the budget fits. The most recently
+        used game and games that are checked out are never spilled: callers are working on them.
+        """
+        now = time.monotonic()
+        for gid in list(self._games)[:-1]:
+            last = self._games[gid][2]
+            if not (now - last > self.ttl or self._bytes > self.max_bytes):
+                break
+            if gid not in self._pinned:
+                self._spill(gid)
+        if now - self._last_spill_sweep > 60.0:
+            self._last_spill_sweep = now
+            self._expire_spilled()
+
+    def _expire_spilled(self) -> None:
+        cutoff = time.time() - self.spill_ttl
+        for gid in self._spilled_ids():
+            path = self.spill_path(gid)
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    self.expired += 1
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "resident": len(self._games),
+                "resident_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spilled": len(self._spilled_ids()),
+                "spills": self.spills,
+                "rehydrations": self.rehydrations,
+                "expired": self.expired,
+                "ttl_seconds": self.ttl,
+                "spill_dir": str(self.spill_dir),
+            }
+
+
+class SQLiteStore:
+    """Games shared by all worker processes through one SQLite database (see module docstring)."""
+
+    def __init__(self, path: Path = GAME_DB, max_bytes: int = GAME_STORE_BYTES,
+                 lock_dir: Path = GAME_LOCK_DIR, ttl: float = GAME_SPILL_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._locks = GameLocks(lock_dir)
+        self._local = threading.local()
+        self._cache: "OrderedDict[str, tuple[int, GameState, int]]" = OrderedDict()  # gid -> (rev, gs, bytes)
+        self._bytes = 0
+        self._cache_lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.loads = 0
+        self.saves = 0
+        self.conflicts = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=GAME_LOCK_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS games ("
+                         "id TEXT PRIMARY KEY, rev INTEGER NOT NULL, turn INTEGER NOT NULL, "
+                         "updated REAL NOT NULL, state BLOB NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    # ---- local cache of decoded games ----
+    def _cached(self, gid: str, rev: int) -> GameState | None:
+        with self._cache_lock:
+            item = self._cache.get(gid)
+            if item is None or item[0] != rev:
+                return None
+            self._cache.move_to_end(gid)
+            return item[1]
+
+    def _remember(self, gid: str, rev: int, gs: GameState) -> None:
+        size = game_nbytes(gs)
+        with self._cache_lock:
+            self._forget_locked(gid)
+            self._cache[gid] = (rev, gs, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._cache) > 1:
+                _, (_, _, sz) = self._cache.popitem(last=False)
+                self._bytes -= sz
+
+    def _forget_locked(self, gid: str) -> None:
+        old = self._cache.pop(gid, None)
+        if old is not None:
+            self._bytes -= old[2]
+
+    def _forget(self, gid: str) -> None:
+        with self._cache_lock:
+            self._forget_locked(gid)
+
+    # ---- dict interface ----
+    def _load(self, gid: str) -> tuple[GameState, int] | None:
+        row = self._conn().execute("SELECT rev FROM games WHERE id = ?", (gid,)).fetchone()
+        if row is None:
+            return None
+        gs = self._cached(gid, row[0])
+        if gs is not None:
+            return gs, row[0]
+        row = self._conn().execute("SELECT rev, state FROM games WHERE id = ?", (gid,)).fetchone()
+        if row is None:
+            return None
+        gs = game_from_bytes(row[1])
+        self.loads += 1
+        self._remember(gid, row[0], gs)
+        return gs, row[0]
+
+    def get(self, gid: str, default=None) -> GameState | None:
+        found = self._load(gid)
+        return found[0] if found is not None else default
+
+    def get_rev(self, gid: str) -> tuple[GameState, int] | None:
+        """(game, revision); the revision is the row's, so it is the same in every worker."""
+        return self._load(gid)
+
+    def __getitem__(self, gid: str) -> GameState:
+        gs = self.get(gid)
+        if gs is None:
+            raise KeyError(gid)
+        return gs
+
+    def __setitem__(self, gid: str, gs: GameState) -> None:
+        with self._locks.hold(gid):
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO games (id, rev, turn, updated, state) VALUES (?, 1, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET rev = rev + 1, turn = excluded.turn, "
+                "updated = excluded.updated, state = excluded.state",
+                (gid, gs.turn, time.time(), game_to_bytes(gs)))
+            rev = conn.execute("SELECT rev FROM games WHERE id = ?", (gid,)).fetchone()[0]
+        self.saves += 1
+        self._remember(gid, rev, gs)
+        self._sweep()
+
+    def __contains__(self, gid: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM games WHERE id = ?", (gid,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def pop(self, gid: str, default=None):
+        gs = self.get(gid)
+        if _valid_gid(gid):
+            self._delete(gid)
+        return gs if gs is not None else default
+
+    def _delete(self, gid: str, before: float | None = None) -> None:
+        # under the game's lock, which also removes its lock file
+        with self._locks.hold(gid, discard=True):
+            if before is None:
+                self._conn().execute("DELETE FROM games WHERE id = ?", (gid,))
+            else:  # expiry: unless it was saved meanwhile
+                self._conn().execute("DELETE FROM games WHERE id = ? AND updated < ?", (gid, before))
+        self._forget(gid)
+
+    @contextmanager
+    def checkout(self, gid: str, expect_turn: int | None = None):
+        """Hold the game's lock (across workers) while the caller changes it, then save it."""
+        if not _valid_gid(gid):
+            yield None
+            return
+        with self._locks.hold(gid):
+            found = self._load(gid)
+            if found is None:
+                yield None
+                return
+            gs, rev = found
+            _check_turn(gs, expect_turn)
+            # new revision before the change, so nothing read while it runs is cached under a
+            # revision that outlives it; readers here decode the stored state meanwhile
+            self._bump(gid, rev)
+            rev += 1
+            try:
+                yield gs
+            except BaseException:
+                self._forget(gid)  # may be half-changed; the next read decodes the stored revision
+                raise
+            cur = self._conn().execute(
+                "UPDATE games SET rev = rev + 1, turn = ?, updated = ?, state = ? WHERE id = ? AND rev = ?",
+                (gs.turn, time.time(), game_to_bytes(gs), gid, rev))
+            self._check_saved(gid, cur)
+            self.saves += 1
+            self._remember(gid, rev + 1, gs)
+
+    def _bump(self, gid: str, rev: int) -> None:
+        cur = self._conn().execute("UPDATE games SET rev = rev + 1 WHERE id = ? AND rev = ?", (gid, rev))
+        self._check_saved(gid, cur)
+        self._forget(gid)
+
+    def _check_saved(self, gid: str, cur) -> None:
+        if cur.rowcount != 1:
+            self.conflicts += 1
+            self._forget(gid)
+            raise StaleGameError(f"game {gid} was changed concurrently")
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep > 60.0:
+            self._last_sweep = now
+            conn = self._conn()
+            before = time.time() - self.ttl
+            for (gid,) in conn.execute("SELECT id FROM games WHERE updated < ?", (before,)).fetchall():
+                try:
+                    self._delete(gid, before)
+                except GameBusyError:
+                    pass  # in use after all; next sweep
+            self._sweep_lock_files(conn)
+
+    def _sweep_lock_files(self, conn) -> None:
+        # lock files of games that are gone (deleted by another worker, or before files were removed)
+        lock_dir = self._locks.lock_dir
+        if lock_dir is None or not lock_dir.is_dir():
+            return
+        live = {row[0] for row in conn.execute("SELECT id FROM games")}
+        for path in lock_dir.glob("*.lock"):
+            if path.stem not in live and _valid_gid(path.stem):
+                try:
+                    with self._locks.hold(path.stem, discard=True):
+                        pass
+                except GameBusyError:
+                    pass
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        games, db_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM games").fetchone()
+        with self._cache_lock:
+            cached, cached_bytes = len(self._cache), self._bytes
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "games": games,
+            "stored_bytes": db_bytes,
+            "resident": cached,
+            "resident_bytes": cached_bytes,
+            "max_bytes": self.max_bytes,
+            "loads": self.loads,
+            "saves": self.saves,
+            "conflicts": self.conflicts,
+        }
+
+
+def make_store(kind: str = GAME_STORE):
+    if kind == "sqlite":
+        return SQLiteStore()
+    if kind == "memory":
+        return SessionStore()
+    raise ValueError(f"GAME_STORE must be memory or sqlite, not {kind!r}")
+
+
+# Game sessions for the API (main.py)
+store = make_store()
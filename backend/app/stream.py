@@ -0,0 +1,146 @@
+"""
+Per-game push channel (WebSocket /game/{gid}/stream): after every change the client gets one
+binary frame with the state (KPIs, finance, calendar) and, for each subscribed layer, only the
+cells whose quantized uint8 value changed since the last frame it received.
+
+Frame (little-endian):
+    magic     4 bytes  b"FNWS"
+    version   u8       STREAM_VERSION
+    n_layers  u8
+    size      u16      farm is size x size
+    turn      u32
+    json_len  u32
+    json      json_len bytes of UTF-8 JSON: GameState.public()
+    n_layers times:
+        layer  u8      index into STREAM_LAYERS
+        mode   u8      0 = full raster (size*size bytes), 1 = sparse
+        count  u32     full: size*size; sparse: number of changed cells
+        sparse: count u32 row-major cell indices, then count u8 values
+        full:   count u8 values
+
+Layers are only sent when something changed, so a tick that only moves the KPIs is one short
+frame. A layer is sent in full on the first frame after subscribing, and whenever sparse would
+be larger (more than 1/5 of the cells changed).
+
+Client -> server (JSON text): {"subscribe": ["ndvi", ...]}, {"tick": true, "turn": <optional>},
+{"resync": true}. Errors come back as JSON text {"error": "..."}.
+
+Changes made in this process wake the sockets at once (notify(), called after every game update
+in main.py); changes made by other worker processes (GAME_STORE=sqlite) are picked up by polling
+the store revision every STREAM_POLL_SECONDS. Frames are only encoded when the revision moved.
+"""
+import asyncio
+import json
+import os
+import struct
+import threading
+import numpy as np
+
+from .sim.history import HISTORY_LAYERS
+from .sim.render import quantize
+
+STREAM_VERSION = 1
+STREAM_LAYERS = HISTORY_LAYERS  # ("ndvi", "moisture", "salinity", "fertility")
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "2"))
+MAGIC = b"FNWS"
+_HEAD = struct.Struct("<4sBBHII")
+_LAYER = struct.Struct("<BBI")
+_SPARSE_COST = 5  # bytes per changed cell (u32 index + u8 value) vs 1 per cell for a full raster
+
+# gid -> {(loop, asyncio.Event)}: sockets waiting for that game
+_waiters: dict[str, set] = {}
+_waiters_lock = threading.Lock()
+
+
+def notify(gid: str) -> None:
+    """Wake every stream of `gid` in this process; safe to call from any thread."""
+    with _waiters_lock:
+        waiters = list(_waiters.get(gid, ()))
+    for loop, event in waiters:
+        loop.call_soon_threadsafe(event.set)
+
+
+def subscribe(gid: str) -> tuple:
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _waiters_lock:
+        _waiters.setdefault(gid, set()).add(waiter)
+    return waiter
+
+
+def unsubscribe(gid: str, waiter: tuple) -> None:
+    with _waiters_lock:
+        ws = _waiters.get(gid)
+        if ws is not None:
+            ws.discard(waiter)
+            if not ws:
+                del _waiters[gid]
+
+
+def check_layers(layers) -> str | None:
+    bad = [name for name in layers if name not in STREAM_LAYERS]
+    if bad:
+        return f"Unknown layer(s) {', '.join(bad)}. Expected: {', '.join(STREAM_LAYERS)}"
+    return None
+
+
+class LayerDiff:
+    """What one client has seen: the last turn and quantized rasters sent to it."""
+
+    def __init__(self, layers):
+        self.layers = tuple(layers)
+        self.sent: dict[str, np.ndarray] = {}
+        self.turn: int | None = None
+
+    def subscribe(self, layers) -> None:
+        self.layers = tuple(layers)
+        self.sent = {k: v for k, v in self.sent.items() if k in self.layers}
+
+    def resync(self) -> None:
+        self.sent.clear()
+        self.turn = None
+
+    def frame(self, gs, force: bool = False) -> bytes | None:
+        """Binary frame for the game's current state, None if nothing changed for this client."""
+        parts, count = [], 0
+        for name in self.layers:
+            cur = quantize(getattr(gs.farm, name)).ravel()
+            old = self.sent.get(name)
+            layer = STREAM_LAYERS.index(name)
+            if old is not None and old.size == cur.size:
+                idx = np.flatnonzero(cur != old)
+                if idx.size == 0:
+                    continue
+                if idx.size * _SPARSE_COST < cur.size:
+                    parts += [_LAYER.pack(layer, 1, idx.size), idx.astype("<u4").tobytes(), cur[idx].tobytes()]
+                    self.sent[name], count = cur, count + 1
+                    continue
+            parts += [_LAYER.pack(layer, 0, cur.size), cur.tobytes()]
+            self.sent[name], count = cur, count + 1
+        if not count and not force and gs.turn == self.turn:
+            return None
+        self.turn = gs.turn
+        head = json.dumps(gs.public(), separators=(",", ":")).encode("utf-8")
+        return b"".join([_HEAD.pack(MAGIC, STREAM_VERSION, count, gs.farm.size, gs.turn, len(head)), head] + parts)
+
+
+def decode_frame(data: bytes) -> tuple[dict, dict]:
+    """(state, {layer: ("full", u8 (size, size)) | ("sparse", (indices, values))}); for clients and tests."""
+    magic, version, n_layers, size, turn, json_len = _HEAD.unpack_from(data)
+    if magic != MAGIC or version != STREAM_VERSION:
+        raise ValueError("not a stream frame")
+    pos = _HEAD.size
+    state = json.loads(data[pos:pos + json_len])
+    pos += json_len
+    layers = {}
+    for _ in range(n_layers):
+        layer, mode, count = _LAYER.unpack_from(data, pos)
+        pos += _LAYER.size
+        if mode == 0:
+            layers[STREAM_LAYERS[layer]] = ("full", np.frombuffer(data, np.uint8, count, pos).reshape(size, size))
+            pos += count
+        else:
+            idx = np.frombuffer(data, "<u4", count, pos)
+            vals = np.frombuffer(data, np.uint8, count, pos + 4 * count)
+            layers[STREAM_LAYERS[layer]] = ("sparse", (idx, vals))
+            pos += 5 * count
+    return state, layers
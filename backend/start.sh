@@ -22,8 +22,15 @@ if [ -d ../frontend ] && [ ! -d ./app/static ]; then
   fi
 fi
 
-echo "[start] Launching API…"
-exec python -m uvicorn backend.app.main:app --host 0.0.0.0 --port "${PORT:-8080}"
+# Несколько воркеров делят игры только через SQLite-стор (см. backend/app/storage.py)
+WORKERS="${WEB_CONCURRENCY:-1}"
+if [ "$WORKERS" -gt 1 ] && [ "${GAME_STORE:-memory}" = "memory" ]; then
+  echo "[start] $WORKERS workers: switching GAME_STORE to sqlite"
+  export GAME_STORE=sqlite
+fi
+
+echo "[start] Launching API ($WORKERS worker(s), GAME_STORE=${GAME_STORE:-memory})…"
+exec python -m uvicorn backend.app.main:app --host 0.0.0.0 --port "${PORT:-8080}" --workers "$WORKERS"
 
 
 